@@ -0,0 +1,168 @@
+"""
+Actors — Une file de mutations par room, traitée par sa propre tâche.
+
+Les commandes qui modifient le monde (récolte, placement, construction) ne touchent plus la
+RoomState depuis la coroutine de chaque client : le handler soumet la commande à l'acteur de
+sa room (RoomActors.submit) et attend son résultat. Pour une room donnée :
+- les commandes sont appliquées une à une, dans l'ordre de soumission (ordre déterministe)
+- chaque commande est une fonction synchrone : aucune autre mutation ne s'intercale pendant
+  qu'elle s'exécute
+- les commandes en attente sont traitées par lots (au plus MAX_BATCH) : les fiches joueurs
+  modifiées par le lot sont écrites une fois à la fin du lot (UserManager.batched_writes), puis
+  les diffusions du lot partent dans l'ordre des commandes, avant la reprise des handlers
+
+Une commande retourne (résultat, diffusions) : le résultat est rendu au handler, les
+diffusions (messages déjà encodés) sont envoyées à la map par l'acteur. Une exception levée
+par une commande est transmise au handler qui l'a soumise ; le lot continue.
+
+Les rooms sont indépendantes : une room chargée (longue file, diffusion lente) ne retarde
+pas les autres. La boucle asyncio reste unique : l'indépendance porte sur les files, pas sur
+l'exécution en parallèle des commandes.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, ContextManager, Dict, List, Optional, Tuple
+
+from backend.log import get_logger
+
+log = get_logger("actors")
+
+# Commandes appliquées au plus par lot (une écriture de fiche et un envoi par lot)
+MAX_BATCH = 64
+
+# (fonction, arguments, future du handler)
+Command = Tuple[Callable[..., Tuple[Any, List[str]]], Tuple[Any, ...], asyncio.Future]
+
+
+class RoomActor:
+    def __init__(self, map_id: str, publish: Callable[[str, List[str]], Awaitable[None]],
+                 batch_writes: Callable[[], ContextManager], max_batch: int = MAX_BATCH):
+        self.map_id = map_id
+        self.max_batch = max_batch
+        self.processed = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.busy_ms = 0.0
+        self._publish = publish
+        self._batch_writes = batch_writes
+        self._queue: "asyncio.Queue[Command]" = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, fn: Callable[..., Tuple[Any, List[str]]], *args) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, args, future))
+        return future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._apply(batch)
+            except Exception:
+                log.error("Erreur de l'acteur de room", map_id=self.map_id, exc_info=True)
+            finally:
+                for command in batch:
+                    if not command[2].done():
+                        command[2].set_exception(RuntimeError(f"Commande non appliquée ({self.map_id})"))
+                    self._queue.task_done()
+
+    async def _apply(self, batch: List[Command]):
+        started = time.perf_counter()
+        outcomes = []
+        broadcasts: List[str] = []
+        with self._batch_writes():
+            for fn, args, future in batch:
+                # Handler annulé (session fermée) : la commande n'est pas appliquée
+                if future.cancelled():
+                    continue
+                try:
+                    result, messages = fn(*args)
+                except Exception as e:
+                    outcomes.append((future, None, e))
+                    continue
+                outcomes.append((future, result, None))
+                broadcasts.extend(messages)
+        self.busy_ms += (time.perf_counter() - started) * 1000
+        self.processed += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        if broadcasts:
+            await self._publish(self.map_id, broadcasts)
+        for future, result, error in outcomes:
+            if future.cancelled():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def join(self):
+        """Attend que toutes les commandes soumises aient été appliquées."""
+        await self._queue.join()
+
+    def cancel(self):
+        self._task.cancel()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "queued": self.depth,
+            "processed": self.processed,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "avg_batch": round(self.processed / self.batches, 2) if self.batches else 0,
+            "busy_ms": round(self.busy_ms, 1),
+        }
+
+
+class RoomActors:
+    """map_id → RoomActor, créé à la première commande de la room."""
+
+    def __init__(self, publish: Callable[[str, List[str]], Awaitable[None]],
+                 batch_writes: Callable[[], ContextManager], max_batch: int = MAX_BATCH):
+        self._publish = publish
+        self._batch_writes = batch_writes
+        self.max_batch = max_batch
+        self.closed = False
+        self._actors: Dict[str, RoomActor] = {}
+
+    def get(self, map_id: str) -> RoomActor:
+        if self.closed:
+            raise RuntimeError("Acteurs de room arrêtés")
+        actor = self._actors.get(map_id)
+        if actor is None:
+            actor = self._actors[map_id] = RoomActor(map_id, self._publish, self._batch_writes, self.max_batch)
+        return actor
+
+    async def submit(self, map_id: str, fn: Callable[..., Tuple[Any, List[str]]], *args) -> Any:
+        """Applique fn(*args) dans la file de map_id et retourne son résultat."""
+        return await self.get(map_id).submit(fn, *args)
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    @property
+    def depth(self) -> int:
+        return sum(actor.depth for actor in self._actors.values())
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Refuse les nouvelles commandes, applique celles en attente puis arrête les tâches."""
+        self.closed = True
+        actors = list(self._actors.values())
+        try:
+            await asyncio.wait_for(asyncio.gather(*(actor.join() for actor in actors)), timeout)
+        except asyncio.TimeoutError:
+            log.warning("Commandes de room abandonnées à l'arrêt", queued=self.depth)
+        for actor in actors:
+            actor.cancel()
+        self._actors.clear()
+
+    def report(self) -> Dict[str, Any]:
+        return {"closed": self.closed, "rooms": {map_id: actor.report() for map_id, actor in self._actors.items()}}
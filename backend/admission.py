@@ -0,0 +1,117 @@
+"""
+Admission — Contrôle des connexions entrantes (afflux de reconnexions après un redémarrage).
+
+- HandshakeGate : au plus HANDSHAKE_CONCURRENCY handshakes simultanés (routage, chargement
+  de la room, connect, PLAYER_SYNC) ; au-delà, file d'attente bornée (HANDSHAKE_QUEUE),
+  puis refus immédiat. Un client refusé reçoit SERVER_BUSY { retry_after } : le délai,
+  tiré au hasard et proportionnel à l'attente, étale les reconnexions suivantes.
+- TokenCache : cache LRU des jetons JWT déjà vérifiés (un client qui se reconnecte présente
+  le même jeton) ; une entrée expirée n'est jamais servie. Le cache ne garantit que la
+  signature : les droits (rôle admin) sont relus dans le compte à chaque demande (main.is_admin).
+- map_session_cap : nombre max de sessions par map (HAVEN_MAP_SESSION_CAP, surchargeable par
+  map avec HAVEN_MAP_SESSION_CAPS="farm_main=200,housing_x=8" ; 0 = illimité).
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+# Handshakes traités simultanément
+HANDSHAKE_CONCURRENCY = int(os.getenv("HAVEN_HANDSHAKE_CONCURRENCY", "32"))
+
+# Handshakes en attente au-delà desquels les nouveaux arrivants sont refusés sans attendre
+HANDSHAKE_QUEUE = int(os.getenv("HAVEN_HANDSHAKE_QUEUE", "256"))
+
+# Attente max d'une place (secondes) avant refus
+HANDSHAKE_TIMEOUT = float(os.getenv("HAVEN_HANDSHAKE_TIMEOUT", "5"))
+
+# Bornes du délai de nouvelle tentative suggéré au client (secondes)
+MIN_RETRY_AFTER = 1.0
+MAX_RETRY_AFTER = 10.0
+
+# Jetons vérifiés gardés en cache
+TOKEN_CACHE_SIZE = int(os.getenv("HAVEN_TOKEN_CACHE_SIZE", "4096"))
+
+# Sessions max par map (0 = illimité), et surcharges par map
+MAP_SESSION_CAP = int(os.getenv("HAVEN_MAP_SESSION_CAP", "0"))
+
+
+def _parse_caps(value: str) -> Dict[str, int]:
+    caps = {}
+    for entry in value.split(","):
+        if "=" in entry:
+            map_id, cap = entry.split("=", 1)
+            caps[map_id.strip()] = int(cap)
+    return caps
+
+
+MAP_SESSION_CAPS = _parse_caps(os.getenv("HAVEN_MAP_SESSION_CAPS", ""))
+
+
+def map_session_cap(map_id: str) -> int:
+    """Sessions max sur map_id (0 = illimité)."""
+    return MAP_SESSION_CAPS.get(map_id, MAP_SESSION_CAP)
+
+
+class HandshakeGate:
+    def __init__(self, concurrency: int = HANDSHAKE_CONCURRENCY, queue_size: int = HANDSHAKE_QUEUE,
+                 timeout: float = HANDSHAKE_TIMEOUT):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def acquire(self) -> bool:
+        """Obtient une place de handshake ; False si la file est pleine ou l'attente trop longue."""
+        if self._semaphore.locked() and self.waiting >= self.queue_size:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def retry_after(self) -> float:
+        """Délai suggéré à un client refusé : aléatoire, plus long quand la file est longue."""
+        spread = MIN_RETRY_AFTER + self.waiting / max(1, self.concurrency)
+        return round(min(MAX_RETRY_AFTER, random.uniform(MIN_RETRY_AFTER, spread + 1.0)), 1)
+
+
+class TokenCache:
+    """Jeton → payload déjà vérifié (LRU) ; seuls les jetons valides sont mis en cache."""
+
+    def __init__(self, decode: Callable[[str], Optional[Dict[str, Any]]], maxsize: int = TOKEN_CACHE_SIZE):
+        self._decode = decode
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def decode(self, token: str) -> Optional[Dict[str, Any]]:
+        payload = self._entries.get(token)
+        if payload is not None:
+            if payload.get("exp", float("inf")) > time.time():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return payload
+            del self._entries[token]
+        self.misses += 1
+        payload = self._decode(token)
+        if payload:
+            self._entries[token] = payload
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return payload
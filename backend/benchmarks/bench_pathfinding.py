@@ -0,0 +1,89 @@
+"""
+Benchmark — Pathfinding serveur (WalkGrid + A*)
+
+Mesure le coût d'une validation PLAYER_MOVE et d'un calcul de chemin
+sur des grilles 100x100 (taille actuelle) et 1000x1000 (cible de montée en charge).
+
+Usage (depuis la racine du dépôt) :
+    python -m backend.benchmarks.bench_pathfinding
+    python -m backend.benchmarks.bench_pathfinding --queries 500 --obstacles 0.25
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+from backend.pathfinding import WalkGrid, find_path, validate_move
+
+
+def build_grid(size: int, obstacle_ratio: float, seed: int) -> WalkGrid:
+    """Grille synthétique : obstacles uniformes (densité comparable à la génération réelle)."""
+    rng = random.Random(seed)
+    resources = [
+        {"x": x, "y": y, "type": "obstacle"}
+        for y in range(size) for x in range(size)
+        if rng.random() < obstacle_ratio
+    ]
+    return WalkGrid(size, size, (), resources)
+
+
+def random_walkable(grid: WalkGrid, rng: random.Random) -> Tuple[int, int]:
+    while True:
+        x, y = rng.randrange(grid.width), rng.randrange(grid.height)
+        if grid.is_walkable(x, y):
+            return x, y
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run(size: int, queries: int, obstacle_ratio: float, max_dist: int, seed: int = 1):
+    grid = build_grid(size, obstacle_ratio, seed)
+    rng = random.Random(seed + 1)
+
+    # Paires départ/arrivée : distance bornée (un clic reste dans le viewport du joueur)
+    pairs = []
+    while len(pairs) < queries:
+        sx, sy = random_walkable(grid, rng)
+        gx = min(size - 1, max(0, sx + rng.randint(-max_dist, max_dist)))
+        gy = min(size - 1, max(0, sy + rng.randint(-max_dist, max_dist)))
+        if grid.is_walkable(gx, gy):
+            pairs.append((sx, sy, gx, gy))
+
+    path_ms: List[float] = []
+    found = 0
+    for sx, sy, gx, gy in pairs:
+        t0 = time.perf_counter()
+        path = find_path(grid, sx, sy, gx, gy)
+        path_ms.append((time.perf_counter() - t0) * 1000)
+        if path:
+            found += 1
+
+    validate_ms: List[float] = []
+    for sx, sy, gx, gy in pairs:
+        t0 = time.perf_counter()
+        validate_move(grid, sx, sy, gx, gy)
+        validate_ms.append((time.perf_counter() - t0) * 1000)
+
+    print(f"{size}x{size} (obstacles {obstacle_ratio:.0%}, distance <= {max_dist}, {queries} requêtes, {found} chemins trouvés)")
+    print(f"  find_path     : moy {statistics.mean(path_ms):.3f} ms | p50 {percentile(path_ms, 0.5):.3f} ms | p95 {percentile(path_ms, 0.95):.3f} ms | max {max(path_ms):.3f} ms")
+    print(f"  validate_move : moy {statistics.mean(validate_ms):.3f} ms | p50 {percentile(validate_ms, 0.5):.3f} ms | p95 {percentile(validate_ms, 0.95):.3f} ms | max {max(validate_ms):.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pathfinding serveur")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--obstacles", type=float, default=0.27, help="Densité d'obstacles (0.27 ≈ génération actuelle)")
+    parser.add_argument("--max-dist", type=int, default=30, help="Distance max départ/arrivée par axe")
+    args = parser.parse_args()
+
+    for size in (100, 1000):
+        run(size, args.queries, args.obstacles, args.max_dist)
+
+
+if __name__ == "__main__":
+    main()
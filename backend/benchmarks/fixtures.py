@@ -0,0 +1,66 @@
+"""
+Fixtures synthétiques des benchmarks — joueurs et maps à taille paramétrable.
+
+Déterministes (seed fixe) : deux exécutions mesurent exactement les mêmes données.
+"""
+
+import json
+import os
+import random
+from typing import Dict, Any, List
+
+from backend.gamestate import RoomState, GameState, _compute_water_tiles, _generate_world
+from backend.usermanager import UserManager
+
+ASSETS = ["tree", "rock", "cotton_bush", "clay_node", "apple_tree"]
+
+
+def synthetic_users(count: int, seed: int = 1) -> Dict[str, Any]:
+    """`count` joueurs (position, wallet, petit inventaire)."""
+    rng = random.Random(seed)
+    users = {}
+    for i in range(count):
+        user_id = f"bench_user_{i}"
+        users[user_id] = {
+            "id": user_id,
+            "x": rng.randint(0, 99),
+            "y": rng.randint(0, 99),
+            "wallet": {"wood": rng.randint(0, 500), "stone": rng.randint(0, 500)},
+            "inventory": {"apple": rng.randint(0, 20)},
+            "map_id": "farm_main",
+        }
+    return users
+
+
+def write_users_file(path: str, count: int, seed: int = 1) -> str:
+    """Ancien format users.json (un seul fichier) : mesure de la migration."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(synthetic_users(count, seed), f, indent=4)
+    return path
+
+
+def write_player_files(players_dir: str, count: int, seed: int = 1) -> str:
+    """`count` fiches joueur dans players_dir (format UserManager). Doit être le PLAYERS_DIR courant."""
+    os.makedirs(players_dir, exist_ok=True)
+    manager = UserManager()
+    for user_id, user in synthetic_users(count, seed).items():
+        manager.store(user_id, user)
+    return players_dir
+
+
+def synthetic_room(map_id: str = "bench_map", size: int = 100, seed: int = 42) -> RoomState:
+    """Room générée par l'algorithme réel, sur une grille size x size."""
+    water_tiles = _compute_water_tiles(seed, size)
+    resources = _generate_world(seed, water_tiles, size)
+    return RoomState(map_id, resources, size, size, seed, water_tiles)
+
+
+def synthetic_game_state(size: int = 100, seed: int = 42, map_id: str = "farm_main") -> GameState:
+    state = GameState()
+    state.maps[map_id] = synthetic_room(map_id, size, seed)
+    return state
+
+
+def resources_of(room: RoomState, asset: str) -> List[Dict[str, Any]]:
+    return [r for r in room.resources if r["asset"] == asset]
@@ -0,0 +1,298 @@
+"""
+Benchmark — Micro-benchmarks des fonctions chaudes (Perlin, génération, GameState, UserManager, présence).
+
+Chaque benchmark mesure une opération unitaire, répétée jusqu'à épuisement d'un budget de
+temps ; le résultat retenu est la médiane (ms par opération). Les baselines de référence
+sont stockées dans backend/benchmarks/baselines.json : --check signale toute opération plus
+lente que sa baseline au-delà du seuil (code de sortie 1).
+
+Toute modification de performance de ces modules s'accompagne d'un chiffre :
+    python -m backend.benchmarks.suite --check          # compare aux baselines
+    python -m backend.benchmarks.suite --save           # met à jour les baselines
+    python -m backend.benchmarks.suite --filter users --quick
+
+Les baselines dépendent de la machine : les régénérer (--save) avant de comparer ailleurs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from backend import usermanager
+from backend.perlin import Perlin
+from backend.gamestate import _compute_water_tiles, _generate_world, WORLD_SEED
+from backend.usermanager import UserManager
+from backend.presence import PresenceRoster
+from backend.benchmarks.fixtures import write_player_files, synthetic_game_state, resources_of
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Seuil de régression par défaut : +25 % sur la médiane
+DEFAULT_THRESHOLD = 0.25
+
+# Budget de mesure par benchmark (secondes) et bornes du nombre de répétitions
+TIME_BUDGET = 1.0
+MIN_RUNS = 3
+MAX_RUNS = 2000
+
+# Nombres de joueurs enregistrés mesurés (le dernier est ignoré en --quick)
+USER_COUNTS = (1_000, 10_000, 100_000)
+
+# Fabrique : prépare les fixtures et retourne l'opération à chronométrer
+Factory = Callable[[str], Callable[[], Any]]
+
+BENCHMARKS: List[Tuple[str, Factory, bool]] = []
+
+
+def benchmark(name: str, slow: bool = False):
+    """Enregistre une fabrique de benchmark ; `slow` l'exclut du mode --quick."""
+    def register(factory: Factory) -> Factory:
+        BENCHMARKS.append((name, factory, slow))
+        return factory
+    return register
+
+
+# ─────────────────── Génération ───────────────────
+
+@benchmark("perlin.noise[x1000]")
+def bench_perlin(workdir: str):
+    perlin = Perlin(WORLD_SEED)
+    points = [(x * 0.04, y * 0.04) for y in range(10) for x in range(100)]
+
+    def op():
+        for x, y in points:
+            perlin.noise(x, y)
+    return op
+
+
+@benchmark("gen.compute_water_tiles[100]")
+def bench_water_tiles(workdir: str):
+    return lambda: _compute_water_tiles(WORLD_SEED, 100)
+
+
+@benchmark("gen.generate_world[100]")
+def bench_generate_world(workdir: str):
+    water = _compute_water_tiles(WORLD_SEED, 100)
+    return lambda: _generate_world(WORLD_SEED, water, 100)
+
+
+@benchmark("gen.generate_world[300]", slow=True)
+def bench_generate_world_large(workdir: str):
+    water = _compute_water_tiles(WORLD_SEED, 300)
+    return lambda: _generate_world(WORLD_SEED, water, 300)
+
+
+# ─────────────────── GameState ───────────────────
+
+@benchmark("state.full_state_json[100]")
+def bench_full_state(workdir: str):
+    state = synthetic_game_state(100)
+    return lambda: json.dumps({"type": "WORLD_STATE", "payload": state.get_full_state("farm_main")})
+
+
+@benchmark("state.full_state_json[300]", slow=True)
+def bench_full_state_large(workdir: str):
+    state = synthetic_game_state(300)
+    return lambda: json.dumps({"type": "WORLD_STATE", "payload": state.get_full_state("farm_main")})
+
+
+@benchmark("state.add_remove_resource[100]")
+def bench_add_remove(workdir: str):
+    state = synthetic_game_state(100)
+    room = state.get_room("farm_main")
+    free = next((x, y) for y in range(100) for x in range(100)
+                if (x, y) not in room._spatial_index and room.walk_grid.is_walkable(x, y))
+
+    def op():
+        state.add_resource("path_stone", "floor", free[0], free[1], "farm_main")
+        state.remove_resource_at("farm_main", free[0], free[1])
+    return op
+
+
+@benchmark("state.harvest_resource[users=1000]")
+def bench_harvest(workdir: str):
+    users = _user_manager(workdir, 1_000)
+    state = synthetic_game_state(300)
+    trees = iter(resources_of(state.get_room("farm_main"), "tree"))
+    player = users.users["bench_user_0"]
+
+    def op():
+        tree = next(trees)
+        player["x"], player["y"] = tree["x"], tree["y"]
+        state.harvest_resource("bench_user_0", "farm_main", tree["id"], "axe", users)
+    return op
+
+
+# ─────────────────── UserManager ───────────────────
+
+def _user_manager(workdir: str, count: int) -> UserManager:
+    """UserManager sur `count` fiches joueur ; bench_user_0 est connecté (résident)."""
+    usermanager.USERS_FILE = os.path.join(workdir, "users.json")
+    usermanager.PLAYERS_DIR = os.path.join(workdir, f"players_{count}")
+    if not os.path.isdir(usermanager.PLAYERS_DIR):
+        write_player_files(usermanager.PLAYERS_DIR, count)
+    manager = UserManager()
+    manager.open_storage()
+    manager.claim("bench_user_0")
+    manager.get_or_create_user("bench_user_0")
+    return manager
+
+
+def _register_user_benchmarks():
+    for count in USER_COUNTS:
+        slow = count == USER_COUNTS[-1]
+
+        def open_factory(workdir: str, count=count):
+            manager = _user_manager(workdir, count)
+            return manager.open_storage
+        benchmark(f"users.open_storage[{count}]", slow)(open_factory)
+
+        def load_factory(workdir: str, count=count):
+            manager = _user_manager(workdir, count)
+            ids = [f"bench_user_{i}" for i in range(1, count)]
+
+            def op():
+                # Lecture à froid d'une fiche (connexion d'un joueur absent du cache)
+                user_id = ids[op.n % len(ids)]
+                op.n += 1
+                manager.users.pop(user_id, None)
+                manager.get_or_create_user(user_id)
+            op.n = 0
+            return op
+        benchmark(f"users.load_player[{count}]", slow)(load_factory)
+
+        def wallet_factory(workdir: str, count=count):
+            manager = _user_manager(workdir, count)
+            return lambda: manager.update_wallet("bench_user_0", "wood", 1)
+        benchmark(f"users.update_wallet[{count}]", slow)(wallet_factory)
+
+        def consume_factory(workdir: str, count=count):
+            manager = _user_manager(workdir, count)
+            manager.users["bench_user_0"]["wallet"] = {"wood": 10 ** 9, "stone": 10 ** 9}
+            return lambda: manager.consume_resources("bench_user_0", {"wood": 1, "stone": 1})
+        benchmark(f"users.consume_resources[{count}]", slow)(consume_factory)
+
+
+_register_user_benchmarks()
+
+
+# ─────────────────── Présence ───────────────────
+
+@benchmark("presence.join_burst[200]")
+def bench_join_burst(workdir: str):
+    ids = [f"bench_user_{i}" for i in range(200)]
+
+    def op():
+        # Rafale de connexions après redémarrage : chaque arrivant entre au roster puis le reçoit
+        roster = PresenceRoster()
+        for i, client_id in enumerate(ids):
+            roster.join("farm_main", client_id, i % 100, i // 100)
+            roster.players_message("farm_main")
+    return op
+
+
+# ─────────────────── Mesure & baselines ───────────────────
+
+def measure(op: Callable[[], Any], budget: float = TIME_BUDGET) -> Dict[str, Any]:
+    samples: List[float] = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < MIN_RUNS or (time.perf_counter() < deadline and len(samples) < MAX_RUNS):
+        t0 = time.perf_counter()
+        op()
+        samples.append((time.perf_counter() - t0) * 1000)
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+    }
+
+
+def load_baselines() -> Dict[str, Any]:
+    if not os.path.exists(BASELINES_FILE):
+        return {}
+    with open(BASELINES_FILE, "r") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baselines(results: Dict[str, Dict[str, Any]]):
+    merged = load_baselines()
+    merged.update({name: {"median_ms": r["median_ms"]} for name, r in results.items()})
+    with open(BASELINES_FILE, "w") as f:
+        json.dump({
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.machine()},
+            "results": dict(sorted(merged.items())),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def run(name_filter: Optional[str], quick: bool, budget: float) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    original_paths = usermanager.USERS_FILE, usermanager.PLAYERS_DIR
+    with tempfile.TemporaryDirectory(prefix="haven-bench-") as workdir:
+        try:
+            for name, factory, slow in BENCHMARKS:
+                if (name_filter and name_filter not in name) or (quick and slow):
+                    continue
+                results[name] = measure(factory(workdir), budget)
+                print(f"  {name:<40} {results[name]['median_ms']:>11.4f} ms  "
+                      f"(p95 {results[name]['p95_ms']:.4f}, {results[name]['runs']} runs)")
+        finally:
+            usermanager.USERS_FILE, usermanager.PLAYERS_DIR = original_paths
+    return results
+
+
+def check(results: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    """Benchmarks plus lents que leur baseline de plus de `threshold` (fraction)."""
+    baselines = load_baselines()
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"  {name:<40} pas de baseline")
+            continue
+        ratio = result["median_ms"] / baseline["median_ms"] if baseline["median_ms"] else 1.0
+        status = "RÉGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"  {name:<40} {ratio:>6.2f}x baseline  {status}")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks GameState / UserManager / Perlin")
+    parser.add_argument("--filter", help="Ne lance que les benchmarks dont le nom contient ce texte")
+    parser.add_argument("--quick", action="store_true", help="Ignore les tailles les plus coûteuses")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="Budget de mesure par benchmark (s)")
+    parser.add_argument("--save", action="store_true", help="Enregistre les résultats comme baselines")
+    parser.add_argument("--check", action="store_true", help="Compare aux baselines (code 1 si régression)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Ralentissement toléré avant régression (0.25 = +25 %%)")
+    args = parser.parse_args()
+
+    print("[Bench] Mesures (médiane par opération)")
+    results = run(args.filter, args.quick, args.budget)
+
+    regressions: List[str] = []
+    if args.check:
+        print(f"[Bench] Comparaison aux baselines (seuil +{args.threshold:.0%})")
+        regressions = check(results, args.threshold)
+        if regressions:
+            print(f"[Bench] {len(regressions)} régression(s) : {', '.join(regressions)}")
+        else:
+            print("[Bench] Aucune régression")
+    if args.save:
+        save_baselines(results)
+        print(f"[Bench] {len(results)} baseline(s) enregistrée(s) dans {BASELINES_FILE}")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
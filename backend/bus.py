@@ -0,0 +1,196 @@
+"""
+Bus de messages inter-workers — Pub/sub minimal pour le mode multi-processus.
+
+Chaque worker uvicorn possède un sous-ensemble des maps (voir backend/cluster.py) ;
+ce qui traverse les workers (présence globale, chat global, expulsions, transferts
+de joueurs) passe par un MessageBus :
+
+- LocalBus : en mémoire, pour un worker unique (ou plusieurs instances dans le même process).
+- UnixSocketBus : client d'un BusHub local joint par socket Unix (une ligne JSON par trame).
+
+Un message publié est livré à tous les abonnés du canal SAUF à l'émetteur.
+Remplacer ce module par un broker externe (Redis, NATS...) revient à implémenter MessageBus.
+
+Lancement du hub seul :
+    python -m backend.bus /tmp/haven-bus.sock
+"""
+
+import abc
+import argparse
+import asyncio
+import json
+import os
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Set
+
+from backend.log import get_logger
+
+log = get_logger("bus")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Délai avant une tentative de reconnexion au hub (secondes)
+RECONNECT_DELAY = 1.0
+
+
+class MessageBus(abc.ABC):
+    """Interface commune des bus (publication best-effort, sans persistance)."""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, channel: str, handler: Handler):
+        """Enregistre un handler async appelé avec `data` pour chaque message du canal."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def _dispatch(self, channel: str, data: Dict[str, Any]):
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(data)
+            except Exception as e:
+                log.error("Erreur du handler", channel=channel, error=repr(e))
+
+    @abc.abstractmethod
+    async def start(self):
+        ...
+
+    @abc.abstractmethod
+    async def stop(self):
+        ...
+
+    @abc.abstractmethod
+    async def publish(self, channel: str, data: Dict[str, Any]):
+        ...
+
+
+class LocalBus(MessageBus):
+    """Bus en mémoire : livre aux autres LocalBus partageant le même groupe."""
+
+    _default_group: List["LocalBus"] = []
+
+    def __init__(self, worker_id: int = 0, group: Optional[List["LocalBus"]] = None):
+        super().__init__(worker_id)
+        self._group = LocalBus._default_group if group is None else group
+
+    async def start(self):
+        self._group.append(self)
+
+    async def stop(self):
+        if self in self._group:
+            self._group.remove(self)
+
+    async def publish(self, channel: str, data: Dict[str, Any]):
+        for bus in list(self._group):
+            if bus is not self:
+                await bus._dispatch(channel, data)
+
+
+class UnixSocketBus(MessageBus):
+    """Client du BusHub. Reconnexion automatique ; les publications hors connexion sont perdues."""
+
+    def __init__(self, worker_id: int, path: str):
+        super().__init__(worker_id)
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def publish(self, channel: str, data: Dict[str, Any]):
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(_frame({"op": "pub", "channel": channel, "data": data}))
+            await self._writer.drain()
+        except (ConnectionError, OSError):
+            self._writer = None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                for channel in self._handlers:
+                    writer.write(_frame({"op": "sub", "channel": channel}))
+                await writer.drain()
+                self._writer = writer
+                log.info("Connecté au hub", worker=self.worker_id, path=self.path)
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    frame = json.loads(line)
+                    await self._dispatch(frame["channel"], frame["data"])
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, OSError, json.JSONDecodeError) as e:
+                log.warning("Hub injoignable", error=repr(e), retry_in=RECONNECT_DELAY)
+            self._writer = None
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+def _frame(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj) + "\n").encode("utf-8")
+
+
+class BusHub:
+    """Relais Unix socket : diffuse chaque publication aux autres connexions abonnées au canal."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._subscriptions: Dict[asyncio.StreamWriter, Set[str]] = {}
+
+    async def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        print(f"[Bus] Hub en écoute sur {self.path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._subscriptions[writer] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                if frame.get("op") == "sub":
+                    self._subscriptions[writer].add(frame["channel"])
+                elif frame.get("op") == "pub":
+                    await self._fan_out(writer, frame["channel"], line)
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self._subscriptions.pop(writer, None)
+            writer.close()
+
+    async def _fan_out(self, origin: asyncio.StreamWriter, channel: str, line: bytes):
+        for writer, channels in list(self._subscriptions.items()):
+            if writer is origin or channel not in channels:
+                continue
+            try:
+                writer.write(line)
+                await writer.drain()
+            except ConnectionError:
+                self._subscriptions.pop(writer, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hub pub/sub local (socket Unix) entre workers Haven")
+    parser.add_argument("path", help="Chemin du socket Unix")
+    args = parser.parse_args()
+    asyncio.run(BusHub(args.path).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
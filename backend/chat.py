@@ -0,0 +1,175 @@
+"""
+Chat — Canaux, historique borné et livraison groupée.
+
+Canaux (clé → audience) :
+- "map:<map_id>"    : joueurs de la map (diffusion journalisée, rejouée à la reprise de session)
+- "near:<map_id>"   : joueurs à moins de CHAT_RADIUS cases de l'émetteur au moment de l'envoi
+- "dm:<a>:<b>"      : conversation privée entre deux joueurs (ids triés)
+- "global"          : tous les joueurs, tous workers (bus "chat.global")
+
+Chaque canal garde ses HISTORY_SIZE derniers messages (deque bornée), servis au client quand
+il rejoint le jeu ou change de map (CHAT_HISTORY). Le canal de proximité n'a pas d'historique :
+son audience dépend des positions à l'instant de l'envoi.
+
+Un canal est "chargé" quand il reçoit plus de BUSY_THRESHOLD messages dans une fenêtre de
+BATCH_INTERVAL secondes : les messages suivants sont mis en attente et livrés en un seul
+CHAT_BATCH par intervalle, au lieu d'un envoi par message et par destinataire.
+Le ChatHub ne fait aucun envoi : main.py livre ce qu'il retourne.
+"""
+
+import os
+import time
+from collections import deque, OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# Messages conservés par canal
+HISTORY_SIZE = int(os.getenv("HAVEN_CHAT_HISTORY", "50"))
+
+# Période de livraison des messages en attente (secondes) = fenêtre de mesure du débit
+BATCH_INTERVAL = float(os.getenv("HAVEN_CHAT_BATCH_INTERVAL", "0.25"))
+
+# Messages par fenêtre au-delà desquels un canal passe en livraison groupée
+BUSY_THRESHOLD = int(os.getenv("HAVEN_CHAT_BUSY_THRESHOLD", "5"))
+
+# Portée du canal de proximité (cases)
+CHAT_RADIUS = float(os.getenv("HAVEN_CHAT_RADIUS", "12"))
+
+# Conversations privées gardées en mémoire (les moins récemment actives sont oubliées)
+MAX_DIRECT_CHANNELS = 10_000
+
+# Longueur max d'un message (au-delà : tronqué)
+MAX_TEXT_LENGTH = 500
+
+GLOBAL = "global"
+
+# Entrée en attente : (message, destinataires ; None = audience du canal)
+Pending = Tuple[Dict[str, Any], Optional[frozenset]]
+
+
+def map_channel(map_id: str) -> str:
+    return f"map:{map_id}"
+
+
+def near_channel(map_id: str) -> str:
+    return f"near:{map_id}"
+
+
+def direct_channel(a: str, b: str) -> str:
+    first, second = sorted((a, b))
+    return f"dm:{first}:{second}"
+
+
+def channel_kind(channel: str) -> str:
+    """Type du canal ("map", "near", "dm", "global"), repris dans le champ `channel` des messages."""
+    return channel.split(":", 1)[0]
+
+
+def clean_text(text: Any) -> Optional[str]:
+    """Texte du message, nettoyé et borné ; None s'il est vide ou n'est pas une chaîne."""
+    if not isinstance(text, str):
+        return None
+    text = text.strip()
+    return text[:MAX_TEXT_LENGTH] if text else None
+
+
+def group_by_recipient(entries: Iterable[Pending]) -> Dict[str, List[Dict[str, Any]]]:
+    """Messages à destinataires explicites, regroupés par destinataire (ordre conservé)."""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for message, recipients in entries:
+        for client_id in recipients or ():
+            grouped.setdefault(client_id, []).append(message)
+    return grouped
+
+
+class ChatHub:
+    def __init__(self, history_size: int = HISTORY_SIZE, busy_threshold: int = BUSY_THRESHOLD,
+                 window: float = BATCH_INTERVAL):
+        self.history_size = history_size
+        self.busy_threshold = busy_threshold
+        self.window = window
+        # canal → deque des derniers messages
+        self._history: Dict[str, deque] = {}
+        # Conversations privées, de la moins à la plus récemment active (éviction LRU)
+        self._direct: "OrderedDict[str, deque]" = OrderedDict()
+        # client_id → canaux privés auxquels il participe
+        self._conversations: Dict[str, Set[str]] = {}
+        # canal → (début de la fenêtre courante, messages reçus dans la fenêtre)
+        self._rates: Dict[str, Tuple[float, int]] = {}
+        # canal → messages en attente du prochain CHAT_BATCH
+        self._pending: Dict[str, List[Pending]] = {}
+
+    def post(self, channel: str, message: Dict[str, Any], recipients: Optional[Iterable[str]] = None) -> bool:
+        """
+        Enregistre un message. Retourne True s'il doit être livré tout de suite (CHAT_MESSAGE),
+        False s'il est mis en attente du prochain lot (canal chargé).
+        """
+        self._remember(channel, message)
+        now = time.monotonic()
+        started, count = self._rates.get(channel, (now, 0))
+        if now - started >= self.window:
+            started, count = now, 0
+        self._rates[channel] = (started, count + 1)
+
+        if channel in self._pending or count >= self.busy_threshold:
+            entry = (message, frozenset(recipients) if recipients is not None else None)
+            self._pending.setdefault(channel, []).append(entry)
+            return False
+        return True
+
+    def drain(self) -> Dict[str, List[Pending]]:
+        """Messages en attente, par canal (vidés) ; les débits périmés sont oubliés au passage."""
+        pending, self._pending = self._pending, {}
+        now = time.monotonic()
+        self._rates = {channel: rate for channel, rate in self._rates.items() if now - rate[0] < self.window}
+        return pending
+
+    def __getstate__(self):
+        # Snapshot de redémarrage (backend/handoff.py) : seul l'historique est conservé
+        state = dict(self.__dict__)
+        state["_rates"], state["_pending"] = {}, {}
+        return state
+
+    # ─────────────────── Historique ───────────────────
+
+    def _remember(self, channel: str, message: Dict[str, Any]):
+        kind = channel_kind(channel)
+        if kind == "near":
+            return
+        if kind == "dm":
+            history = self._direct.get(channel)
+            if history is None:
+                history = self._direct[channel] = deque(maxlen=self.history_size)
+                for participant in channel.split(":")[1:]:
+                    self._conversations.setdefault(participant, set()).add(channel)
+                if len(self._direct) > MAX_DIRECT_CHANNELS:
+                    self._forget_direct(next(iter(self._direct)))
+            self._direct.move_to_end(channel)
+        else:
+            history = self._history.get(channel)
+            if history is None:
+                history = self._history[channel] = deque(maxlen=self.history_size)
+        history.append(message)
+
+    def _forget_direct(self, channel: str):
+        del self._direct[channel]
+        for participant in channel.split(":")[1:]:
+            channels = self._conversations.get(participant)
+            if channels is not None:
+                channels.discard(channel)
+                if not channels:
+                    del self._conversations[participant]
+
+    def history(self, channel: str) -> List[Dict[str, Any]]:
+        source = self._direct if channel_kind(channel) == "dm" else self._history
+        return list(source.get(channel, ()))
+
+    def join_history(self, client_id: str, map_id: str) -> List[Dict[str, Any]]:
+        """
+        Historique servi à l'arrivée sur une map : canal global, canal de la map et
+        conversations privées du joueur, fusionnés par date (HISTORY_SIZE plus récents).
+        """
+        messages = self.history(GLOBAL) + self.history(map_channel(map_id))
+        for channel in self._conversations.get(client_id, ()):
+            messages.extend(self._direct[channel])
+        messages.sort(key=lambda m: m.get("timestamp", 0))
+        return messages[-self.history_size:]
@@ -0,0 +1,121 @@
+"""
+Cluster — Répartition des maps entre plusieurs workers uvicorn.
+
+Chaque process worker possède un sous-ensemble des maps (rooms, journal d'événements,
+sessions WebSocket des joueurs présents sur ces maps). Un client connecté au mauvais
+worker reçoit REDIRECT vers le worker propriétaire de sa map.
+
+Configuration (variables d'environnement, lues au démarrage de chaque worker) :
+- HAVEN_WORKER_ID : index de ce worker (défaut 0)
+- HAVEN_WORKERS   : URLs WebSocket publiques des workers, séparées par des virgules
+                    (défaut : un seul worker, ws://localhost:8000)
+- HAVEN_SHARD_MAP : affectations forcées "map_id=index,..." (sinon hash stable du map_id)
+- HAVEN_BUS       : chemin du socket Unix du BusHub (vide → LocalBus, worker unique)
+
+Lancement local de N workers + hub :
+    python -m backend.cluster --workers 2 --base-port 8001
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+from backend.bus import MessageBus, LocalBus, UnixSocketBus
+
+DEFAULT_WORKER_URL = "ws://localhost:8000"
+
+
+class ShardMap:
+    """Propriétaire de chaque map : affectation explicite, sinon crc32(map_id) modulo le nombre de workers."""
+
+    def __init__(self, worker_id: int, worker_urls: List[str], overrides: Dict[str, int] = None):
+        self.worker_id = worker_id
+        self.worker_urls = worker_urls
+        self.overrides = overrides or {}
+
+    @classmethod
+    def from_env(cls) -> "ShardMap":
+        urls = [u.strip() for u in os.getenv("HAVEN_WORKERS", DEFAULT_WORKER_URL).split(",") if u.strip()]
+        overrides: Dict[str, int] = {}
+        for entry in os.getenv("HAVEN_SHARD_MAP", "").split(","):
+            if "=" in entry:
+                map_id, index = entry.split("=", 1)
+                overrides[map_id.strip()] = int(index)
+        return cls(int(os.getenv("HAVEN_WORKER_ID", "0")), urls, overrides)
+
+    @property
+    def clustered(self) -> bool:
+        return len(self.worker_urls) > 1
+
+    def owner(self, map_id: str) -> int:
+        if map_id in self.overrides:
+            return self.overrides[map_id] % len(self.worker_urls)
+        return zlib.crc32(map_id.encode("utf-8")) % len(self.worker_urls)
+
+    def is_local(self, map_id: str) -> bool:
+        return self.owner(map_id) == self.worker_id
+
+    def url_for(self, map_id: str) -> str:
+        return self.worker_urls[self.owner(map_id)]
+
+
+def create_bus(worker_id: int) -> MessageBus:
+    path = os.getenv("HAVEN_BUS", "")
+    if path:
+        return UnixSocketBus(worker_id, path)
+    return LocalBus(worker_id)
+
+
+# ─────────────────── Lanceur local ───────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Lance un hub de bus + N workers Haven (un process par worker)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8001)
+    parser.add_argument("--public-host", default="localhost", help="Hôte utilisé dans les URLs de REDIRECT")
+    parser.add_argument("--shard-map", default="", help='Affectations forcées, ex: "farm_main=0,housing_hub_1=1"')
+    args = parser.parse_args()
+
+    bus_path = os.path.join(tempfile.gettempdir(), f"haven-bus-{os.getpid()}.sock")
+    urls = [f"ws://{args.public_host}:{args.base_port + i}" for i in range(args.workers)]
+
+    procs = [subprocess.Popen([sys.executable, "-m", "backend.bus", bus_path])]
+    time.sleep(0.5)  # Laisse le hub créer son socket avant la connexion des workers
+
+    for i in range(args.workers):
+        env = dict(os.environ,
+                   HAVEN_WORKER_ID=str(i),
+                   HAVEN_WORKERS=",".join(urls),
+                   HAVEN_SHARD_MAP=args.shard_map,
+                   HAVEN_BUS=bus_path)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app",
+             "--host", args.host, "--port", str(args.base_port + i)],
+            env=env,
+        ))
+        print(f"[Cluster] Worker {i} → {urls[i]}")
+
+    try:
+        while all(p.poll() is None for p in procs):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.send_signal(signal.SIGTERM)
+        for p in procs:
+            p.wait()
+        if os.path.exists(bus_path):
+            os.unlink(bus_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,25 +2,49 @@
 Configuration de la base de données PostgreSQL (SQLAlchemy + asyncpg)
 """
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+from typing import Optional
 
 # Variables de connexion SQLite Asynchrone
 DATABASE_URL = "sqlite+aiosqlite:///./haven.db"
 
-# Create the async engine
-engine = create_async_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+# Journal SQL désactivé par défaut (une ligne par requête sur stdout) : HAVEN_SQL_ECHO=1 pour le réactiver
+SQL_ECHO = os.getenv("HAVEN_SQL_ECHO", "0") == "1"
 
-# Create the async session factory
-async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+# Moteur et fabrique de sessions créés au premier usage (l'import du module reste gratuit)
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[sessionmaker] = None
 
 # Base class for the declarative models
 Base = declarative_base()
 
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO, connect_args={"check_same_thread": False})
+    return _engine
+
+
+def get_session_factory() -> sessionmaker:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _session_factory
+
+
+async def dispose_engine():
+    """Ferme les connexions du pool (arrêt du serveur)."""
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
+
+
 async def get_db():
     """ Dependency used in FastAPI to get the database session """
-    async with async_session() as session:
+    async with get_session_factory()() as session:
         yield session
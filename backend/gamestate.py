@@ -10,9 +10,19 @@ import time
 import random
 import math
 import os
-from typing import List, Dict, Any, Optional, Set, Union
+import heapq
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Set, Union, Callable
 
 from backend.perlin import Perlin
+from backend.spatial import SpatialGrid, BUCKET_SIZE
+from backend import pathfinding
+from backend.pathfinding import WalkGrid
+from backend.log import get_logger
+
+log = get_logger("world")
 
 
 # ─────────────────── Configuration Génération ───────────────────
@@ -49,6 +59,67 @@ WORLD_SEED = 42
 PERLIN_SCALE = 0.04
 WATER_THRESHOLD = 0.3
 
+# Pas d'eau dans le carré [0, SPAWN_DRY_ZONE[ x [0, SPAWN_DRY_ZONE[ (même logique que le client)
+SPAWN_DRY_ZONE = 10
+
+# Identifiant de l'algorithme de génération, transmis dans WORLD_SEED_DIFF.
+# À incrémenter à toute modification de _compute_water_tiles / _generate_world
+# (et régénérer shared/generation-vectors.json).
+GENERATOR_VERSION = "perlin_v1"
+
+
+def generation_params() -> Dict[str, Any]:
+    """Paramètres de génération nécessaires au client pour reconstruire la carte de base."""
+    return {
+        "map_size": MAP_SIZE,
+        "safe_zone": [SAFE_ZONE_MIN_X, SAFE_ZONE_MAX_X, SAFE_ZONE_MIN_Y, SAFE_ZONE_MAX_Y],
+        "house": [HOUSE_X, HOUSE_Y, HOUSE_W, HOUSE_H],
+        "spawn_dry_zone": SPAWN_DRY_ZONE,
+        "perlin_scale": PERLIN_SCALE,
+        "water_threshold": WATER_THRESHOLD,
+        "rules": GENERATION_RULES,
+    }
+
+
+# ─────────────────── Repousse des ressources ───────────────────
+
+# Délai (secondes) avant qu'une ressource récoltée repousse sur sa case d'origine.
+# Seuls les assets listés ici repoussent (les constructions joueur ne reviennent pas).
+RESPAWN_DELAYS: Dict[str, float] = {
+    "tree":        300.0,
+    "rock":        600.0,
+    "cotton_bush": 120.0,
+    "clay_node":   600.0,
+}
+
+# Temps de recharge d'un pommier après une cueillette (l'arbre reste en place)
+APPLE_TREE_COOLDOWN = 60.0
+
+# Assets ciblables par la récolte automatique (les constructions joueur sont exclues)
+HARVESTABLE_ASSETS = {"tree", "rock", "cotton_bush", "clay_node", "apple_tree"}
+
+# Outil requis par asset : (outil, message de refus). Les assets absents se récoltent à la main.
+REQUIRED_TOOLS: Dict[str, tuple] = {
+    "tree":       ("axe",     "Outil inadapté. Hache requise."),
+    "rock":       ("pickaxe", "Outil inadapté. Pioche requise."),
+    "clay_node":  ("shovel",  "Outil inadapté. Pelle requise."),
+    "clay_mound": ("shovel",  "Outil inadapté. Pelle requise."),
+}
+
+# ─────────────────── Streaming par chunks ───────────────────
+
+# Côté d'un chunk en tuiles — aligné sur les buckets de l'index spatial (1 chunk = 1 bucket)
+CHUNK_SIZE = BUCKET_SIZE
+
+# Rayon (en chunks, distance de Tchebychev) envoyé autour de la position du joueur
+VIEW_RADIUS_CHUNKS = 1
+
+# Distance maximale (en tuiles) entre le joueur et la ressource récoltée
+MAX_HARVEST_DIST = 3.0
+
+# Si la case est occupée au moment de la repousse (construction, etc.), on réessaie plus tard
+RESPAWN_RETRY_DELAY = 30.0
+
 
 # ─────────────────── Helpers ───────────────────
 
@@ -58,13 +129,21 @@ def _is_in_safe_zone(x: int, y: int) -> bool:
             SAFE_ZONE_MIN_Y <= y <= SAFE_ZONE_MAX_Y)
 
 
+def _tool_error(asset: str, equipped_tool: str) -> Optional[str]:
+    """Retourne le message de refus si l'outil équipé ne permet pas de récolter l'asset."""
+    required = REQUIRED_TOOLS.get(asset)
+    if required and equipped_tool != required[0]:
+        return required[1]
+    return None
+
+
 def _is_in_house(x: int, y: int) -> bool:
     """Vérifie si la case est dans la zone de la maison."""
     return (HOUSE_X <= x < HOUSE_X + HOUSE_W and
             HOUSE_Y <= y < HOUSE_Y + HOUSE_H)
 
 
-def _compute_water_tiles(seed: int) -> Set[tuple]:
+def _compute_water_tiles(seed: int, size: int = MAP_SIZE) -> Set[tuple]:
     """
     Pré-calcule l'ensemble des tuiles d'eau via Perlin Noise.
     Reproduit la logique du MapManager.generateTerrain() côté client.
@@ -74,13 +153,13 @@ def _compute_water_tiles(seed: int) -> Set[tuple]:
     perlin = Perlin(seed)
     water_tiles: Set[tuple] = set()
 
-    for y in range(MAP_SIZE):
-        for x in range(MAP_SIZE):
+    for y in range(size):
+        for x in range(size):
             # Zone protégée (maison)
             if _is_in_house(x, y):
                 continue
             # Zone de départ protégée (pas d'eau au spawn — même logique que le client)
-            if x < 10 and y < 10:
+            if x < SPAWN_DRY_ZONE and y < SPAWN_DRY_ZONE:
                 continue
 
             noise_value = perlin.noise(x * PERLIN_SCALE, y * PERLIN_SCALE)
@@ -89,23 +168,24 @@ def _compute_water_tiles(seed: int) -> Set[tuple]:
             if normalized < WATER_THRESHOLD:
                 water_tiles.add((x, y))
 
-    print(f"[GameState] Terrain calculé : {len(water_tiles)} tuile(s) d'eau détectée(s).")
+    log.debug("Terrain calculé", seed=seed, water_tiles=len(water_tiles))
     return water_tiles
 
 
-def _generate_world(seed: int) -> List[Dict[str, Any]]:
+def _generate_world(seed: int, water_tiles: Optional[Set[tuple]] = None, size: int = MAP_SIZE) -> List[Dict[str, Any]]:
     """
     Génère la liste des ressources du monde avec une seed déterministe.
 
     Algorithme :
     - Pré-calcule les tuiles d'eau via Perlin (session 9.4)
-    - Parcourt chaque case de la grille 100x100
+    - Parcourt chaque case de la grille size x size (MAP_SIZE par défaut ; autre taille : benchmarks)
     - Skip les zones protégées (spawn + maison + eau)
     - Applique les règles de génération en cascade (tirage unique par case)
     - Retourne une liste compacte de dicts {id, asset, type, x, y}
     """
-    # Pré-calcul des tuiles d'eau
-    water_tiles = _compute_water_tiles(seed)
+    # Pré-calcul des tuiles d'eau (sauf si l'appelant les a déjà calculées)
+    if water_tiles is None:
+        water_tiles = _compute_water_tiles(seed, size)
 
     rng = random.Random(seed)
     resources: List[Dict[str, Any]] = []
@@ -113,10 +193,10 @@ def _generate_world(seed: int) -> List[Dict[str, Any]]:
     # Index de position pour détection de collision O(1) lors de la construction
     occupied: set = set()
 
-    print(f"[GameState] Génération du monde (seed={seed}, taille={MAP_SIZE}x{MAP_SIZE})...")
+    log.debug("Génération du monde", seed=seed, size=size)
 
-    for y in range(MAP_SIZE):
-        for x in range(MAP_SIZE):
+    for y in range(size):
+        for x in range(size):
 
             # Skip zones protégées
             if _is_in_safe_zone(x, y) or _is_in_house(x, y):
@@ -146,40 +226,198 @@ def _generate_world(seed: int) -> List[Dict[str, Any]]:
                         occupied.add(key)
                     break  # Une seule ressource par case
 
-    print(f"[GameState] Monde généré : {len(resources)} ressource(s) placée(s).")
+    log.info("Monde généré", seed=seed, resources=len(resources))
     return resources
 
 
 WORLD_FILE = os.path.join("backend", "data", "world.json")
 
 class RoomState:
-    def __init__(self, map_id: str, resources: List[Dict[str, Any]], width: int = 100, height: int = 100, seed: int = WORLD_SEED):
+    def __init__(self, map_id: str, resources: List[Dict[str, Any]], width: int = 100, height: int = 100, seed: int = WORLD_SEED,
+                 water_tiles: Optional[Set[tuple]] = None, generator: str = GENERATOR_VERSION):
         self.map_id = map_id
         self.resources = resources
         self.width = width
         self.height = height
         self.seed = seed
-        self._spatial_index: Dict[tuple, Dict[str, Any]] = {
-            (r["x"], r["y"]): r for r in self.resources
+        # Index spatial par buckets : lookup exact O(1) + requêtes rectangle/rayon/plus proche
+        self._spatial_index = SpatialGrid(self.resources)
+        # Index par id pour les actions ciblées (récolte)
+        self._id_index: Dict[str, Dict[str, Any]] = {r["id"]: r for r in self.resources}
+        # Grille de collision serveur (eau + obstacles), tenue à jour par add / remove_at
+        self.walk_grid = WalkGrid(width, height, water_tiles or (), self.resources)
+        # Version de la room (incrémentée à chaque mutation) et version de chaque chunk
+        # (= version de la room lors de sa dernière modification, 0 si jamais modifié).
+        # Les versions ne valent que pour cette instance : `epoch` (tiré à la création, conservé par
+        # le snapshot de redémarrage) change à chaque génération, régénération ou redémarrage à froid.
+        self.version = 0
+        self.epoch = os.urandom(6).hex()
+        self._chunk_versions: Dict[tuple, int] = {}
+        # Payload JSON sérialisé par chunk : (cx, cy) → (version, json)
+        self._chunk_cache: Dict[tuple, tuple] = {}
+        # Diff par rapport à la génération déterministe (sync WORLD_SEED_DIFF) :
+        # les ressources fournies à la construction forment la base reproductible par le client.
+        self.generator = generator
+        self._baseline_ids: Set[str] = {r["id"] for r in self.resources}
+        self._removed_baseline: Set[str] = set()
+        self._added: Dict[str, Dict[str, Any]] = {}
+        # Échéancier unique de la room : tas de (échéance, seq, kind, ressource).
+        # kind = "respawn" (repousse) | "apple_ready" (pommier rechargé).
+        self._timers: List[tuple] = []
+        self._timer_seq = 0
+        # Pommiers en recharge : id → timestamp de disponibilité
+        self._apple_cooldowns: Dict[str, float] = {}
+
+    def add(self, res: Dict[str, Any]) -> bool:
+        """Insère une ressource dans la liste et les index. Retourne False si la case est occupée."""
+        key = (res["x"], res["y"])
+        if key in self._spatial_index:
+            return False
+        self.resources.append(res)
+        self._spatial_index[key] = res
+        self._id_index[res["id"]] = res
+        self.walk_grid.on_resource_added(res)
+        self._touch(res["x"], res["y"])
+        if res["id"] in self._baseline_ids:
+            self._removed_baseline.discard(res["id"])  # Repousse : retour à l'état de base
+        else:
+            self._added[res["id"]] = res
+        return True
+
+    def remove_at(self, x: int, y: int) -> Optional[Dict[str, Any]]:
+        """Retire la ressource de la case (x, y) de la liste et des index."""
+        res = self._spatial_index.pop((x, y), None)
+        if res is not None:
+            self._id_index.pop(res["id"], None)
+            self.walk_grid.on_resource_removed(res)
+            self._touch(x, y)
+            if res["id"] in self._baseline_ids:
+                self._removed_baseline.add(res["id"])
+            else:
+                self._added.pop(res["id"], None)
+            try:
+                self.resources.remove(res)
+            except ValueError:
+                pass  # Déjà absent — incohérence ignorée silencieusement
+        return res
+
+    def _touch(self, x: int, y: int):
+        """Marque le chunk contenant (x, y) comme modifié."""
+        self.version += 1
+        self._chunk_versions[(x // CHUNK_SIZE, y // CHUNK_SIZE)] = self.version
+
+    def chunk_version(self, cx: int, cy: int) -> int:
+        return self._chunk_versions.get((cx, cy), 0)
+
+    def get_chunk_payload(self, cx: int, cy: int) -> str:
+        """
+        Payload JSON compact d'un chunk, mis en cache jusqu'à sa prochaine modification.
+        Format : {cx, cy, version, assets: [...], types: [...], rows: [[asset_idx, type_idx, x, y, id?], ...]}
+        L'id n'est transmis que s'il diffère de l'id généré "{asset}_{x}_{y}".
+        """
+        key = (cx, cy)
+        version = self._chunk_versions.get(key, 0)
+        cached = self._chunk_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        assets: List[str] = []
+        types: List[str] = []
+        rows: List[list] = []
+        for res in self._spatial_index.query_rect(x0, y0, x0 + CHUNK_SIZE - 1, y0 + CHUNK_SIZE - 1):
+            asset, obj_type = res["asset"], res["type"]
+            if asset not in assets:
+                assets.append(asset)
+            if obj_type not in types:
+                types.append(obj_type)
+            row = [assets.index(asset), types.index(obj_type), res["x"], res["y"]]
+            if res["id"] != f"{asset}_{res['x']}_{res['y']}":
+                row.append(res["id"])
+            rows.append(row)
+
+        payload = json.dumps({
+            "cx": cx, "cy": cy, "version": version,
+            "assets": assets, "types": types, "rows": rows,
+        }, separators=(",", ":"))
+        self._chunk_cache[key] = (version, payload)
+        return payload
+
+    def chunks_around(self, x: float, y: float, radius: int = VIEW_RADIUS_CHUNKS) -> List[tuple]:
+        """Clés des chunks dans le rayon donné autour de (x, y), bornées à la carte."""
+        max_cx = (self.width - 1) // CHUNK_SIZE
+        max_cy = (self.height - 1) // CHUNK_SIZE
+        # Position hors carte (ancienne sauvegarde) : on se rabat sur le bord le plus proche
+        ccx = min(max(int(x) // CHUNK_SIZE, 0), max_cx)
+        ccy = min(max(int(y) // CHUNK_SIZE, 0), max_cy)
+        return [
+            (cx, cy)
+            for cy in range(max(0, ccy - radius), min(max_cy, ccy + radius) + 1)
+            for cx in range(max(0, ccx - radius), min(max_cx, ccx + radius) + 1)
+        ]
+
+    def seed_diff(self) -> Dict[str, Any]:
+        """Écart entre l'état courant et la génération de base : ids générés retirés + objets ajoutés."""
+        return {
+            "removed": sorted(self._removed_baseline),
+            "added": list(self._added.values()),
         }
 
+    def all_chunk_keys(self) -> List[tuple]:
+        return [
+            (cx, cy)
+            for cy in range((self.height + CHUNK_SIZE - 1) // CHUNK_SIZE)
+            for cx in range((self.width + CHUNK_SIZE - 1) // CHUNK_SIZE)
+        ]
+
+    def schedule(self, due_at: float, kind: str, resource: Dict[str, Any]):
+        """Planifie un événement temporisé pour cette room — O(log n)."""
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (due_at, self._timer_seq, kind, resource))
+
+    def pop_due_timers(self, now: float) -> List[tuple]:
+        """Dépile les événements arrivés à échéance (le tas n'est jamais parcouru en entier)."""
+        due = []
+        while self._timers and self._timers[0][0] <= now:
+            due_at, _, kind, resource = heapq.heappop(self._timers)
+            due.append((kind, resource))
+        return due
+
 def generate_room_state(map_id: str, seed: int) -> RoomState:
     if map_id.startswith("housing_"):
-        return RoomState(map_id, [], 30, 30, seed)
+        return RoomState(map_id, [], 30, 30, seed, generator="empty")
     else:
-        resources = _generate_world(seed)
-        return RoomState(map_id, resources, 100, 100, seed)
+        water_tiles = _compute_water_tiles(seed)
+        resources = _generate_world(seed, water_tiles)
+        return RoomState(map_id, resources, 100, 100, seed, water_tiles)
+
+# Pool de processus dédié à la génération (Perlin + RNG) pour ne pas bloquer la boucle asyncio.
+# Créé à la première régénération, fermé à l'arrêt du serveur.
+_generation_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_generation_pool() -> ProcessPoolExecutor:
+    global _generation_pool
+    if _generation_pool is None:
+        _generation_pool = ProcessPoolExecutor(max_workers=1)
+    return _generation_pool
+
+
+def shutdown_generation_pool():
+    global _generation_pool
+    if _generation_pool is not None:
+        _generation_pool.shutdown(wait=False, cancel_futures=True)
+        _generation_pool = None
+
 
 class GameState:
     def __init__(self):
         """Initialise l'état du monde avec génération procédurale multi-maps."""
         self.maps: Dict[str, RoomState] = {}
-        
-        self.maps["farm_main"] = generate_room_state("farm_main", WORLD_SEED)
-        self.maps["housing_hub_1"] = generate_room_state("housing_hub_1", WORLD_SEED)
-        
+        # Maps en cours de régénération (évite deux générations concurrentes de la même room)
+        self._regenerating: Set[str] = set()
+        # Les rooms sont générées au premier accès (get_room) ou préchauffées au démarrage (load_room_async)
 
-        
     def save_world(self):
         """[WIP] Legacy save not fully supported with Multi-Map yet."""
         pass 
@@ -195,12 +433,28 @@ class GameState:
 
     # ─────────────────── Lecture ───────────────────
 
-    def get_full_state(self, map_id: str = "farm_main") -> Dict[str, Any]:
-        """Retourne l'état complet du monde pour synchronisation initiale pour la room spécifiée."""
+    def get_room(self, map_id: str) -> RoomState:
+        """Retourne la room, générée à la volée si elle n'existe pas encore."""
         if map_id not in self.maps:
             self.maps[map_id] = generate_room_state(map_id, WORLD_SEED)
-            
-        room = self.maps[map_id]
+        return self.maps[map_id]
+
+    async def load_room_async(self, map_id: str) -> RoomState:
+        """Génère la room dans le process de génération si elle n'est pas encore chargée."""
+        if map_id not in self.maps:
+            if map_id.startswith("housing_"):
+                # Instance vide : générée sur place, sans aller-retour vers le process de génération
+                room = generate_room_state(map_id, WORLD_SEED)
+            else:
+                loop = asyncio.get_running_loop()
+                room = await loop.run_in_executor(get_generation_pool(), generate_room_state, map_id, WORLD_SEED)
+            # Un get_room() concurrent a pu la générer entre-temps : la première version gagne
+            self.maps.setdefault(map_id, room)
+        return self.maps[map_id]
+
+    def get_full_state(self, map_id: str = "farm_main") -> Dict[str, Any]:
+        """Retourne l'état complet du monde pour synchronisation initiale pour la room spécifiée."""
+        room = self.get_room(map_id)
         return {
             "map_id": room.map_id,
             "width": room.width,
@@ -209,6 +463,54 @@ class GameState:
             "resources": room.resources
         }
         
+    def get_world_meta(self, map_id: str) -> Dict[str, Any]:
+        """En-tête du mode streaming : dimensions, seed et taille de chunk, sans les ressources."""
+        room = self.get_room(map_id)
+        return {
+            "map_id": room.map_id,
+            "width": room.width,
+            "height": room.height,
+            "seed": room.seed,
+            "chunk_size": CHUNK_SIZE,
+            "version": room.version,
+            "epoch": room.epoch,
+        }
+
+    def get_seed_diff_state(self, map_id: str) -> Dict[str, Any]:
+        """
+        Sync minimale : seed + paramètres de génération + diff par rapport à la carte de base.
+        Le client régénère la base avec le même algorithme (game/utils/WorldGenerator.ts).
+        Sur une carte intacte, removed et added sont vides.
+        """
+        room = self.get_room(map_id)
+        state = {
+            "map_id": room.map_id,
+            "width": room.width,
+            "height": room.height,
+            "seed": room.seed,
+            "generator": room.generator,
+            "version": room.version,
+        }
+        if room.generator == GENERATOR_VERSION:
+            state["params"] = generation_params()
+        state.update(room.seed_diff())
+        return state
+
+    def get_chunk_payload(self, map_id: str, cx: int, cy: int) -> str:
+        """Payload JSON (mis en cache) du chunk (cx, cy)."""
+        return self.get_room(map_id).get_chunk_payload(cx, cy)
+
+    def get_chunk_versions(self, map_id: str, keys: List[tuple], epoch: Any) -> Dict[tuple, int]:
+        """Versions courantes des chunks demandés ; vide si `epoch` n'est pas celle de la room (versions périmées)."""
+        room = self.get_room(map_id)
+        if epoch != room.epoch:
+            return {}
+        return {key: room.chunk_version(*key) for key in keys}
+
+    def chunks_in_view(self, map_id: str, x: float, y: float) -> List[tuple]:
+        """Chunks à envoyer à un joueur situé en (x, y)."""
+        return self.get_room(map_id).chunks_around(x, y)
+
     def regenerate_room(self, map_id: str = "farm_main") -> Dict[str, Any]:
         """Regenerate the entire room with a new seed and return the new state."""
         import random
@@ -217,12 +519,105 @@ class GameState:
         self.maps[map_id] = generate_room_state(map_id, new_seed)
         return self.get_full_state(map_id)
 
+    async def regenerate_room_async(self, map_id: str = "farm_main") -> Optional[Dict[str, Any]]:
+        """
+        Régénère la room dans un processus de travail, puis remplace l'ancienne d'un bloc.
+        L'ancienne room reste servie pendant la génération.
+        Retourne le nouvel état, ou None si une régénération est déjà en cours pour cette map.
+        """
+        if map_id in self._regenerating:
+            return None
+
+        self._regenerating.add(map_id)
+        try:
+            new_seed = random.randint(1, 1000000)
+            loop = asyncio.get_running_loop()
+            new_room = await loop.run_in_executor(get_generation_pool(), generate_room_state, map_id, new_seed)
+            # Swap atomique : aucune attente entre la fin de la génération et l'installation
+            self.maps[map_id] = new_room
+        finally:
+            self._regenerating.discard(map_id)
+        return self.get_full_state(map_id)
+
     def get_resource_at(self, map_id: str, x: int, y: int) -> Optional[Dict[str, Any]]:
         """Retourne la ressource à (x, y) ou None — O(1) grâce à l'index spatial."""
         if map_id not in self.maps:
             return None
         return self.maps[map_id]._spatial_index.get((x, y))
 
+    def get_resources_in_rect(self, map_id: str, x0: int, y0: int, x1: int, y1: int) -> List[Dict[str, Any]]:
+        """Ressources dans le rectangle [x0, x1] x [y0, y1] — ne visite que les buckets recouverts."""
+        room = self.maps.get(map_id)
+        if not room:
+            return []
+        return room._spatial_index.query_rect(x0, y0, x1, y1)
+
+    def get_resources_in_radius(self, map_id: str, x: float, y: float, radius: float) -> List[Dict[str, Any]]:
+        """Ressources à une distance <= radius de (x, y)."""
+        room = self.maps.get(map_id)
+        if not room:
+            return []
+        return room._spatial_index.query_radius(x, y, radius)
+
+    def find_nearest_resource(self, map_id: str, x: float, y: float, asset: Optional[str] = None,
+                              radius: float = MAX_HARVEST_DIST,
+                              predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ressource la plus proche de (x, y) dans le rayon donné, optionnellement filtrée par asset.
+        Ex : find_nearest_resource("farm_main", px, py, asset="tree", radius=3)
+        """
+        room = self.maps.get(map_id)
+        if not room:
+            return None
+
+        def accept(res: Dict[str, Any]) -> bool:
+            if asset is not None and res.get("asset") != asset:
+                return False
+            return predicate is None or predicate(res)
+
+        return room._spatial_index.nearest(x, y, radius, accept)
+
+    # ─────────────────── Déplacements ───────────────────
+
+    def validate_move(self, map_id: str, from_x: float, from_y: float, to_x: int, to_y: int) -> bool:
+        """Vérifie qu'une destination est marchable et atteignable depuis la position connue du joueur."""
+        room = self.maps.get(map_id)
+        if not room:
+            return False
+        return pathfinding.validate_move(room.walk_grid, from_x, from_y, to_x, to_y)
+
+    def spawn_point(self, map_id: str, spawn: tuple) -> tuple:
+        """Case libre la plus proche du point d'arrivée `spawn` (qui peut être sur l'eau ou une ressource)."""
+        room = self.maps.get(map_id)
+        if not room:
+            return spawn
+        grid = room.walk_grid
+        return grid.nearest_walkable(spawn[0], spawn[1], max(grid.width, grid.height)) or spawn
+
+    def walkable_position(self, map_id: str, x: float, y: float, spawn: tuple) -> Optional[tuple]:
+        """
+        Case où replacer un joueur dont la position est bloquée ou hors carte : la case libre la
+        plus proche (autour de `spawn` si la position est hors carte : ancienne sauvegarde), ou
+        None si (x, y) est déjà marchable (ou si la carte n'a aucune case libre).
+        """
+        room = self.maps.get(map_id)
+        if not room:
+            return None
+        grid = room.walk_grid
+        start_x, start_y = int(round(x)), int(round(y))
+        if grid.is_walkable(start_x, start_y):
+            return None
+        if not grid.in_bounds(start_x, start_y):
+            return self.spawn_point(map_id, spawn)
+        return grid.nearest_walkable(start_x, start_y, max(grid.width, grid.height))
+
+    def compute_path(self, map_id: str, from_x: int, from_y: int, to_x: int, to_y: int) -> Optional[List[tuple]]:
+        """Calcule un chemin serveur [(x, y), ...] entre deux cases, ou None si inaccessible."""
+        room = self.maps.get(map_id)
+        if not room:
+            return None
+        return pathfinding.find_path(room.walk_grid, from_x, from_y, to_x, to_y)
+
     # ─────────────────── Écriture ───────────────────
 
     def remove_resource_at(self, map_id: str, x: int, y: int) -> Optional[Dict[str, Any]]:
@@ -234,14 +629,7 @@ class GameState:
         room = self.maps.get(map_id)
         if not room:
             return None
-            
-        res = room._spatial_index.pop((x, y), None)
-        if res is not None:
-            try:
-                room.resources.remove(res)
-            except ValueError:
-                pass  # Déjà absent — incohérence ignorée silencieusement
-        return res
+        return room.remove_at(x, y)
 
     def harvest_resource(self, player_id: str, map_id: str, resource_id: str, equipped_tool: str, user_manager: Any) -> Optional[Union[tuple[Dict[str, Any], Dict[str, int], Dict[str, int]], str]]:
         """
@@ -257,7 +645,7 @@ class GameState:
         if not room:
             return "Carte introuvable."
 
-        target = next((r for r in room.resources if r["id"] == resource_id), None)
+        target = room._id_index.get(resource_id)
         if not target:
             return "Ressource introuvable."
 
@@ -265,18 +653,20 @@ class GameState:
         asset  = target.get("asset", "")
 
         dist = math.hypot(px - rx, py - ry)
-        MAX_HARVEST_DIST = 3.0
         if dist > MAX_HARVEST_DIST:
             return "Cible trop éloignée."
 
-        if asset == "tree" and equipped_tool != "axe":
-            return "Outil inadapté. Hache requise."
-        if asset == "rock" and equipped_tool != "pickaxe":
-            return "Outil inadapté. Pioche requise."
-        if asset in ["clay_node", "clay_mound"] and equipped_tool != "shovel":
-            return "Outil inadapté. Pelle requise."
+        tool_error = _tool_error(asset, equipped_tool)
+        if tool_error:
+            return tool_error
 
         if asset == "apple_tree":
+            now = time.time()
+            if room._apple_cooldowns.get(target["id"], 0.0) > now:
+                return "Ce pommier n'a plus de pommes pour le moment."
+            room._apple_cooldowns[target["id"]] = now + APPLE_TREE_COOLDOWN
+            room.schedule(now + APPLE_TREE_COOLDOWN, "apple_ready", target)
+
             loot = {"apple": 1}
             new_wallet = None
             for res_type, amount in loot.items():
@@ -287,6 +677,10 @@ class GameState:
         if not removed:
             return "Erreur lors de la suppression de la ressource."
 
+        respawn_delay = RESPAWN_DELAYS.get(asset)
+        if respawn_delay is not None:
+            room.schedule(time.time() + respawn_delay, "respawn", dict(removed))
+
         loot: Dict[str, int] = {}
         if asset == "tree":
             loot = {"wood": 1}
@@ -305,6 +699,59 @@ class GameState:
 
         return removed, new_wallet or {}, loot
 
+    def harvest_nearest(self, player_id: str, map_id: str, asset: Optional[str], equipped_tool: str, user_manager: Any) -> Optional[Union[tuple[Dict[str, Any], Dict[str, int], Dict[str, int]], str]]:
+        """
+        Récolte automatique : cible la ressource la plus proche du joueur (à portée de récolte),
+        optionnellement limitée à un asset, puis applique les règles de harvest_resource.
+        """
+        room = self.maps.get(map_id)
+        if not room:
+            return "Carte introuvable."
+
+        user = user_manager.get_or_create_user(player_id)
+        px = float(user.get("x", 0))
+        py = float(user.get("y", 0))
+
+        now = time.time()
+        target = self.find_nearest_resource(
+            map_id, px, py, asset=asset, radius=MAX_HARVEST_DIST,
+            # Les constructions, les pommiers en recharge et les ressources qui exigent
+            # un autre outil que celui équipé ne sont pas des cibles valides
+            predicate=lambda r: (r.get("asset") in HARVESTABLE_ASSETS and
+                                 room._apple_cooldowns.get(r["id"], 0.0) <= now and
+                                 _tool_error(r.get("asset", ""), equipped_tool) is None)
+        )
+        if not target:
+            return "Aucune ressource à portée."
+        return self.harvest_resource(player_id, map_id, target["id"], equipped_tool, user_manager)
+
+    def process_timers(self, now: Optional[float] = None) -> List[tuple]:
+        """
+        Traite les événements temporisés échus de toutes les rooms.
+        Retourne une liste de deltas (map_id, msg_type, data) à diffuser.
+        """
+        if now is None:
+            now = time.time()
+
+        events: List[tuple] = []
+        for map_id, room in self.maps.items():
+            for kind, resource in room.pop_due_timers(now):
+                if kind == "respawn":
+                    if not room.add(resource):
+                        # Case occupée : nouvelle tentative plus tard
+                        room.schedule(now + RESPAWN_RETRY_DELAY, "respawn", resource)
+                        continue
+                    events.append((map_id, "RESOURCE_PLACED", {"resource": resource}))
+
+                elif kind == "apple_ready":
+                    room._apple_cooldowns.pop(resource["id"], None)
+                    events.append((map_id, "RESOURCE_READY", {
+                        "id": resource["id"],
+                        "x": resource["x"],
+                        "y": resource["y"],
+                    }))
+        return events
+
     def add_resource(self, asset: str, obj_type: str, x: int, y: int, map_id: str = "farm_main") -> Optional[Dict[str, Any]]:
         """
         Ajoute une ressource au monde (ex: construction joueur).
@@ -312,7 +759,7 @@ class GameState:
         room = self.maps.get(map_id)
         if not room:
             return None
-            
+
         if (x, y) in room._spatial_index:
             return None  # Case occupée
 
@@ -325,6 +772,5 @@ class GameState:
             "y":     y,
         }
 
-        room.resources.append(new_resource)
-        room._spatial_index[(x, y)] = new_resource
+        room.add(new_resource)
         return new_resource
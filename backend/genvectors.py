@@ -0,0 +1,109 @@
+"""
+Vecteurs de test partagés — Parité de génération serveur / client.
+
+Le mode WORLD_SEED_DIFF suppose que game/utils/WorldGenerator.ts reproduit au bit près
+_compute_water_tiles / _generate_world. Ce module écrit (ou vérifie) des vecteurs de référence
+dans shared/generation-vectors.json, relus par scripts/check-generation-vectors.ts.
+
+Usage (depuis la racine du dépôt) :
+    python -m backend.genvectors          # régénère le fichier
+    python -m backend.genvectors --check  # échoue si le fichier ne correspond plus au générateur
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+from typing import Dict, Any, List
+
+from backend.perlin import Perlin
+from backend.gamestate import (
+    GENERATOR_VERSION, MAP_SIZE, PERLIN_SCALE,
+    generation_params, _compute_water_tiles, _generate_world,
+)
+
+VECTORS_FILE = os.path.join("shared", "generation-vectors.json")
+
+# Seeds couvertes : seed par défaut, petites valeurs et bornes de random.randint(1, 1000000)
+SEEDS = [42, 1, 7, 123456, 999999, 1000000]
+
+# Nombre de tirages RNG bruts et points Perlin échantillonnés par seed
+RNG_SAMPLES = 8
+PERLIN_POINTS = [(0, 0), (3, 7), (17, 42), (50, 50), (99, 1), (64, 99)]
+
+# Ressources conservées en clair (début de liste) pour faciliter le diagnostic d'un écart
+RESOURCE_SAMPLES = 5
+
+
+def _digest(parts: List[str]) -> str:
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def water_digest(water_tiles) -> str:
+    """Empreinte des tuiles d'eau, triées par (y, x) — format reproduit côté client."""
+    return _digest([f"{x},{y}" for (x, y) in sorted(water_tiles, key=lambda t: (t[1], t[0]))])
+
+
+def resources_digest(resources: List[Dict[str, Any]]) -> str:
+    """Empreinte des ressources dans l'ordre de génération."""
+    return _digest([f"{r['id']}|{r['asset']}|{r['type']}|{r['x']}|{r['y']}" for r in resources])
+
+
+def build_vectors() -> Dict[str, Any]:
+    cases = []
+    for seed in SEEDS:
+        perlin = Perlin(seed)
+        rng = random.Random(seed)
+        water = _compute_water_tiles(seed)
+        resources = _generate_world(seed, water)
+        cases.append({
+            "seed": seed,
+            "perlin": [
+                [x, y, perlin.noise(x * PERLIN_SCALE, y * PERLIN_SCALE)]
+                for (x, y) in PERLIN_POINTS
+            ],
+            "rng": [rng.random() for _ in range(RNG_SAMPLES)],
+            "water_count": len(water),
+            "water_sha256": water_digest(water),
+            "resource_count": len(resources),
+            "resources_sha256": resources_digest(resources),
+            "resource_samples": resources[:RESOURCE_SAMPLES],
+        })
+    return {
+        "generator": GENERATOR_VERSION,
+        "map_size": MAP_SIZE,
+        "params": generation_params(),
+        "cases": cases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vecteurs de parité de génération serveur/client")
+    parser.add_argument("--check", action="store_true", help="Vérifie le fichier au lieu de le réécrire")
+    args = parser.parse_args()
+
+    vectors = build_vectors()
+    if args.check:
+        try:
+            with open(VECTORS_FILE, "r", encoding="utf-8") as f:
+                current = json.load(f)
+        except FileNotFoundError:
+            print(f"[GenVectors] {VECTORS_FILE} introuvable.")
+            sys.exit(1)
+        if current != vectors:
+            print(f"[GenVectors] {VECTORS_FILE} ne correspond plus au générateur : relancer python -m backend.genvectors.")
+            sys.exit(1)
+        print(f"[GenVectors] {VECTORS_FILE} à jour ({len(vectors['cases'])} seed(s)).")
+        return
+
+    os.makedirs(os.path.dirname(VECTORS_FILE), exist_ok=True)
+    with open(VECTORS_FILE, "w", encoding="utf-8") as f:
+        json.dump(vectors, f, indent=2)
+        f.write("\n")
+    print(f"[GenVectors] {VECTORS_FILE} écrit ({len(vectors['cases'])} seed(s)).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Handoff — Snapshot de l'état du process pour un redémarrage sans perte (déploiement progressif).
+
+À l'arrêt (drain, voir main.py), le process écrit dans HAVEN_SNAPSHOT (par défaut
+backend/data/handoff-{worker}.pkl) :
+- les rooms chargées (RoomState complets : ressources, index, échéancier, diff de génération)
+- les journaux de diffusion par map et les sessions en attente de reprise
+- l'historique du chat
+
+Le process suivant le relit au démarrage à la place de la génération des rooms. Les sessions
+ne sont restaurées que si le snapshot a moins de RESUME_WINDOW secondes : les clients
+prévenus par SERVER_RESTART reprennent alors leur session (jeton + seq) au lieu d'un
+handshake complet.
+
+Un snapshot n'est relu qu'une fois : il est renommé (.restored) dès sa lecture. Il est ignoré
+en entier s'il a plus de MAX_AGE secondes, ou si une fiche joueur présente au drain a été
+réécrite depuis (process suivant arrêté sans drain, kill -9) : les fiches sur disque sont
+alors plus récentes que le monde sauvegardé, et le restaurer dupliquerait les ressources.
+
+Format pickle (rapide à relire, objets Python tels quels) : fichier local écrit par le
+serveur lui-même, jamais reçu d'un client. Un snapshot d'un autre format ou d'un autre
+générateur est ignoré.
+"""
+
+import os
+import pickle
+import random
+import time
+from typing import Callable, Dict, Any, Iterable, Optional
+
+from backend.gamestate import GENERATOR_VERSION
+from backend.log import get_logger, elapsed_ms
+from backend.resume import RESUME_WINDOW
+
+log = get_logger("handoff")
+
+SNAPSHOT_FILE = os.getenv("HAVEN_SNAPSHOT", os.path.join("backend", "data", "handoff-{worker}.pkl"))
+
+# Version du format : incrémentée à chaque changement incompatible des objets sauvegardés
+SNAPSHOT_FORMAT = 4
+
+# Délai de reconnexion suggéré aux clients par SERVER_RESTART (secondes, tiré au hasard
+# dans l'intervalle pour étaler les reconnexions)
+RESTART_RETRY_MIN = 1.0
+RESTART_RETRY_MAX = float(os.getenv("HAVEN_RESTART_SPREAD", "8"))
+
+# Âge max d'un snapshot relu (secondes) : au-delà, le monde est régénéré
+MAX_AGE = float(os.getenv("HAVEN_SNAPSHOT_MAX_AGE", "300"))
+
+# Suffixe du snapshot déjà relu (gardé pour diagnostic, jamais relu)
+RESTORED_SUFFIX = ".restored"
+
+
+def snapshot_path(worker_id: int) -> str:
+    return SNAPSHOT_FILE.replace("{worker}", str(worker_id))
+
+
+def restart_retry_after() -> float:
+    return round(random.uniform(RESTART_RETRY_MIN, max(RESTART_RETRY_MIN, RESTART_RETRY_MAX)), 1)
+
+
+def write_snapshot(path: str, maps: Dict[str, Any], event_logs: Dict[str, Any], resume_registry: Any,
+                   chat_hub: Any, players: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Écriture atomique (fichier temporaire + rename). `players` : fiches écrites juste avant
+    (vérifiées à la relecture). Retourne la taille et la durée.
+    """
+    started = time.perf_counter()
+    state = {
+        "format": SNAPSHOT_FORMAT,
+        "generator": GENERATOR_VERSION,
+        "saved_at": time.time(),
+        "maps": maps,
+        "event_logs": event_logs,
+        "resume_registry": resume_registry,
+        "chat_hub": chat_hub,
+        "players": list(players),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    stats = {"path": path, "maps": len(maps), "bytes": os.path.getsize(path), "ms": elapsed_ms(started)}
+    log.info("Snapshot écrit", **stats)
+    return stats
+
+
+def read_snapshot(path: str, player_saved_at: Callable[[str], Optional[float]]) -> Optional[Dict[str, Any]]:
+    """
+    Snapshot laissé par le process précédent, ou None (absent, illisible, autre format, trop
+    ancien, ou plus ancien qu'une fiche joueur : `player_saved_at` donne la date d'écriture
+    d'une fiche). Le fichier est renommé dans tous les cas : il n'est jamais relu deux fois.
+    `sessions_valid` indique si les sessions en attente de reprise sont encore utilisables.
+    """
+    if not os.path.exists(path):
+        return None
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    except Exception as e:
+        log.error("Snapshot illisible, ignoré", path=path, error=repr(e))
+        return None
+    finally:
+        os.replace(path, path + RESTORED_SUFFIX)
+    if state.get("format") != SNAPSHOT_FORMAT or state.get("generator") != GENERATOR_VERSION:
+        log.warning("Snapshot d'un autre format ignoré", path=path, format=state.get("format"),
+                    generator=state.get("generator"))
+        return None
+    age = time.time() - state["saved_at"]
+    if age > MAX_AGE:
+        log.warning("Snapshot trop ancien ignoré", path=path, age_s=round(age, 1), max_age_s=MAX_AGE)
+        return None
+    newer = [p for p in state["players"] if (player_saved_at(p) or 0) > state["saved_at"]]
+    if newer:
+        log.warning("Snapshot plus ancien que des fiches joueurs, ignoré", path=path, players=len(newer))
+        return None
+    state["sessions_valid"] = age < RESUME_WINDOW
+    log.info("Snapshot relu", path=path, maps=len(state["maps"]), age_s=round(age, 1), ms=elapsed_ms(started))
+    return state
@@ -0,0 +1,141 @@
+"""
+Logs — Journalisation structurée non bloquante.
+
+Les `print` synchrones sur la boucle asyncio sont remplacés par des loggers par catégorie
+(`haven.ws`, `haven.world`...) dont les enregistrements passent par une file en mémoire :
+l'écriture sur stdout est faite par un thread dédié (QueueListener), jamais sur le chemin
+d'une requête.
+
+- Champs structurés : log.info("Client connecté", client_id=..., map_id=...)
+- Niveau par catégorie : HAVEN_LOG_LEVEL=INFO, HAVEN_LOG_LEVELS="ws=DEBUG,world=WARNING"
+- Échantillonnage des événements fréquents : log.debug("...", sample=0.01) ou
+  HAVEN_LOG_SAMPLING="ws.message=0.01" (clé = catégorie.événement)
+- Format : texte lisible par défaut, une ligne JSON par événement avec HAVEN_LOG_FORMAT=json
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, Any, Optional
+
+ROOT_LOGGER = "haven"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampling: Dict[str, float] = {}
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    pairs = {}
+    for entry in value.split(","):
+        if "=" in entry:
+            key, val = entry.split("=", 1)
+            pairs[key.strip()] = val.strip()
+    return pairs
+
+
+class TextFormatter(logging.Formatter):
+    """[catégorie] message clé=valeur ..."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        category = record.name[len(ROOT_LOGGER) + 1:] or ROOT_LOGGER
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} [{category}] {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par événement (ingestion par un collecteur de logs)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "category": record.name[len(ROOT_LOGGER) + 1:] or ROOT_LOGGER,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def setup_logging():
+    """Configure la file + le thread d'écriture. Idempotent ; appelé au démarrage du serveur."""
+    global _listener, _sampling
+    if _listener is not None:
+        return
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(os.getenv("HAVEN_LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+    for category, level in _parse_pairs(os.getenv("HAVEN_LOG_LEVELS", "")).items():
+        logging.getLogger(f"{ROOT_LOGGER}.{category}").setLevel(level.upper())
+    _sampling = {key: float(rate) for key, rate in _parse_pairs(os.getenv("HAVEN_LOG_SAMPLING", "")).items()}
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if os.getenv("HAVEN_LOG_FORMAT") == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Vide la file et arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class StructLogger:
+    """Logger d'une catégorie : champs en kwargs, échantillonnage optionnel, rien n'est formaté si filtré."""
+
+    def __init__(self, category: str):
+        self.category = category
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+    def _log(self, level: int, msg: str, sample: Optional[float], event: Optional[str],
+             exc_info: bool, fields: Dict[str, Any]):
+        if not self._logger.isEnabledFor(level):
+            return
+        if event is not None:
+            sample = _sampling.get(f"{self.category}.{event}", sample)
+        if sample is not None and random.random() >= sample:
+            return
+        if sample is not None:
+            fields["sampled"] = sample
+        self._logger.log(level, msg, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, msg: str, sample: float = None, event: str = None, **fields):
+        self._log(logging.DEBUG, msg, sample, event, False, fields)
+
+    def info(self, msg: str, sample: float = None, event: str = None, **fields):
+        self._log(logging.INFO, msg, sample, event, False, fields)
+
+    def warning(self, msg: str, sample: float = None, event: str = None, **fields):
+        self._log(logging.WARNING, msg, sample, event, False, fields)
+
+    def error(self, msg: str, exc_info: bool = False, **fields):
+        self._log(logging.ERROR, msg, None, None, exc_info, fields)
+
+
+def get_logger(category: str) -> StructLogger:
+    return StructLogger(category)
+
+
+def elapsed_ms(started: float) -> float:
+    """Latence depuis `started` (time.perf_counter()) en millisecondes, arrondie."""
+    return round((time.perf_counter() - started) * 1000, 2)
@@ -3,17 +3,44 @@ Haven — Backend Principal
 FastAPI + WebSocket — MVP Alpha 0.1
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
+import time
+
+# Mesure du coût d'import du module (rapport de démarrage)
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, Request, WebSocket, WebSocketDisconnect, Depends, Header
+from fastapi.responses import PlainTextResponse, Response, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict
+from typing import Dict, Any, Iterable, List, Optional
+import asyncio
 import json
-import time
-
-from backend.gamestate import GameState
-from backend.usermanager import UserManager
+import os
+import re
+import signal
+import sys
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from backend.gamestate import GameState, APPLE_TREE_COOLDOWN, shutdown_generation_pool
+from backend.usermanager import UserManager, MAP_SPAWN
+from backend.resume import EventLog, ResumeRegistry
+from backend.presence import PresenceRoster
+from backend.metrics import metrics
+from backend.cluster import ShardMap, create_bus
+from backend.watchdog import LoopWatchdog, sample_profile, profile_running, profile_duration
+from backend.log import setup_logging, shutdown_logging, get_logger, elapsed_ms
+from backend.recorder import TrafficRecorder, capture_state
+from backend import tracing
+from backend import snapshots
+from backend import memory
+from backend import chat
+from backend import admission
+from backend import handoff
+from backend import overload
+from backend import actors
 from backend import recipes
-from backend.database import get_db, engine, Base
+from backend.database import get_db, get_engine, get_session_factory, dispose_engine, Base
 import backend.models
 from backend.auth import get_password_hash, verify_password, create_access_token, decode_access_token
 
@@ -25,11 +52,45 @@ from sqlalchemy import text
 # ──────────────────────────────────────────────
 # 1. Application & CORS
 # ──────────────────────────────────────────────
-app = FastAPI(title="Haven Backend", version="0.1.0")
+log = get_logger("ws")
+log_db = get_logger("db")
+log_tasks = get_logger("tasks")
+log_startup = get_logger("startup")
+
+# Routes HTTP + WebSocket, montées sur l'application par create_app()
+router = APIRouter()
 
-@app.on_event("startup")
-async def startup():
-    async with engine.begin() as conn:
+# Maps générées pendant le démarrage (si possédées par ce worker) ; les autres le sont au premier accès
+PREWARM_MAPS = [m.strip() for m in os.getenv("HAVEN_PREWARM_MAPS", "farm_main").split(",") if m.strip()]
+
+
+class StartupTimer:
+    """Chronomètre les phases du démarrage ; le rapport est journalisé et exposé par /metrics."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = elapsed_ms(started)
+
+    def report(self):
+        total = elapsed_ms(self._started)
+        for name, duration in self.phases.items():
+            metrics.set_gauge(f"startup.{name}_ms", duration)
+        metrics.set_gauge("startup.total_ms", total)
+        metrics.set_gauge("startup.import_ms", IMPORT_MS)
+        log_startup.info("Serveur prêt", import_ms=IMPORT_MS, total_ms=total,
+                         **{f"{name}_ms": duration for name, duration in self.phases.items()})
+
+
+async def migrate_database():
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         # Migration SQLite basique pour ajouter les colonnes sans Alembic (si elles n'existent pas)
         try:
@@ -44,15 +105,103 @@ async def startup():
             await conn.execute(text("ALTER TABLE users ADD COLUMN created_at DATETIME"))
         except Exception:
             pass
-    print("[DB] Tables SQLite créées ou vérifiées et colonnes migrées.")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    log_db.info("Tables SQLite créées ou vérifiées et colonnes migrées")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialisation coûteuse (BDD, joueurs, maps, bus) au démarrage plutôt qu'à l'import."""
+    global recorder, tracer, room_actors
+    setup_logging()
+    timer = StartupTimer()
+
+    with timer.phase("db"):
+        await migrate_database()
+    with timer.phase("users"):
+        # Aucun joueur chargé ici : les fiches sont lues à la connexion (migration users.json au besoin)
+        userManager.open_storage()
+    # Capture du trafic entrant (opt-in, HAVEN_RECORD) — rejouable par backend/replay.py
+    recorder = TrafficRecorder.from_env()
+    if recorder:
+        log_startup.info("Capture du trafic activée", path=recorder.path)
+    # Spans par message (opt-in, HAVEN_TRACE) — export au format Chrome Trace
+    tracer = tracing.Tracer.from_env(shard_map.worker_id)
+    if tracer:
+        instrument_tracing()
+        log_startup.info("Tracing activé", path=tracer.path, rate=tracer.sample_rate)
+    with timer.phase("handoff"):
+        # État laissé par le process précédent (drain) : rooms, sessions à reprendre, chat
+        restore_snapshot()
+    with timer.phase("rooms"):
+        # Génération hors boucle (process de génération) : le watchdog et le bus ne sont pas bloqués
+        await asyncio.gather(*(gameState.load_room_async(m) for m in PREWARM_MAPS if shard_map.is_local(m)))
+
+    with timer.phase("tasks"):
+        # Acteurs de room : récoltes, placements et constructions appliqués dans l'ordre, par room
+        room_actors = actors.RoomActors(publish_room, userManager.batched_writes)
+        # Échéancier de repousse des ressources (une seule tâche pour toutes les rooms)
+        background_tasks.append(asyncio.create_task(respawn_loop()))
+        # Heartbeat : PING périodique + fermeture des connexions mortes
+        background_tasks.append(asyncio.create_task(heartbeat_loop()))
+        # Livraison des messages de chat mis en attente (canaux chargés)
+        background_tasks.append(asyncio.create_task(chat_loop()))
+        # Mesure du retard de la boucle + capture des piles bloquantes
+        watchdog.start()
+        # Entrée / sortie du mode surcharge (retard de la boucle, messages en attente)
+        background_tasks.append(asyncio.create_task(overload_loop()))
+
+    with timer.phase("bus"):
+        # Bus inter-workers (abonnements avant start : ils sont transmis au hub à la connexion)
+        bus.subscribe("presence", on_bus_presence)
+        bus.subscribe("chat.global", on_bus_global_chat)
+        bus.subscribe("chat.direct", on_bus_direct_chat)
+        bus.subscribe("admin.kick", on_bus_kick)
+        bus.subscribe("player.transfer", on_bus_transfer)
+        await bus.start()
+    if shard_map.clustered:
+        log_tasks.info("Worker de cluster démarré", worker=shard_map.worker_id, workers=len(shard_map.worker_urls))
+    install_drain_signals()
+    timer.report()
+
+    yield
+
+    # Drain : clients prévenus (si le signal n'a pas déjà déclenché le drain), fiches et snapshot écrits
+    await drain()
+    for task in background_tasks + list(profile_tasks):
+        task.cancel()
+    background_tasks.clear()
+    watchdog.stop()
+    allocation_tracker.stop()
+    await bus.stop()
+    shutdown_generation_pool()
+    if recorder:
+        recorder.close(capture_state(gameState, userManager, recorder.client_ids))
+        recorder = None
+    if tracer:
+        tracer.close()
+        log_startup.info("Trace écrite", path=tracer.path, traces=tracer.traces)
+        tracer = None
+    await dispose_engine()
+    shutdown_logging()
+
+
+def create_app() -> FastAPI:
+    """
+    Fabrique de l'application (uvicorn backend.main:app, ou --factory backend.main:create_app).
+    L'état du jeu reste global au process : une seule application par process.
+    """
+    application = FastAPI(title="Haven Backend", version="0.1.0", lifespan=lifespan)
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    if tracing.enabled():
+        application.middleware("http")(trace_http)
+    application.include_router(router)
+    return application
 
 # ──────────────────────────────────────────────
 # 2. Instances Globales
@@ -60,6 +209,68 @@ app.add_middleware(
 gameState = GameState()
 userManager = UserManager()
 
+# Multi-workers : maps possédées par ce process + bus inter-workers (voir backend/cluster.py)
+shard_map = ShardMap.from_env()
+bus = create_bus(shard_map.worker_id)
+userManager.shared = shard_map.clustered
+
+# Joueurs connectés aux autres workers : client_id → {"worker", "map_id"}
+remote_presence: Dict[str, Dict[str, Any]] = {}
+
+# Surveillance du retard de la boucle asyncio (voir backend/watchdog.py)
+watchdog = LoopWatchdog()
+
+# Capture du trafic WebSocket entrant, créée au démarrage si HAVEN_RECORD est défini
+recorder: Optional[TrafficRecorder] = None
+
+# Tracing par message (HAVEN_TRACE), voir backend/tracing.py
+tracer: Optional[tracing.Tracer] = None
+
+# Diff d'allocations tracemalloc à la demande (POST /admin/memory/mark), voir backend/memory.py
+allocation_tracker = memory.AllocationTracker()
+
+# Corps JSON + gzip de GET /maps/{map_id}/state, invalidés par version (voir backend/snapshots.py)
+snapshot_cache = snapshots.SnapshotCache()
+
+# Admission des connexions : handshakes simultanés bornés, jetons vérifiés en cache (voir backend/admission.py)
+handshake_gate = admission.HandshakeGate()
+token_cache = admission.TokenCache(decode_access_token)
+
+# Canaux de chat : historique par canal, livraison groupée des canaux chargés (voir backend/chat.py)
+chat_hub = chat.ChatHub()
+
+# Délestage par priorité quand la boucle est surchargée (voir backend/overload.py)
+overload_monitor = overload.OverloadMonitor()
+
+# Une file de mutations par room, traitée par sa propre tâche (voir backend/actors.py), créée au démarrage
+room_actors: Optional[actors.RoomActors] = None
+
+# Arrêt en cours : nouvelles connexions refusées (SERVER_RESTART), voir drain()
+draining = False
+
+# Tâches de fond lancées au démarrage (annulées à l'arrêt)
+background_tasks: list = []
+
+# Profils demandés par ADMIN_PROFILE (référence gardée jusqu'à la fin : une tâche sans
+# référence peut être collectée en cours d'exécution)
+profile_tasks: set = set()
+
+# Période de vérification de l'échéancier de repousse (secondes)
+RESPAWN_TICK_INTERVAL = 1.0
+
+# Heartbeat : un PING toutes les HEARTBEAT_INTERVAL secondes ; une session sans aucun
+# message reçu depuis HEARTBEAT_TIMEOUT secondes est considérée morte et fermée.
+HEARTBEAT_INTERVAL = float(os.getenv("HAVEN_HEARTBEAT_INTERVAL", "10"))
+HEARTBEAT_TIMEOUT = float(os.getenv("HAVEN_HEARTBEAT_TIMEOUT", "30"))
+
+# Durée max d'un envoi vers un client (un socket bloqué ne doit pas figer la boucle)
+SEND_TIMEOUT = float(os.getenv("HAVEN_SEND_TIMEOUT", "5"))
+
+# Changement de map : map par défaut (point d'arrivée : MAP_SPAWN, backend/usermanager.py),
+# instances de housing (rooms vides créées à la première visite)
+DEFAULT_MAP = "farm_main"
+HOUSING_MAP_RE = re.compile(r"^housing_[A-Za-z0-9_-]{1,64}$")
+
 
 # ──────────────────────────────────────────────
 # 3. Connection Manager
@@ -67,65 +278,178 @@ userManager = UserManager()
 class ConnectionManager:
     def __init__(self):
         self.active_sessions: Dict[str, Dict[str, Any]] = {}
-
-    async def connect(self, websocket: WebSocket, client_id: str):
+        # Journal des diffusions par map (rejoué aux clients qui reprennent leur session)
+        self.event_logs: Dict[str, EventLog] = {}
+        self.resume_registry = ResumeRegistry()
+        # Joueurs présents par map (CURRENT_PLAYERS pré-sérialisé, destinataires des diffusions)
+        self.roster = PresenceRoster()
+
+    def event_log(self, map_id: str) -> EventLog:
+        if map_id not in self.event_logs:
+            self.event_logs[map_id] = EventLog()
+        return self.event_logs[map_id]
+
+    async def connect(self, websocket: WebSocket, client_id: str, map_id: str = DEFAULT_MAP,
+                      resume_token: str = None, last_seq: int = None) -> bool:
+        """
+        Accepte la connexion. Retourne True si la session a été reprise : le client
+        reçoit alors uniquement les diffusions manquées (pas de handshake complet).
+        """
         await websocket.accept()
-        
+
+        userManager.claim(client_id)
+        if await self._try_resume(websocket, client_id, resume_token, last_seq):
+            return True
+
         user = userManager.get_or_create_user(client_id)
-        # [16.4] Force user map to farm_main
-        user["map_id"] = "farm_main"
-        current_map = "farm_main"
-
-        self.active_sessions[client_id] = {"ws": websocket, "map_id": current_map}
-        print(f"[WS] Client {client_id} connected to {current_map} ({len(self.active_sessions)} total)")
-
-        current_players_data = []
-        for cid, info in self.active_sessions.items():
-            if cid != client_id and info["map_id"] == current_map:
-                u = userManager.get_or_create_user(cid)
-                current_players_data.append({"id": cid, "x": u.get("x", 10), "y": u.get("y", 10)})
-        
-        await websocket.send_text(json.dumps({
-            "type": "CURRENT_PLAYERS",
-            "players": current_players_data
-        }))
-
-        joined_user = userManager.get_or_create_user(client_id)
-        await self.broadcast(json.dumps({
-            "type": "PLAYER_JOINED",
-            "id": client_id,
-            "x": joined_user.get("x", 10),
-            "y": joined_user.get("y", 10)
-        }), map_id=current_map, exclude_id=client_id)
-
-    def disconnect(self, client_id: str):
-        if client_id in self.active_sessions:
-            del self.active_sessions[client_id]
-            print(f"[WS] Client {client_id} disconnected")
+        user["map_id"] = map_id
+        current_map = map_id
+
+        # "stream" : chunks déjà envoyés (set de (cx, cy)) si le client a choisi le mode streaming
+        self.active_sessions[client_id] = {
+            "ws": websocket, "map_id": current_map, "stream": None,
+            "resume_token": self.resume_registry.new_token(), "resumable": True,
+            "last_seen": time.monotonic(),
+        }
+        x, y = user.get("x", 10), user.get("y", 10)
+        # Inscrit au roster dès l'enregistrement : aucune diffusion ne lui échappe pendant le handshake
+        self.roster.join(current_map, client_id, x, y)
+        log.info("Client connecté", client_id=client_id, map_id=current_map, sessions=len(self.active_sessions))
+
+        await websocket.send_text(make_msg(
+            "SESSION",
+            resume_token=self.active_sessions[client_id]["resume_token"],
+            seq=self.event_log(current_map).seq,
+            resumed=False
+        ))
+
+        # Message en cache si le roster n'a pas changé depuis (le client ignore sa propre entrée)
+        await websocket.send_text(self.roster.players_message(current_map))
+
+        await self.broadcast(make_msg("PLAYER_JOINED", id=client_id, x=x, y=y),
+                             map_id=current_map, exclude_id=client_id)
+        return False
+
+    async def _try_resume(self, websocket: WebSocket, client_id: str,
+                          resume_token: str, last_seq: int) -> bool:
+        """Reprise dans la fenêtre RESUME_WINDOW : rejoue les diffusions postérieures à last_seq."""
+        if resume_token is None or last_seq is None:
+            return False
+        entry = self.resume_registry.claim(resume_token, client_id)
+        if entry is None:
+            return False
+        map_id = entry["map_id"]
+        events = self.event_log(map_id)
+
+        # Rejoue jusqu'à rattraper le journal : des diffusions peuvent arriver pendant l'envoi.
+        # La session n'est enregistrée qu'une fois à jour, pour préserver l'ordre des seq.
+        replayed = 0
+        while last_seq != events.seq:
+            target = events.seq
+            missed = events.since(last_seq, client_id)
+            if missed is None:
+                log.info("Reprise impossible (journal dépassé), handshake complet", client_id=client_id, map_id=map_id)
+                return False
+            for message in missed:
+                await websocket.send_text(message)
+            replayed += len(missed)
+            last_seq = target
+
+        self.active_sessions[client_id] = {
+            "ws": websocket, "map_id": map_id, "stream": entry["stream"],
+            "resume_token": self.resume_registry.new_token(), "resumable": True,
+            "last_seen": time.monotonic(),
+        }
+        user = userManager.get_or_create_user(client_id)
+        x, y = user.get("x", 10), user.get("y", 10)
+        self.roster.join(map_id, client_id, x, y)
+        log.info("Session reprise", client_id=client_id, map_id=map_id, replayed=replayed)
+
+        await websocket.send_text(make_msg(
+            "SESSION",
+            resume_token=self.active_sessions[client_id]["resume_token"],
+            seq=self.event_log(map_id).seq,
+            resumed=True
+        ))
+
+        # Les autres joueurs ont reçu PLAYER_LEFT à la coupure
+        await self.broadcast(make_msg("PLAYER_JOINED", id=client_id, x=x, y=y),
+                             map_id=map_id, exclude_id=client_id)
+        return True
+
+    def disconnect(self, client_id: str, websocket: WebSocket = None) -> bool:
+        """
+        Ferme la session et la garde en réserve pour une reprise éventuelle.
+        Si `websocket` est fourni, ne fait rien quand la session a déjà été remplacée
+        par une reconnexion plus récente. Retourne True si une session a été fermée.
+        """
+        session = self.active_sessions.get(client_id)
+        if session is None or (websocket is not None and session["ws"] is not websocket):
+            return False
+        del self.active_sessions[client_id]
+        self.roster.leave(client_id)
+        userManager.release(client_id)
+        if session.get("resumable"):
+            self.resume_registry.park(session["resume_token"], client_id, session["map_id"], session.get("stream"))
+        log.info("Client déconnecté", client_id=client_id, map_id=session["map_id"])
+        return True
 
     async def broadcast(self, message: str, map_id: str, exclude_id: str = None):
-        """Envoie un message à tous les clients connectés sur une carte spécifique."""
+        """Envoie un message à tous les clients connectés sur une carte spécifique (numéroté et journalisé)."""
+        message = self.event_log(map_id).append(message, exclude_id)
         disconnected = []
-        for cid, info in self.active_sessions.items():
-            if cid != exclude_id and info["map_id"] == map_id:
+        # Destinataires tirés du roster de la map (pas de parcours de toutes les sessions)
+        for cid in list(self.roster.members(map_id)):
+            info = self.active_sessions.get(cid)
+            if cid != exclude_id and info is not None:
                 try:
-                    await info["ws"].send_text(message)
+                    await asyncio.wait_for(info["ws"].send_text(message), SEND_TIMEOUT)
                 except Exception:
                     disconnected.append(cid)
         for cid in disconnected:
+            metrics.inc("ws.send_failures")
             self.disconnect(cid)
 
     async def send_to(self, client_id: str, message: str):
         """Envoie un message à un client spécifique."""
         if client_id in self.active_sessions:
             try:
-                await self.active_sessions[client_id]["ws"].send_text(message)
+                await asyncio.wait_for(self.active_sessions[client_id]["ws"].send_text(message), SEND_TIMEOUT)
             except Exception:
+                metrics.inc("ws.send_failures")
                 self.disconnect(client_id)
+
+    def touch(self, client_id: str):
+        """Note qu'un message vient d'être reçu du client (preuve de vie pour le heartbeat)."""
+        session = self.active_sessions.get(client_id)
+        if session is not None:
+            session["last_seen"] = time.monotonic()
+
+    async def reap(self, client_id: str):
+        """Ferme une session muette depuis trop longtemps et prévient la map."""
+        session = self.active_sessions.get(client_id)
+        if session is None:
+            return
+        map_id = session["map_id"]
+        self.disconnect(client_id)
+        metrics.inc("ws.reaped")
+        log.info("Client sans réponse : connexion fermée", client_id=client_id, map_id=map_id, timeout=HEARTBEAT_TIMEOUT)
+        try:
+            await asyncio.wait_for(session["ws"].close(code=1001, reason="Heartbeat timeout"), SEND_TIMEOUT)
+        except Exception:
+            pass
+        await self.broadcast(make_msg("PLAYER_LEFT", id=client_id), map_id=map_id)
+        await announce_presence("leave", client_id, map_id)
                 
-    def set_player_map(self, client_id: str, new_map_id: str):
-        if client_id in self.active_sessions:
-            self.active_sessions[client_id]["map_id"] = new_map_id
+    def switch_map(self, client_id: str, new_map_id: str, x: int, y: int) -> int:
+        """
+        Déplace la session vers new_map_id. Synchrone : aucune diffusion ne s'intercale entre
+        la sortie de l'ancienne map et l'entrée dans la nouvelle. Retourne le seq courant du
+        journal de la nouvelle map, à partir duquel le client suit désormais.
+        """
+        self.active_sessions[client_id]["map_id"] = new_map_id
+        self.roster.join(new_map_id, client_id, x, y)
+        return self.event_log(new_map_id).seq
 
 
 manager = ConnectionManager()
@@ -140,6 +464,24 @@ def make_msg(msg_type: str, **kwargs) -> str:
     return json.dumps({"type": msg_type, **kwargs})
 
 
+def make_raw_msg(msg_type: str, payload_json: str) -> str:
+    """Crée un message dont le payload est déjà sérialisé (ex: chunk mis en cache)."""
+    return f'{{"type":"{msg_type}","payload":{payload_json}}}'
+
+
+async def stream_chunks(client_id: str, map_id: str, x: float, y: float):
+    """Envoie au client (mode streaming) les chunks autour de (x, y) qu'il n'a pas encore reçus."""
+    session = manager.active_sessions.get(client_id)
+    if not session or session.get("stream") is None:
+        return
+    sent = session["stream"]
+    for key in gameState.chunks_in_view(map_id, x, y):
+        if key in sent:
+            continue
+        sent.add(key)
+        await manager.send_to(client_id, make_raw_msg("WORLD_CHUNK", gameState.get_chunk_payload(map_id, *key)))
+
+
 def determine_harvest_resource(asset: str) -> str:
     """Détermine le type de ressource gagnée pour une récolte."""
     if "rock" in asset:
@@ -147,11 +489,545 @@ def determine_harvest_resource(asset: str) -> str:
     return "wood"  # Default (tree, etc.)
 
 
+async def send_harvest_reply(websocket: WebSocket, harvest_result):
+    """Envoie le résultat d'une récolte au joueur (les deltas monde sont diffusés par l'acteur de la room)."""
+    if isinstance(harvest_result, str):
+        # Refus avec motif précis généré par gameState
+        await websocket.send_text(make_msg("ERROR", message=harvest_result))
+        return
+    elif harvest_result is None:
+        # Fallback sécurité
+        await websocket.send_text(make_msg("ERROR", message="Récolte impossible (erreur inconnue)"))
+        return
+
+    affected_res, new_wallet, loot_dict = harvest_result
+
+    # ── Wallet update (ciblé uniquement sur le joueur) ──
+    if new_wallet:
+        await websocket.send_text(make_msg("WALLET_UPDATE", payload=new_wallet))
+
+    # ── Feedback visuel (floating text) ──
+    await websocket.send_text(make_msg(
+        "HARVEST_SUCCESS",
+        x=affected_res["x"],
+        y=affected_res["y"],
+        loot=loot_dict
+    ))
+
+
+def harvest_broadcasts(harvest_result) -> List[str]:
+    """Deltas monde d'une récolte réussie, à diffuser à la map."""
+    if isinstance(harvest_result, str) or harvest_result is None:
+        return []
+    affected_res = harvest_result[0]
+
+    # ── Cas spécial : apple_tree — l'arbre n'est PAS supprimé ──
+    if affected_res.get("asset") != "apple_tree":
+        # Cas normal : la ressource a été retirée du monde — seul le delta est diffusé
+        return [make_msg("RESOURCE_REMOVED", id=affected_res["id"], x=affected_res["x"], y=affected_res["y"])]
+    # apple_tree : l'arbre reste dans le WORLD_STATE, on signale seulement sa recharge
+    return [make_msg(
+        "RESOURCE_DEPLETED",
+        id=affected_res["id"],
+        x=affected_res["x"],
+        y=affected_res["y"],
+        ready_in=APPLE_TREE_COOLDOWN
+    )]
+
+
+# ── Commandes de room ──
+# Appliquées une à une par l'acteur de la map (backend/actors.py) : fonctions synchrones
+# retournant (résultat pour le handler, messages à diffuser à la map).
+
+# Objet d'inventaire → ressource posée (asset, type GameState)
+PLACE_RULES = {
+    "Kit de Feu de Camp": {"asset": "rock", "type": "campfire"},
+    "furnace": {"asset": "furnace", "type": "furnace"},
+    "clay_pot": {"asset": "clay_pot", "type": "clay_pot"}
+}
+
+
+def cmd_harvest(client_id: str, map_id: str, resource_id: str, tool: str):
+    harvest_result = gameState.harvest_resource(client_id, map_id, resource_id, tool, userManager)
+    return harvest_result, harvest_broadcasts(harvest_result)
+
+
+def cmd_harvest_nearest(client_id: str, map_id: str, asset: Optional[str], tool: str):
+    harvest_result = gameState.harvest_nearest(client_id, map_id, asset, tool, userManager)
+    return harvest_result, harvest_broadcasts(harvest_result)
+
+
+def cmd_interact(client_id: str, map_id: str, x: int, y: int):
+    """Récolte legacy : retire la ressource en (x, y). Résultat : nouveau wallet, ou None."""
+    removed = gameState.remove_resource_at(map_id, x, y)
+    if not removed:
+        # Rien à récolter, on ignore silencieusement
+        return None, []
+    gain_type = determine_harvest_resource(removed.get("asset", ""))
+    wallet = userManager.update_wallet(client_id, gain_type, 1)
+    return wallet, [make_msg("RESOURCE_REMOVED", id=removed["id"], x=x, y=y)]
+
+
+def cmd_place(client_id: str, map_id: str, item_id: str, x: int, y: int):
+    """Pose un objet de l'inventaire. Résultat : motif du refus, ou None (objet rendu en cas d'échec)."""
+    if not userManager.consume_item(client_id, item_id, 1):
+        return f"Vous ne possédez pas : {item_id}", []
+
+    rule = PLACE_RULES.get(item_id)
+    if not rule:
+        userManager.add_item(client_id, item_id, 1)
+        return f"Objet non plaçable : {item_id}", []
+
+    new_res = gameState.add_resource(asset=rule["asset"], obj_type=rule["type"], x=x, y=y, map_id=map_id)
+    if not new_res:
+        userManager.add_item(client_id, item_id, 1)
+        return "Case occupée", []
+    return None, [make_msg("RESOURCE_PLACED", resource=new_res)]
+
+
+def cmd_build(client_id: str, map_id: str, recipe: Dict[str, Any], x: int, y: int):
+    """
+    Construit une recette (paiement puis placement, remboursé si la case est occupée).
+    Résultat : (wallet à renvoyer au client ou None, motif du refus ou None).
+    """
+    # Support mono-ressource pour le MVP
+    resource_type, cost_amount = next(iter(recipe["cost"].items()))
+
+    wallet = userManager.update_wallet(client_id, resource_type, -cost_amount)
+    if not wallet:
+        return (None, "Ressources insuffisantes"), []
+
+    new_res = gameState.add_resource(asset=recipe["asset"], obj_type=recipe["type"], x=x, y=y, map_id=map_id)
+    if not new_res:
+        # Collision — Rembourser le joueur
+        userManager.update_wallet(client_id, resource_type, cost_amount)
+        wallet = userManager.get_or_create_user(client_id).get("wallet", {})
+        return (wallet, "Case occupée"), []
+    return (wallet, None), [make_msg("RESOURCE_PLACED", resource=new_res)]
+
+
+async def publish_room(map_id: str, messages: List[str]):
+    """Diffusion des deltas d'un lot de commandes, dans l'ordre des commandes."""
+    for message in messages:
+        await manager.broadcast(message, map_id=map_id)
+
+
+async def run_profile(duration: float):
+    """Profil par échantillonnage de la boucle, exécuté dans un thread pour ne pas la bloquer."""
+    return await asyncio.to_thread(sample_profile, watchdog.loop_thread_id, duration)
+
+
+def on_profile_done(task: asyncio.Task):
+    profile_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.error("Erreur du profil demandé", error=repr(task.exception()))
+
+
+async def send_profile(client_id: str, duration: float):
+    """Exécute un profil de la boucle et envoie le résultat (PROFILE_RESULT) à l'admin."""
+    result = await run_profile(duration)
+    if result is None:
+        await manager.send_to(client_id, make_msg("ERROR", message="Un profil est déjà en cours."))
+        return
+    await manager.send_to(client_id, make_msg("PROFILE_RESULT", payload=result))
+
+
+# ── Bus inter-workers ──
+
+async def announce_presence(event: str, client_id: str, map_id: str):
+    """Signale aux autres workers qu'un joueur arrive ("join") ou part ("leave") de ce worker."""
+    await bus.publish("presence", {"event": event, "id": client_id, "map_id": map_id, "worker": shard_map.worker_id})
+
+
+async def broadcast_all_maps(message: str):
+    """Diffuse à toutes les maps ayant au moins un joueur connecté à ce worker."""
+    for map_id in {info["map_id"] for info in manager.active_sessions.values()}:
+        await manager.broadcast(message, map_id=map_id)
+
+
+def is_known_map(map_id: str) -> bool:
+    """Maps accessibles : chargées, préchauffables, affectées par HAVEN_SHARD_MAP, ou instances de housing."""
+    return (map_id in gameState.maps or map_id in PREWARM_MAPS or map_id in shard_map.overrides
+            or HOUSING_MAP_RE.match(map_id) is not None)
+
+
+def player_map(client_id: str) -> str:
+    """Map où (re)connecter le joueur : celle de sa fiche si elle est connue, sinon DEFAULT_MAP."""
+    if userManager.shared:
+        # Fiche peut-être modifiée par un autre worker depuis sa mise en cache ici
+        userManager.reload_user(client_id)
+    map_id = userManager.get_or_create_user(client_id).get("map_id")
+    return map_id if map_id and is_known_map(map_id) else DEFAULT_MAP
+
+
+def map_is_full(map_id: str, client_id: str) -> bool:
+    """Plafond de sessions de la map atteint (un joueur déjà présent n'est pas compté deux fois)."""
+    cap = admission.map_session_cap(map_id)
+    return cap > 0 and manager.roster.map_of(client_id) != map_id and manager.roster.count(map_id) >= cap
+
+
+def prefetch_msg(map_id: str, snapshot: snapshots.Snapshot) -> str:
+    """MAP_PREFETCH : corps du snapshot HTTP repris tel quel (déjà sérialisé)."""
+    return (f'{{"type":"MAP_PREFETCH","map_id":{json.dumps(map_id)},"etag":{json.dumps(snapshot.etag)},'
+            f'"payload":{snapshot.body.decode("utf-8")}}}')
+
+
+async def change_map(client_id: str, map_id: str, spawn: Optional[tuple] = None,
+                     client_etag: Optional[str] = None) -> bool:
+    """
+    Fait passer le joueur sur map_id sans reconnexion ni rechargement de scène :
+    1. room cible préchauffée hors boucle (load_room_async)
+    2. MAP_PREFETCH : snapshot de la carte (cache partagé avec l'API HTTP), omis si le
+       client possède déjà cet ETag
+    3. bascule synchrone de la session (roster, journal), puis MAP_CHANGED + CURRENT_PLAYERS
+    Map servie par un autre worker : transfert de la fiche puis REDIRECT ; retourne alors True
+    (la socket est fermée).
+    """
+    started = time.perf_counter()
+    session = manager.active_sessions.get(client_id)
+    if session is None:
+        return False
+    old_map = session["map_id"]
+    x, y = spawn or MAP_SPAWN
+
+    if not shard_map.is_local(map_id):
+        userManager.update_user_position(client_id, x, y)
+        metrics.inc("map_change.transfers")
+        log.info("Changement de map vers un autre worker", client_id=client_id, from_map=old_map, map_id=map_id)
+        await transfer_player(client_id, map_id)
+        return True
+
+    room = await gameState.load_room_async(map_id)
+    if not room.walk_grid.is_walkable(x, y):
+        x, y = gameState.spawn_point(map_id, MAP_SPAWN)
+
+    snapshot, _ = snapshot_cache.full(room)
+    prefetched = snapshot.etag != client_etag
+    if prefetched:
+        await manager.send_to(client_id, prefetch_msg(map_id, snapshot))
+    if manager.active_sessions.get(client_id) is not session:
+        return False  # Déconnecté pendant l'envoi du snapshot
+
+    seq = manager.switch_map(client_id, map_id, x, y)
+    if session.get("stream") is not None:
+        # Le snapshot contient la carte entière : plus aucun chunk à streamer
+        session["stream"] = set(room.all_chunk_keys())
+    user = userManager.get_or_create_user(client_id)
+    user["map_id"] = map_id
+    userManager.update_user_position(client_id, x, y)
+
+    latency = elapsed_ms(started)
+    await manager.send_to(client_id, make_msg(
+        "MAP_CHANGED", map_id=map_id, width=room.width, height=room.height,
+        x=x, y=y, seq=seq, etag=snapshot.etag, ms=latency
+    ))
+    if snapshots.full_etag(room) != snapshot.etag:
+        # Room modifiée pendant le préchargement : état complet à jour
+        await manager.send_to(client_id, make_msg("WORLD_STATE", payload=gameState.get_full_state(map_id)))
+    await manager.send_to(client_id, manager.roster.players_message(map_id))
+    await send_chat_history(client_id, map_id)
+
+    await manager.broadcast(make_msg("PLAYER_LEFT", id=client_id), map_id=old_map)
+    await manager.broadcast(make_msg("PLAYER_JOINED", id=client_id, x=x, y=y), map_id=map_id, exclude_id=client_id)
+    await announce_presence("join", client_id, map_id)
+
+    metrics.inc("map_change.local")
+    metrics.inc("map_change.prefetched" if prefetched else "map_change.prefetch_skipped")
+    metrics.set_gauge("map_change.last_ms", latency)
+    log.info("Changement de map", client_id=client_id, from_map=old_map, map_id=map_id,
+             ms=latency, prefetched=prefetched)
+    return False
+
+
+async def transfer_player(client_id: str, map_id: str):
+    """
+    Envoie le joueur vers le worker propriétaire de map_id : sa fiche est sauvegardée,
+    le worker cible est prévenu (relecture de la fiche), puis le client est redirigé.
+    """
+    session = manager.active_sessions.get(client_id)
+    user = userManager.get_or_create_user(client_id)
+    user["map_id"] = map_id
+    userManager.save_user(client_id)
+    await bus.publish("player.transfer", {"id": client_id, "map_id": map_id})
+    if session:
+        session["resumable"] = False
+        await manager.send_to(client_id, make_msg("REDIRECT", url=shard_map.url_for(map_id), map_id=map_id))
+        await session["ws"].close(code=4001, reason="Transfert vers un autre worker")
+
+
+async def on_bus_presence(data: Dict[str, Any]):
+    if data.get("event") == "join":
+        remote_presence[data["id"]] = {"worker": data["worker"], "map_id": data["map_id"]}
+    elif remote_presence.get(data["id"], {}).get("worker") == data.get("worker"):
+        remote_presence.pop(data["id"], None)
+    metrics.set_gauge("cluster.remote_players", len(remote_presence))
+
+
+async def on_bus_global_chat(data: Dict[str, Any]):
+    await post_chat(chat.GLOBAL, data)
+
+
+async def on_bus_direct_chat(data: Dict[str, Any]):
+    # Message privé envoyé depuis un autre worker : livré si le destinataire est connecté ici
+    if data.get("to") in manager.active_sessions:
+        await post_chat(chat.direct_channel(data["sender"], data["to"]), data, {data["to"]})
+
+
+async def on_bus_kick(data: Dict[str, Any]):
+    session = manager.active_sessions.get(data.get("playerId"))
+    if session:
+        await kick_local_player(data["playerId"])
+
+
+async def on_bus_transfer(data: Dict[str, Any]):
+    if shard_map.is_local(data["map_id"]):
+        userManager.reload_user(data["id"])
+
+
+# ── Chat ──
+
+def nearby_players(client_id: str, map_id: str) -> set:
+    """Joueurs de la map à moins de CHAT_RADIUS cases de client_id (lui compris)."""
+    me = userManager.get_or_create_user(client_id)
+    x, y = me.get("x", 10), me.get("y", 10)
+    radius_sq = chat.CHAT_RADIUS ** 2
+    nearby = {client_id}
+    for cid in manager.roster.members(map_id):
+        other = userManager.users.get(cid)
+        if other is not None and (other.get("x", 10) - x) ** 2 + (other.get("y", 10) - y) ** 2 <= radius_sq:
+            nearby.add(cid)
+    return nearby
+
+
+async def send_chat(channel: str, message: str, recipients: Optional[Iterable[str]] = None):
+    """Envoie un message de chat à l'audience du canal (ou aux destinataires explicites)."""
+    if recipients is not None:
+        for cid in recipients:
+            await manager.send_to(cid, message)
+    elif channel == chat.GLOBAL:
+        await broadcast_all_maps(message)
+    else:
+        await manager.broadcast(message, map_id=channel.split(":", 1)[1])
+
+
+async def post_chat(channel: str, message: Dict[str, Any], recipients: Optional[Iterable[str]] = None):
+    """Historise le message ; envoi immédiat, ou au prochain CHAT_BATCH si le canal est chargé."""
+    metrics.inc("chat.messages")
+    if chat_hub.post(channel, message, recipients):
+        await send_chat(channel, make_msg("CHAT_MESSAGE", **message), recipients)
+    else:
+        metrics.inc("chat.batched")
+
+
+async def send_chat_history(client_id: str, map_id: str):
+    """CHAT_HISTORY : remplace l'historique du client (global, map, conversations privées)."""
+    await manager.send_to(client_id, make_msg("CHAT_HISTORY", messages=chat_hub.join_history(client_id, map_id)))
+
+
+async def kick_local_player(target_id: str):
+    """Expulse un joueur connecté à ce worker (sans reprise de session possible)."""
+    session = manager.active_sessions[target_id]
+    session["resumable"] = False
+    manager.resume_registry.revoke_client(target_id)
+    await session["ws"].send_text(make_msg("ERROR", message="Vous avez été expulsé par un administrateur."))
+    await session["ws"].close(code=1008, reason="Kicked by admin")
+    # Close will trigger WebSocketDisconnect block
+
+
+def instrument_tracing():
+    """Spans enfants des sous-systèmes appelés par le routeur (une fois le tracing activé)."""
+    tracing.instrument(gameState, "state")
+    tracing.instrument(userManager, "users")
+    # Lecture / réécriture des fiches : le coût disque d'une mutation apparaît à part
+    tracing.instrument(userManager, "users", ["_read", "_write"])
+    tracing.instrument(manager, "net", ["broadcast", "send_to"])
+    tracing.instrument(sys.modules[__name__], "serialize", ["make_msg"])
+    tracing.instrument_engine(get_engine())
+
+
+async def trace_http(request: Request, call_next):
+    """Span racine par requête HTTP (middleware installé seulement si HAVEN_TRACE est défini)."""
+    client = request.client.host if request.client else "?"
+    handle = tracer.start(f"{request.method} {request.url.path}", f"http {client}", cat="http") if tracer else None
+    try:
+        return await call_next(request)
+    finally:
+        tracing.finish(handle)
+
+
 # ──────────────────────────────────────────────
-# 5. API REST — Authentification
+# 5. Tâches de fond
 # ──────────────────────────────────────────────
 
-@app.post("/register")
+async def heartbeat_loop():
+    """PING les clients et ferme les sessions qui n'ont rien envoyé depuis HEARTBEAT_TIMEOUT."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            now = time.monotonic()
+            stale = [cid for cid, info in manager.active_sessions.items()
+                     if now - info["last_seen"] > HEARTBEAT_TIMEOUT]
+            for cid in stale:
+                await manager.reap(cid)
+
+            ping = make_msg("PING", t=now)
+            await asyncio.gather(*(manager.send_to(cid, ping) for cid in list(manager.active_sessions)))
+            metrics.set_gauge("ws.sessions", len(manager.active_sessions))
+
+            # Fiches des joueurs déconnectés depuis longtemps retirées de la mémoire
+            evicted = userManager.evict_idle()
+            if evicted:
+                metrics.inc("users.evicted", evicted)
+            metrics.set_gauge("users.resident", len(userManager.users))
+        except Exception:
+            log_tasks.error("Erreur du heartbeat", exc_info=True)
+
+
+async def flush_chat():
+    """Livre les messages des canaux chargés : un CHAT_BATCH par canal (et par destinataire)."""
+    for channel, entries in chat_hub.drain().items():
+        kind = chat.channel_kind(channel)
+        if kind in ("near", "dm"):
+            for cid, messages in chat.group_by_recipient(entries).items():
+                await manager.send_to(cid, make_msg("CHAT_BATCH", channel=kind, messages=messages))
+        else:
+            await send_chat(channel, make_msg("CHAT_BATCH", channel=kind, messages=[m for m, _ in entries]))
+        metrics.inc("chat.batches")
+
+
+async def chat_loop():
+    """Livraison groupée du chat, une fois par intervalle."""
+    while True:
+        await asyncio.sleep(chat.BATCH_INTERVAL)
+        try:
+            await flush_chat()
+        except Exception:
+            log_tasks.error("Erreur lors de la livraison groupée du chat", exc_info=True)
+
+
+async def overload_loop():
+    """Réévalue le mode surcharge à partir du retard mesuré par le watchdog."""
+    while True:
+        await asyncio.sleep(overload.TICK)
+        overload_monitor.refresh(watchdog.lag)
+        metrics.set_gauge("overload.active", int(overload_monitor.active))
+        metrics.set_gauge("overload.depth", overload_monitor.depth)
+
+
+async def respawn_loop():
+    """Dépile périodiquement les repousses échues et les diffuse en deltas à la map concernée."""
+    while True:
+        await asyncio.sleep(RESPAWN_TICK_INTERVAL)
+        try:
+            for map_id, msg_type, data in gameState.process_timers():
+                await manager.broadcast(make_msg(msg_type, **data), map_id=map_id)
+        except Exception:
+            log_tasks.error("Erreur lors du traitement de l'échéancier de repousse", exc_info=True)
+
+
+# ── Redémarrage sans perte ──
+
+def restore_snapshot():
+    """Reprend les rooms (et, si le snapshot est récent, les sessions à reprendre et le chat) du process précédent."""
+    global chat_hub
+    state = handoff.read_snapshot(handoff.snapshot_path(shard_map.worker_id), userManager.saved_at)
+    if state is None:
+        return
+    for map_id, room in state["maps"].items():
+        if shard_map.is_local(map_id):
+            gameState.maps[map_id] = room
+    chat_hub = state["chat_hub"]
+    if state["sessions_valid"]:
+        manager.event_logs.update(state["event_logs"])
+        manager.resume_registry = state["resume_registry"]
+    metrics.inc("handoff.restored")
+
+
+# Attente max des commandes de room en attente pendant le drain (secondes)
+DRAIN_ACTORS_TIMEOUT = 5.0
+
+
+async def drain(reason: str = "Redémarrage du serveur"):
+    """
+    Arrêt propre : refuse les nouvelles connexions, prévient chaque client (SERVER_RESTART avec un
+    délai de reconnexion étalé) et ferme sa socket en gardant sa session en réserve, puis écrit
+    toutes les fiches joueurs et le snapshot relu par le process suivant. Rappelable : un second
+    appel réécrit seulement les fiches et le snapshot.
+    """
+    global draining
+    started = time.perf_counter()
+    sessions = []
+    try:
+        if not draining:
+            draining = True
+            await flush_chat()
+            # Commandes de room en attente appliquées (et diffusées) avant la fermeture des sockets
+            # (absentes si le drain survient avant la fin du démarrage)
+            if room_actors is not None:
+                await room_actors.stop(DRAIN_ACTORS_TIMEOUT)
+            sessions = list(manager.active_sessions.items())
+            # Sessions mises en réserve avant la fermeture : le endpoint ne diffuse pas de PLAYER_LEFT
+            for cid, _ in sessions:
+                manager.disconnect(cid)
+            await asyncio.gather(*(notify_restart(session["ws"], reason) for _, session in sessions))
+    finally:
+        # Fiches et snapshot écrits quoi qu'il arrive pendant la notification des clients
+        userManager.save_users()
+        stats = handoff.write_snapshot(handoff.snapshot_path(shard_map.worker_id), gameState.maps,
+                                       manager.event_logs, manager.resume_registry, chat_hub, userManager.users)
+    metrics.set_gauge("handoff.drain_ms", elapsed_ms(started))
+    log_startup.info("Drain terminé", sessions=len(sessions), players=len(userManager.users),
+                     snapshot_bytes=stats["bytes"], ms=elapsed_ms(started))
+    return dict(stats, sessions=len(sessions))
+
+
+async def notify_restart(websocket: WebSocket, reason: str):
+    """SERVER_RESTART puis fermeture 1012 (Service Restart) ; le client se reconnecte après retry_after."""
+    try:
+        await asyncio.wait_for(websocket.send_text(make_msg(
+            "SERVER_RESTART", message=reason, retry_after=handoff.restart_retry_after())), SEND_TIMEOUT)
+        await asyncio.wait_for(websocket.close(code=1012, reason=reason), SEND_TIMEOUT)
+    except Exception:
+        pass
+
+
+def install_drain_signals():
+    """
+    SIGTERM / SIGINT : drain d'abord, puis le gestionnaire du serveur (uvicorn ferme les
+    sockets avant l'arrêt de l'application : trop tard pour prévenir les clients).
+    Un second signal est transmis directement (arrêt forcé).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        async def drain_then_exit(signum, frame, previous=previous):
+            try:
+                await drain()
+            except Exception:
+                log_startup.error("Erreur pendant le drain", exc_info=True)
+            finally:
+                previous(signum, frame)
+
+        def on_signal(signum, frame, previous=previous, drain_then_exit=drain_then_exit):
+            if draining:
+                previous(signum, frame)
+            else:
+                loop.call_soon_threadsafe(lambda: background_tasks.append(
+                    loop.create_task(drain_then_exit(signum, frame))))
+
+        signal.signal(sig, on_signal)
+
+
+# ──────────────────────────────────────────────
+# 6. API REST — Authentification
+# ──────────────────────────────────────────────
+
+@router.post("/register")
 async def register(req: backend.models.RegisterRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(backend.models.User).where(backend.models.User.username == req.username))
     existing_user = result.scalars().first()
@@ -168,7 +1044,7 @@ async def register(req: backend.models.RegisterRequest, db: AsyncSession = Depen
     await db.commit()
     return {"message": "Compte créé avec succès"}
 
-@app.post("/login")
+@router.post("/login")
 async def login(req: backend.models.LoginRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(backend.models.User).where(backend.models.User.username == req.username))
     user = result.scalars().first()
@@ -179,53 +1055,337 @@ async def login(req: backend.models.LoginRequest, db: AsyncSession = Depends(get
     token = create_access_token({"sub": user.id, "username": user.username, "role": user.role})
     return {"access_token": token, "token_type": "bearer", "player_id": user.id, "username": user.username, "role": user.role}
 
+async def is_admin(user_id: Any) -> bool:
+    """
+    Rôle lu dans la fiche du compte à chaque demande : le rôle porté par le jeton (et gardé par
+    le cache de jetons jusqu'à son expiration) ne suffit pas, un admin rétrogradé perd ses droits
+    immédiatement.
+    """
+    if not isinstance(user_id, str):
+        return False
+    async with get_session_factory()() as db:
+        result = await db.execute(select(backend.models.User.role).where(backend.models.User.id == user_id))
+        return result.scalar() == "admin"
+
+async def require_admin(authorization: str = Header(None)) -> Dict[str, Any]:
+    """Dépendance des routes d'administration : jeton "Bearer" valide d'un compte admin."""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Token manquant")
+    payload = token_cache.decode(authorization[len("Bearer "):])
+    if not payload:
+        raise HTTPException(status_code=401, detail="Token invalide")
+    if not await is_admin(payload.get("sub")):
+        raise HTTPException(status_code=403, detail="Permission refusée")
+    return payload
+
+@router.get("/admin/stalls")
+async def admin_stalls(admin: Dict[str, Any] = Depends(require_admin)):
+    """Derniers blocages de la boucle, avec la pile capturée pendant le blocage."""
+    return {"max_lag_ms": round(watchdog.max_lag * 1000, 1), "stalls": watchdog.recent_stalls()}
+
+@router.get("/admin/profile")
+async def admin_profile(duration: float = 5.0, format: str = "json", admin: Dict[str, Any] = Depends(require_admin)):
+    """Profil de `duration` secondes (max 30) ; `format=folded` renvoie le texte brut pour flamegraph.pl / speedscope."""
+    if profile_duration(duration) is None:
+        raise HTTPException(status_code=422, detail="Durée invalide")
+    result = await run_profile(duration)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Un profil est déjà en cours")
+    if format == "folded":
+        return PlainTextResponse(result["folded"])
+    return result
+
+@router.get("/admin/memory")
+async def admin_memory(admin: Dict[str, Any] = Depends(require_admin)):
+    """Mémoire approximative par room, par session et du cache des fiches joueurs, + RSS du process."""
+    report = memory.memory_report(gameState, manager, userManager, opaque=(WebSocket,), extra={
+        "event_logs": manager.event_logs,
+        "resume_registry": manager.resume_registry,
+        "roster": manager.roster,
+        "snapshot_cache": snapshot_cache,
+    })
+    report["allocation_tracking"] = allocation_tracker.active
+    return report
+
+@router.post("/admin/memory/mark")
+async def admin_memory_mark(admin: Dict[str, Any] = Depends(require_admin)):
+    """Démarre tracemalloc (si besoin) et prend la photo de référence des allocations."""
+    return allocation_tracker.mark()
+
+@router.get("/admin/memory/diff")
+async def admin_memory_diff(top: int = 20, admin: Dict[str, Any] = Depends(require_admin)):
+    """Croissance des allocations depuis /admin/memory/mark, par ligne de code."""
+    result = allocation_tracker.diff(max(1, min(top, 200)))
+    if result is None:
+        raise HTTPException(status_code=409, detail="Aucune référence : POST /admin/memory/mark d'abord")
+    return result
+
+@router.delete("/admin/memory/mark")
+async def admin_memory_stop(admin: Dict[str, Any] = Depends(require_admin)):
+    """Arrête tracemalloc (surcoût sur chaque allocation) et oublie la référence."""
+    allocation_tracker.stop()
+    return {"tracing": False}
+
+@router.post("/admin/drain")
+async def admin_drain(admin: Dict[str, Any] = Depends(require_admin)):
+    """Drain avant un arrêt piloté (déploiement) : clients prévenus, état écrit ; le process refuse ensuite toute connexion."""
+    return await drain()
+
+@router.get("/admin/overload")
+async def admin_overload(admin: Dict[str, Any] = Depends(require_admin)):
+    """État du délestage : mode surcharge, retard lissé, messages en attente, délestés / fusionnés par type."""
+    return overload_monitor.report()
+
+@router.get("/admin/actors")
+async def admin_actors(admin: Dict[str, Any] = Depends(require_admin)):
+    """Acteurs de room : commandes en attente, appliquées, taille des lots, temps passé par room."""
+    return room_actors.report()
+
+@router.get("/metrics")
+async def get_metrics():
+    """Compteurs serveur (connexions fermées par le heartbeat, échecs d'envoi, sessions actives...)."""
+    metrics.set_gauge("ws.sessions", len(manager.active_sessions))
+    metrics.set_gauge("admission.handshakes", handshake_gate.active)
+    metrics.set_gauge("admission.waiting", handshake_gate.waiting)
+    metrics.set_gauge("auth.token_cache_hits", token_cache.hits)
+    metrics.set_gauge("auth.token_cache_misses", token_cache.misses)
+    metrics.set_gauge("overload.shed", sum(overload_monitor.shed.values()))
+    metrics.set_gauge("overload.coalesced", sum(overload_monitor.coalesced.values()))
+    metrics.set_gauge("actors.rooms", len(room_actors))
+    metrics.set_gauge("actors.queued", room_actors.depth)
+    return metrics.snapshot()
+
+@router.get("/maps/{map_id}/state")
+async def get_map_state(map_id: str, chunks: str = None, accept_encoding: str = Header(""),
+                        if_none_match: str = Header(None)):
+    """
+    Snapshot HTTP d'une map, cacheable : ETag de version, 304 sur If-None-Match, gzip pré-calculé.
+    ?chunks=cx,cy ou ?chunks=cx0,cy0,cx1,cy1 : plage de chunks (format WORLD_CHUNK) au lieu de la carte.
+    """
+    if not shard_map.is_local(map_id):
+        owner_url = shard_map.url_for(map_id).replace("ws://", "http://", 1).replace("wss://", "https://", 1)
+        return RedirectResponse(f"{owner_url}/maps/{map_id}/state" + (f"?chunks={chunks}" if chunks else ""),
+                                status_code=307)
+    # Pas de génération à la demande pour un map_id arbitraire
+    if not is_known_map(map_id):
+        raise HTTPException(status_code=404, detail="Map inconnue")
+    room = await gameState.load_room_async(map_id)
+
+    if chunks:
+        try:
+            bounds = [int(v) for v in chunks.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="chunks attendu : cx,cy ou cx0,cy0,cx1,cy1")
+        if len(bounds) == 2:
+            bounds = bounds * 2
+        rect = snapshots.clamp_chunk_rect(room, tuple(bounds)) if len(bounds) == 4 else None
+        if rect is None:
+            raise HTTPException(status_code=400, detail="Plage de chunks invalide")
+        etag = snapshots.range_etag(room, rect)
+        key, build = (map_id, "range", rect), lambda: snapshots.build_range(room, rect)
+    else:
+        etag = snapshots.full_etag(room)
+        key, build = (map_id, "full"), lambda: snapshots.build_full(room)
+
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache", "Vary": "Accept-Encoding"}
+    if snapshots.etag_matches(if_none_match, etag):
+        metrics.inc("http.state.not_modified")
+        return Response(status_code=304, headers=headers)
+
+    snapshot, built = snapshot_cache.get(key, etag, build)
+    metrics.inc("http.state.built" if built else "http.state.cached")
+    if "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(snapshot.body, media_type="application/json", headers=headers)
+
 # ──────────────────────────────────────────────
-# 6. WebSocket Endpoint
+# 7. WebSocket Endpoint
 # ──────────────────────────────────────────────
 
-@app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str, token: str = Query(None)):
+async def read_socket(websocket: WebSocket, client_id: str, inbox: overload.Inbox):
+    """Lit la socket en continu : preuve de vie, capture, puis dépôt dans l'inbox (délestage éventuel)."""
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            manager.touch(client_id)
+            if recorder:
+                recorder.record(client_id, manager.active_sessions.get(client_id, {}).get("map_id", DEFAULT_MAP), raw)
+            inbox.push(raw)
+    except overload.InboxOverflow as e:
+        # Client qui envoie plus vite que le serveur ne traite, sans rien de délestable : coupé
+        metrics.inc("overload.inbox_overflow")
+        log.warning("Inbox pleine : connexion fermée", client_id=client_id, reason=str(e))
+        inbox.discard()
+        inbox.close(WebSocketDisconnect(code=1008))
+        try:
+            await asyncio.wait_for(websocket.close(code=1008, reason="Trop de messages en attente"), SEND_TIMEOUT)
+        except Exception:
+            pass
+    except Exception as e:
+        inbox.close(e)
+
+
+async def reject_busy(websocket: WebSocket, client_id: str, reason: str):
+    """Refus d'admission : SERVER_BUSY avec un délai de nouvelle tentative, puis fermeture (1013)."""
+    retry_after = handshake_gate.retry_after()
+    metrics.inc("admission.rejected")
+    log.info("Connexion refusée", client_id=client_id, reason=reason, retry_after=retry_after,
+             waiting=handshake_gate.waiting)
+    await websocket.accept()
+    await websocket.send_text(make_msg("SERVER_BUSY", message=reason, retry_after=retry_after))
+    await websocket.close(code=1013, reason=reason)
+
+
+def settle_player(client_id: str, map_id: str) -> bool:
+    """
+    Position sauvegardée hors carte (ancienne sauvegarde) ou bloquée (obstacle posé dessus,
+    room régénérée) : le joueur est replacé sur une case libre avant sa connexion.
+    Retourne True s'il a été déplacé.
+    """
+    user = userManager.get_or_create_user(client_id)
+    fixed = gameState.walkable_position(map_id, user.get("x", MAP_SPAWN[0]), user.get("y", MAP_SPAWN[1]), MAP_SPAWN)
+    if fixed is None:
+        return False
+    log.info("Position replacée", client_id=client_id, map_id=map_id, x=fixed[0], y=fixed[1])
+    userManager.update_user_position(client_id, *fixed)
+    return True
+
+
+async def handshake(websocket: WebSocket, client_id: str, resume: Optional[str], last_seq: Optional[int]) -> bool:
+    """
+    Routage, chargement de la room, connexion et PLAYER_SYNC (sous le HandshakeGate).
+    Retourne False si le client a été redirigé ou refusé (socket fermée).
+    """
+    # Routage multi-workers : la map du joueur peut appartenir à un autre worker
+    target_map = player_map(client_id)
+    if not shard_map.is_local(target_map):
+        await websocket.accept()
+        await websocket.send_text(make_msg("REDIRECT", url=shard_map.url_for(target_map), map_id=target_map))
+        await websocket.close(code=4001, reason="Map servie par un autre worker")
+        return False
+    if map_is_full(target_map, client_id):
+        metrics.inc("admission.map_full")
+        await reject_busy(websocket, client_id, "Carte pleine, nouvelle tentative plus tard")
+        return False
+    await gameState.load_room_async(target_map)
+    settled = settle_player(client_id, target_map)
+
+    resumed = await manager.connect(websocket, client_id, target_map, resume_token=resume, last_seq=last_seq)
+    await announce_presence("join", client_id, manager.active_sessions[client_id]["map_id"])
+    if recorder:
+        recorder.opened(client_id, manager.active_sessions[client_id]["map_id"], userManager.get_or_create_user(client_id))
+
+    # ── A. Synchro Joueur ──
+    # Session reprise : le client a déjà son état, seules les diffusions manquées ont été rejouées
+    # (sauf s'il vient d'être replacé)
+    if not resumed or settled:
+        user_data = userManager.get_or_create_user(client_id)
+        await websocket.send_text(make_msg("PLAYER_SYNC", payload=user_data))
+    return True
+
+
+@router.websocket("/ws/{client_id}")
+async def websocket_endpoint(websocket: WebSocket, client_id: str, token: str = Query(None),
+                             resume: str = Query(None), last_seq: int = Query(None)):
     if not token:
         await websocket.close(code=1008, reason="Token manquant (accès refusé)")
         return
     
-    payload_token = decode_access_token(token)
+    payload_token = token_cache.decode(token)
     if not payload_token or payload_token.get("sub") != client_id:
         await websocket.close(code=1008, reason="Token invalide ou ne correspond pas au client_id")
         return
-        
-    await manager.connect(websocket, client_id)
 
-    # ── A. Synchro Joueur ──
-    user_data = userManager.get_or_create_user(client_id)
-    await websocket.send_text(make_msg("PLAYER_SYNC", payload=user_data))
+    if draining:
+        await websocket.accept()
+        await notify_restart(websocket, "Redémarrage du serveur")
+        return
+
+    # Admission : handshakes simultanés bornés, refus rapide quand la file est pleine
+    waited_at = time.perf_counter()
+    if not await handshake_gate.acquire():
+        await reject_busy(websocket, client_id, "Serveur saturé, nouvelle tentative plus tard")
+        return
+    metrics.set_gauge("admission.last_wait_ms", elapsed_ms(waited_at))
+    try:
+        if not await handshake(websocket, client_id, resume, last_seq):
+            return
+    finally:
+        handshake_gate.release()
 
     # ── B. Synchro Monde ──
     # NOTE (Session 8.3): On n'envoie plus WORLD_STATE ici automatiquement.
     # Le client doit envoyer REQUEST_WORLD_STATE quand sa scène Phaser est prête.
     # Cela corrige la race condition où les données arrivaient avant les listeners.
 
+    # Message précédent (type, début du traitement) : journalisé au tour suivant, car les
+    # branches du routeur se terminent souvent par `continue`
+    handled_type, handled_at = None, 0.0
+    # Span racine du message en cours (HAVEN_TRACE), refermé au même endroit que le log
+    trace = None
+
+    # Lecture de la socket dans une tâche dédiée : les messages attendent dans l'inbox, où ils
+    # peuvent être fusionnés ou délestés quand le serveur est surchargé
+    inbox = overload.Inbox(overload_monitor)
+    reader = asyncio.create_task(read_socket(websocket, client_id, inbox))
+
     try:
         while True:
-            raw = await websocket.receive_text()
-            current_map = manager.active_sessions.get(client_id, {}).get("map_id", "farm_main")
-
-            try:
-                msg = json.loads(raw)
-            except json.JSONDecodeError:
-                continue
+            if handled_type is not None:
+                log.debug("Message traité", event="message", client_id=client_id, map_id=current_map,
+                          msg_type=handled_type, latency_ms=elapsed_ms(handled_at))
+                handled_type = None
+            if trace is not None:
+                tracing.finish(trace)
+                trace = None
+
+            priority, msg = await inbox.get()
+            if priority == overload.LOW and overload_monitor.active:
+                # Surcharge : les actions économiques des autres sessions passent d'abord
+                await overload_monitor.yield_to_critical()
+            current_map = manager.active_sessions.get(client_id, {}).get("map_id", DEFAULT_MAP)
 
             msg_type = msg.get("type")
             payload = msg.get("payload", {})
+            handled_type, handled_at = msg_type, time.perf_counter()
+            if tracer:
+                trace = tracer.start(str(msg_type), client_id, client_id=client_id, map_id=current_map)
+
+            # ──────────── PONG (heartbeat) ────────────
+            if msg_type == "PONG":
+                # La réception suffit (touch) ; t renvoyé tel quel permet de mesurer le RTT
+                sent_at = payload.get("t")
+                if isinstance(sent_at, (int, float)):
+                    metrics.set_gauge("ws.last_rtt_ms", round((time.monotonic() - sent_at) * 1000, 1))
+                continue
 
             # ──────────── PLAYER_MOVE ────────────
-            if msg_type == "PLAYER_MOVE":
+            elif msg_type == "PLAYER_MOVE":
                 x = payload.get("x")
                 y = payload.get("y")
-                if x is None or y is None:
+                if not isinstance(x, (int, float)) or not isinstance(y, (int, float)):
+                    continue
+                x, y = int(x), int(y)
+
+                # Validation serveur : destination marchable et atteignable (A* sur la grille de collision)
+                mover = userManager.get_or_create_user(client_id)
+                if not gameState.validate_move(current_map, mover.get("x", 10), mover.get("y", 10), x, y):
+                    # Joueur sur une case bloquée (obstacle posé dessus, position hors carte) :
+                    # replacé sur la case libre la plus proche, jamais déplacé sans vérification
+                    snapped = gameState.walkable_position(current_map, mover.get("x", 10), mover.get("y", 10), MAP_SPAWN)
+                    if snapped is not None:
+                        userManager.update_user_position(client_id, *snapped)
+                        manager.roster.move(client_id, *snapped)
+                        await manager.broadcast(make_msg(
+                            "PLAYER_MOVED", id=client_id, x=snapped[0], y=snapped[1]
+                        ), map_id=current_map, exclude_id=client_id)
+                    await websocket.send_text(make_msg("ERROR", message="Déplacement invalide."))
+                    await websocket.send_text(make_msg("PLAYER_SYNC", payload=mover))
                     continue
 
                 userManager.update_user_position(client_id, x, y)
+                manager.roster.move(client_id, x, y)
 
                 await manager.broadcast(make_msg(
                     "PLAYER_MOVED",
@@ -234,60 +1394,33 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, token: str =
                     y=y
                 ), map_id=current_map, exclude_id=client_id)
 
+                # Mode streaming : on envoie les chunks autour de la destination
+                await stream_chunks(client_id, current_map, x, y)
+
             # ──────────── ACTION_HARVEST (Récolte Serveur) ────────────
             elif msg_type == "ACTION_HARVEST":
                 resource_id = payload.get("resource_id")
                 equipped_tool = payload.get("tool", "none")
-                print(f"[WS] ACTION_HARVEST reçu de {client_id}: resource_id={resource_id}, tool={equipped_tool}")
+                log.debug("ACTION_HARVEST", client_id=client_id, map_id=current_map, resource_id=resource_id, tool=equipped_tool)
                 
                 if not resource_id:
                     await websocket.send_text(make_msg("ERROR", message="resource_id manquant"))
                     continue
 
-                harvest_result = gameState.harvest_resource(client_id, current_map, resource_id, equipped_tool, userManager)
+                harvest_result = await room_actors.submit(current_map, cmd_harvest, client_id, current_map,
+                                                          resource_id, equipped_tool)
+                await send_harvest_reply(websocket, harvest_result)
 
-                if isinstance(harvest_result, str):
-                    # Refus avec motif précis généré par gameState
-                    await websocket.send_text(make_msg("ERROR", message=harvest_result))
-                    continue
-                elif harvest_result is None:
-                    # Fallback sécurité
-                    await websocket.send_text(make_msg("ERROR", message="Récolte impossible (erreur inconnue)"))
-                    continue
+            # ──────────── ACTION_HARVEST_NEAREST (Récolte automatique) ────────────
+            elif msg_type == "ACTION_HARVEST_NEAREST":
+                # Cible la ressource la plus proche à portée (optionnellement d'un asset donné)
+                target_asset = payload.get("asset")
+                equipped_tool = payload.get("tool", "none")
+
+                harvest_result = await room_actors.submit(current_map, cmd_harvest_nearest, client_id, current_map,
+                                                          target_asset, equipped_tool)
+                await send_harvest_reply(websocket, harvest_result)
 
-                affected_res, new_wallet, loot_dict = harvest_result
-
-                # ── Wallet update (ciblé uniquement sur le joueur) ──
-                if new_wallet:
-                    await websocket.send_text(make_msg("WALLET_UPDATE", payload=new_wallet))
-
-                # ── Feedback visuel (floating text) ──
-                await websocket.send_text(make_msg(
-                    "HARVEST_SUCCESS",
-                    x=affected_res["x"],
-                    y=affected_res["y"],
-                    loot=loot_dict
-                ))
-
-                # ── Cas spécial : apple_tree — l'arbre n'est PAS supprimé ──
-                is_apple_tree = affected_res.get("asset") == "apple_tree"
-                if not is_apple_tree:
-                    # Cas normal : la ressource a été retirée du monde
-                    # Diffuse le nouveau WORLD_STATE à TOUS les clients de la map (diff côté client)
-                    await manager.broadcast(make_msg(
-                        "WORLD_STATE",
-                        payload=gameState.get_full_state(current_map)
-                    ), map_id=current_map)
-                    # Compatibilité legacy : signal de suppression explicite
-                    await manager.broadcast(make_msg(
-                        "RESOURCE_REMOVED",
-                        id=affected_res["id"],
-                        x=affected_res["x"],
-                        y=affected_res["y"]
-                    ), map_id=current_map)
-                # Sinon pour apple_tree : on ne fait rien de plus,
-                # l'arbre reste dans le WORLD_STATE, aucun WORLD_STATE à rebrod.
-                    
             # ──────────── PLAYER_INTERACT (Legacy Récolte) ────────────
             elif msg_type == "PLAYER_INTERACT":
                 x = payload.get("x")
@@ -295,26 +1428,12 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, token: str =
                 if x is None or y is None:
                     continue
 
-                removed = gameState.remove_resource_at(current_map, x, y)
-
-                if removed:
-                    # Gain de ressource
-                    gain_type = determine_harvest_resource(removed.get("asset", ""))
-                    wallet = userManager.update_wallet(client_id, gain_type, 1)
-
-                    if wallet:
-                        await websocket.send_text(make_msg(
-                            "WALLET_UPDATE",
-                            payload=wallet
-                        ))
-
-                    await manager.broadcast(make_msg(
-                        "RESOURCE_REMOVED",
-                        id=removed["id"],
-                        x=x,
-                        y=y
-                    ), map_id=current_map)
-                # else: Rien à récolter, on ignore silencieusement
+                wallet = await room_actors.submit(current_map, cmd_interact, client_id, current_map, x, y)
+                if wallet:
+                    await websocket.send_text(make_msg(
+                        "WALLET_UPDATE",
+                        payload=wallet
+                    ))
 
             # ──────────── ACTION_CRAFT (Artisanat Autoritaire) ────────────
             elif msg_type == "ACTION_CRAFT":
@@ -353,44 +1472,11 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, token: str =
                 if x is None or y is None or not item_id:
                     continue
 
-                if not userManager.consume_item(client_id, item_id, 1):
-                    await websocket.send_text(make_msg("ERROR", message=f"Vous ne possédez pas : {item_id}"))
-                    continue
-
-                # Mapping "inventory item name" -> "GameState (asset, type)"
-                place_rules = {
-                    "Kit de Feu de Camp": {"asset": "rock", "type": "campfire"},
-                    "furnace": {"asset": "furnace", "type": "furnace"},
-                    "clay_pot": {"asset": "clay_pot", "type": "clay_pot"}
-                }
-                
-                rule = place_rules.get(item_id)
-                if not rule:
-                    userManager.add_item(client_id, item_id, 1)
-                    await websocket.send_text(make_msg("ERROR", message=f"Objet non plaçable : {item_id}"))
+                error = await room_actors.submit(current_map, cmd_place, client_id, current_map, item_id, x, y)
+                if error:
+                    await websocket.send_text(make_msg("ERROR", message=error))
                     continue
-                    
-                target_asset = rule["asset"]
-                target_type = rule["type"]
 
-                new_res = gameState.add_resource(
-                    asset=target_asset,
-                    obj_type=target_type,
-                    x=x,
-                    y=y,
-                    map_id=current_map
-                )
-                
-                if not new_res:
-                    userManager.add_item(client_id, item_id, 1)
-                    await websocket.send_text(make_msg("ERROR", message="Case occupée"))
-                    continue
-
-                # Broadcast placement
-                await manager.broadcast(make_msg(
-                    "RESOURCE_PLACED",
-                    resource=new_res
-                ), map_id=current_map)
                 await websocket.send_text(make_msg("PLACE_SUCCESS", payload={"itemId": item_id}))
 
             # ──────────── PLAYER_BUILD (Construction) ────────────
@@ -410,136 +1496,206 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, token: str =
                     ))
                     continue
 
-                # 1. Vérification & Paiement
-                cost_dict = recipe["cost"]
-                # Support mono-ressource pour le MVP
-                resource_type = list(cost_dict.keys())[0]
-                cost_amount = cost_dict[resource_type]
-
-                wallet = userManager.update_wallet(client_id, resource_type, -cost_amount)
-                if not wallet:
-                    await websocket.send_text(make_msg(
-                        "ERROR",
-                        message="Ressources insuffisantes"
-                    ))
-                    continue
-
-                # 2. Placement
-                new_res = gameState.add_resource(
-                    asset=recipe["asset"],
-                    obj_type=recipe["type"],
-                    x=x,
-                    y=y,
-                    map_id=current_map
-                )
-    
-                if not new_res:
-                    # Collision — Rembourser le joueur
-                    userManager.update_wallet(client_id, resource_type, cost_amount)
-                    wallet = userManager.get_or_create_user(client_id).get("wallet", {})
+                # Paiement + placement dans la file de la room (remboursé si la case est occupée)
+                wallet, error = await room_actors.submit(current_map, cmd_build, client_id, current_map, recipe, x, y)
+                if wallet:
                     await websocket.send_text(make_msg(
                         "WALLET_UPDATE",
                         payload=wallet
                     ))
+                if error:
                     await websocket.send_text(make_msg(
                         "ERROR",
-                        message="Case occupée"
+                        message=error
                     ))
-                    continue
-
-                # 3. Succès
-                await websocket.send_text(make_msg(
-                    "WALLET_UPDATE",
-                    payload=wallet
-                ))
-                await manager.broadcast(make_msg(
-                    "RESOURCE_PLACED",
-                    resource=new_res
-                ), map_id=current_map)
 
             # ──────────── REQUEST_WORLD_STATE (Handshake) ────────────
             elif msg_type == "REQUEST_WORLD_STATE":
-                print(f"[WS] Client {client_id} requests WORLD_STATE for {current_map}")
-                world_state = gameState.get_full_state(current_map)
-                await manager.send_to(client_id, make_msg(
-                    "WORLD_STATE",
-                    payload=world_state
-                ))
+                mode = payload.get("mode", "full")
+                log.info("REQUEST_WORLD_STATE", client_id=client_id, map_id=current_map, mode=mode)
+
+                if mode == "seed_diff":
+                    # Le client régénère la carte de base lui-même : seed + paramètres + diff suffisent.
+                    # Repli sur le streaming par chunks s'il ne connaît pas le générateur de la room.
+                    if gameState.get_room(current_map).generator in payload.get("generators", []):
+                        manager.active_sessions[client_id]["stream"] = None
+                        await manager.send_to(client_id, make_msg(
+                            "WORLD_SEED_DIFF",
+                            payload=gameState.get_seed_diff_state(current_map)
+                        ))
+                    else:
+                        mode = "chunks"
+
+                if mode == "chunks":
+                    # Streaming : en-tête + chunks autour du joueur, le reste suit au fil des déplacements.
+                    # Le client peut fournir les versions des chunks qu'il possède déjà (reconnexion),
+                    # valables seulement pour l'epoch de room reçue dans son dernier WORLD_META.
+                    known = {}
+                    for entry in payload.get("known", []):
+                        try:
+                            cx, cy, version = entry
+                            known[(int(cx), int(cy))] = int(version)
+                        except (TypeError, ValueError):
+                            continue
+                    current_versions = gameState.get_chunk_versions(current_map, list(known.keys()), payload.get("epoch"))
+                    up_to_date = {key for key, version in known.items() if current_versions.get(key) == version}
+
+                    manager.active_sessions[client_id]["stream"] = up_to_date
+                    await manager.send_to(client_id, make_msg("WORLD_META", payload=gameState.get_world_meta(current_map)))
+                    me = userManager.get_or_create_user(client_id)
+                    await stream_chunks(client_id, current_map, me.get("x", 10), me.get("y", 10))
+                elif mode != "seed_diff":
+                    world_state = gameState.get_full_state(current_map)
+                    await manager.send_to(client_id, make_msg(
+                        "WORLD_STATE",
+                        payload=world_state
+                    ))
 
                 # Session 10.4 : On renvoie les joueurs déjà connectés ici
                 # car le client est enfin prêt à les afficher (sa scène Phaser écoute)
-                current_players_data = []
-                for cid, info in manager.active_sessions.items():
-                    if cid != client_id and info["map_id"] == current_map:
-                        user = userManager.get_or_create_user(cid)
-                        current_players_data.append({"id": cid, "x": user.get("x", 10), "y": user.get("y", 10)})
-                
-                await manager.send_to(client_id, make_msg(
-                    "CURRENT_PLAYERS",
-                    players=current_players_data
-                ))
+                # (roster pré-sérialisé : il inclut le joueur lui-même, ignoré par le client)
+                await manager.send_to(client_id, manager.roster.players_message(current_map))
+                await send_chat_history(client_id, current_map)
 
             # ──────────── PLAYER_CHAT ────────────
             elif msg_type == "PLAYER_CHAT":
-                text = payload.get("text")
-                if not text:
+                text = chat.clean_text(payload.get("text"))
+                if text is None:
                     continue
-
-                await manager.broadcast(make_msg(
-                    "CHAT_MESSAGE",
-                    sender=client_id,
-                    text=text,
-                    timestamp=time.time()
-                ), map_id=current_map)
+                kind = payload.get("channel", "map")
+                message = {"sender": client_id, "text": text, "timestamp": time.time(), "channel": kind}
+
+                if kind == "global":
+                    # Chat global : toutes les maps de ce worker + les autres workers via le bus
+                    await post_chat(chat.GLOBAL, message)
+                    await bus.publish("chat.global", message)
+                elif kind == "near":
+                    await post_chat(chat.near_channel(current_map), message, nearby_players(client_id, current_map))
+                elif kind == "dm":
+                    target = payload.get("to")
+                    if not isinstance(target, str) or target == client_id:
+                        continue
+                    message["to"] = target
+                    if target in manager.active_sessions:
+                        recipients = {client_id, target}
+                    elif target in remote_presence:
+                        recipients = {client_id}
+                        await bus.publish("chat.direct", message)
+                    else:
+                        await websocket.send_text(make_msg("ERROR", message="Joueur introuvable ou hors ligne."))
+                        continue
+                    await post_chat(chat.direct_channel(client_id, target), message, recipients)
+                else:
+                    message["channel"] = "map"
+                    await post_chat(chat.map_channel(current_map), message)
                 
             # ──────────── ACTION_CHANGE_MAP ────────────
             elif msg_type == "ACTION_CHANGE_MAP":
-                # [16.4] Rollback: Map transition disabled
-                await websocket.send_text(make_msg("ERROR", message="Le voyage inter-cartes est temporairement désactivé."))
+                target_map = payload.get("map_id")
+                if not isinstance(target_map, str) or not is_known_map(target_map):
+                    await websocket.send_text(make_msg("ERROR", message="Carte inconnue."))
+                    continue
+                if target_map == current_map:
+                    continue
+                if map_is_full(target_map, client_id):
+                    await websocket.send_text(make_msg("ERROR", message="Carte pleine."))
+                    continue
+                x, y = payload.get("x"), payload.get("y")
+                spawn = (x, y) if isinstance(x, int) and isinstance(y, int) else None
+                etag = payload.get("etag")
+                if await change_map(client_id, target_map, spawn, etag if isinstance(etag, str) else None):
+                    # Transféré vers un autre worker : fin de session ici (PLAYER_LEFT diffusé ci-dessous)
+                    raise WebSocketDisconnect(code=4001)
 
             # ──────────── ADMIN COMMANDS ────────────
             elif msg_type == "ADMIN_KICK_PLAYER":
-                if payload_token.get("role") != "admin": # renamed from payload due to shadowing
+                if not await is_admin(client_id):
                     await websocket.send_text(make_msg("ERROR", message="Permission refusée."))
                     continue
                 
                 target_id = payload.get("playerId")
                 if target_id and target_id in manager.active_sessions:
-                    target_ws = manager.active_sessions[target_id]["ws"]
-                    await target_ws.send_text(make_msg("ERROR", message="Vous avez été expulsé par un administrateur."))
-                    await target_ws.close(code=1008, reason="Kicked by admin")
-                    # Close will trigger WebSocketDisconnect block
+                    await kick_local_player(target_id)
+                elif target_id in remote_presence:
+                    # Joueur servi par un autre worker
+                    await bus.publish("admin.kick", {"playerId": target_id})
+
+            elif msg_type == "ADMIN_PROFILE":
+                if not await is_admin(client_id):
+                    await websocket.send_text(make_msg("ERROR", message="Permission refusée."))
+                    continue
+
+                duration = profile_duration(payload.get("duration", 5.0))
+                if duration is None:
+                    continue
+                if profile_tasks or profile_running():
+                    await websocket.send_text(make_msg("ERROR", message="Un profil est déjà en cours."))
+                    continue
+                log.info("Profil demandé", client_id=client_id, duration=duration)
+                # Tâche séparée : la socket de l'admin continue d'être lue (PONG) pendant le profil
+                task = asyncio.create_task(send_profile(client_id, duration))
+                profile_tasks.add(task)
+                task.add_done_callback(on_profile_done)
 
             elif msg_type == "ADMIN_REGENERATE_MAP":
-                if payload_token.get("role") != "admin":
+                if not await is_admin(client_id):
                     await websocket.send_text(make_msg("ERROR", message="Permission refusée."))
                     continue
                 
-                print(f"[WS] Admin {client_id} requests map regeneration for {current_map}")
-                new_state = gameState.regenerate_room(current_map)
-                
-                # Relocalize all players to spawn (0,0 or similar)
-                for cid, info in manager.active_sessions.items():
-                    if info["map_id"] == current_map:
-                        userManager.update_user_position(cid, 10, 10)
-                
+                log.info("Régénération de map demandée", client_id=client_id, map_id=current_map)
+                # Génération hors boucle (process pool) : le serveur continue de répondre pendant ce temps
+                new_state = await gameState.regenerate_room_async(current_map)
+                if new_state is None:
+                    await websocket.send_text(make_msg("ERROR", message="Régénération déjà en cours."))
+                    continue
+
+                # Relocalise tous les joueurs de la map au spawn (case libre de la nouvelle carte)
+                relocated = list(manager.roster.members(current_map))
+                spawn_x, spawn_y = gameState.spawn_point(current_map, MAP_SPAWN)
+                userManager.update_positions(relocated, spawn_x, spawn_y)
+                manager.roster.move_many(relocated, spawn_x, spawn_y)
+
                 await manager.broadcast(make_msg("MAP_REGENERATED", payload=new_state), map_id=current_map)
-                
-                # Send updated positions
-                for cid, info in manager.active_sessions.items():
-                    if info["map_id"] == current_map:
-                        await manager.broadcast(make_msg("PLAYER_MOVED", id=cid, x=10, y=10), map_id=current_map, exclude_id=cid)
-                        # send to the player themselves
-                        user_data = userManager.get_or_create_user(cid)
-                        await manager.send_to(cid, make_msg("PLAYER_SYNC", payload=user_data))
+
+                # MAP_REGENERATED contient la carte complète : les clients en streaming possèdent tous les chunks
+                all_chunks = gameState.get_room(current_map).all_chunk_keys()
+                for cid in relocated:
+                    session = manager.active_sessions.get(cid)
+                    if session and session.get("stream") is not None:
+                        session["stream"] = set(all_chunks)
+
+                # Une seule trame de téléportation par client (au lieu d'un PLAYER_MOVED par joueur)
+                await manager.broadcast(make_msg(
+                    "PLAYERS_TELEPORTED",
+                    players=[{"id": cid, "x": spawn_x, "y": spawn_y} for cid in relocated]
+                ), map_id=current_map)
 
 
     except WebSocketDisconnect:
-        current_m = manager.active_sessions.get(client_id, {}).get("map_id", "farm_main")
-        manager.disconnect(client_id)
-        await manager.broadcast(make_msg("PLAYER_LEFT", id=client_id), map_id=current_m)
+        if recorder:
+            recorder.closed(client_id)
+        current_m = manager.active_sessions.get(client_id, {}).get("map_id", DEFAULT_MAP)
+        if manager.disconnect(client_id, websocket):
+            await manager.broadcast(make_msg("PLAYER_LEFT", id=client_id), map_id=current_m)
+            await announce_presence("leave", client_id, current_m)
     except Exception as e:
-        print(f"[WS] Error for {client_id}: {e}")
-        current_m = manager.active_sessions.get(client_id, {}).get("map_id", "farm_main")
-        manager.disconnect(client_id)
-        await manager.broadcast(make_msg("PLAYER_LEFT", id=client_id), map_id=current_m)
+        log.error("Erreur de session", client_id=client_id, error=repr(e))
+        if recorder:
+            recorder.closed(client_id)
+        current_m = manager.active_sessions.get(client_id, {}).get("map_id", DEFAULT_MAP)
+        if manager.disconnect(client_id, websocket):
+            await manager.broadcast(make_msg("PLAYER_LEFT", id=client_id), map_id=current_m)
+            await announce_presence("leave", client_id, current_m)
+    finally:
+        tracing.finish(trace)
+        reader.cancel()
+        inbox.discard()
+
+
+# ──────────────────────────────────────────────
+# 8. Application
+# ──────────────────────────────────────────────
+
+IMPORT_MS = elapsed_ms(_IMPORT_STARTED)
+
+app = create_app()
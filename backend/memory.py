@@ -0,0 +1,193 @@
+"""
+Memory — Comptabilité mémoire approximative (rooms, sessions, fiches joueurs) + diff d'allocations.
+
+- deep_sizeof : taille d'un graphe d'objets (sys.getsizeof récursif, chaque objet compté une
+  fois). Les objets partagés ne sont comptés qu'au premier passage : les ressources d'une room
+  sont attribuées à `resources`, les index (`_spatial_index`, `_id_index`...) ne comptent que
+  leur propre structure.
+- AllocationTracker : tracemalloc démarré à la demande (coûteux : désactivé par défaut), une
+  photo de référence, puis le diff des allocations par ligne de code pour trouver une croissance.
+
+Le parcours se fait sur la boucle : quelques dizaines de ms pour une room 300x300 ou des
+milliers de fiches. Outil d'administration, à ne pas appeler en boucle.
+"""
+
+import os
+import sys
+import tracemalloc
+import types
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+# Nombre de sessions détaillées dans le rapport (les plus lourdes)
+TOP_SESSIONS = 20
+
+# Profondeur des piles enregistrées par tracemalloc (1 = ligne d'allocation seule)
+TRACEMALLOC_FRAMES = 1
+
+# Types jamais parcourus (partagés par tout le process, ou graphe sans rapport avec les données)
+_SKIPPED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None, opaque: Tuple[type, ...] = ()) -> int:
+    """
+    Taille approximative (octets) de obj et de tout ce qu'il référence. `seen` (ids déjà
+    comptés) peut être partagé entre plusieurs appels pour ne compter qu'une fois les objets
+    communs ; les instances de `opaque` sont comptées sans être parcourues.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, opaque) or isinstance(current, (str, bytes, bytearray, int, float)):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return total
+
+
+def _attributes(obj: Any, first: Iterable[str] = ()) -> List[str]:
+    names = list(first)
+    return names + [n for n in vars(obj) if n not in names]
+
+
+def room_report(room: Any) -> Dict[str, Any]:
+    """Taille d'une RoomState, par attribut (les ressources sont attribuées à `resources`)."""
+    seen: Set[int] = set()
+    breakdown = {}
+    for name in _attributes(room, first=("resources",)):
+        size = deep_sizeof(getattr(room, name), seen)
+        if size:
+            breakdown[name] = size
+    return {
+        "resources": len(room.resources),
+        "bytes": sum(breakdown.values()) + sys.getsizeof(room),
+        "breakdown": dict(sorted(breakdown.items(), key=lambda kv: -kv[1])),
+    }
+
+
+def process_rss() -> Optional[int]:
+    """RSS courant (octets) lu dans /proc ; None hors Linux."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_report(game_state: Any, manager: Any, user_manager: Any, opaque: Tuple[type, ...] = (),
+                  extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Rapport complet : rooms, sessions (les TOP_SESSIONS plus lourdes), cache des fiches joueurs
+    et structures annexes (`extra` : nom → objet). Les fiches sont comptées dans `players`,
+    pas dans les sessions qui les référencent.
+    """
+    rooms = {}
+    for map_id, room in list(game_state.maps.items()):
+        # Room sans joueur connecté : candidate au déchargement
+        rooms[map_id] = dict(room_report(room), players=manager.roster.count(map_id))
+
+    players_seen: Set[int] = set()
+    players_bytes = deep_sizeof(user_manager.users, players_seen)
+    resident = len(user_manager.users)
+    offline = len(user_manager._offline)
+
+    # Un seul ensemble pour les sessions et les annexes : un objet commun est attribué au premier
+    seen = set(players_seen)
+    sessions = []
+    for client_id, session in list(manager.active_sessions.items()):
+        size = deep_sizeof(session, seen, opaque)
+        sessions.append({"client_id": client_id, "map_id": session.get("map_id"), "bytes": size,
+                         "stream_chunks": len(session["stream"]) if session.get("stream") is not None else None})
+    sessions.sort(key=lambda s: -s["bytes"])
+
+    other = {name: deep_sizeof(obj, seen, opaque) for name, obj in (extra or {}).items()}
+
+    accounted = (sum(r["bytes"] for r in rooms.values()) + players_bytes
+                 + sum(s["bytes"] for s in sessions) + sum(other.values()))
+    return {
+        "rss_bytes": process_rss(),
+        "accounted_bytes": accounted,
+        "rooms": rooms,
+        "sessions": {
+            "count": len(sessions),
+            "bytes": sum(s["bytes"] for s in sessions),
+            "top": sessions[:TOP_SESSIONS],
+        },
+        "players": {
+            "resident": resident,
+            "connected": resident - offline,
+            "offline_cached": offline,
+            "bytes": players_bytes,
+            "avg_bytes": players_bytes // resident if resident else 0,
+        },
+        "other": other,
+    }
+
+
+# ─────────────────── Diff d'allocations ───────────────────
+
+class AllocationTracker:
+    """Photo de référence tracemalloc puis comparaison ; tracemalloc n'est actif qu'entre mark() et stop()."""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_here = False
+
+    @property
+    def active(self) -> bool:
+        return self._baseline is not None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    def mark(self) -> Dict[str, Any]:
+        """Démarre tracemalloc au besoin et prend la photo de référence."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_here = True
+        self._baseline = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "traced_bytes": current, "peak_bytes": peak}
+
+    def diff(self, top: int = 20) -> Optional[Dict[str, Any]]:
+        """Croissance depuis mark(), par ligne d'allocation (None sans photo de référence)."""
+        if self._baseline is None:
+            return None
+        stats = self._snapshot().compare_to(self._baseline, "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "growth_bytes": sum(stat.size_diff for stat in stats),
+            "top": [{
+                "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size": stat.size,
+            } for stat in stats[:top]],
+        }
+
+    def stop(self):
+        """Oublie la référence et arrête tracemalloc s'il a été démarré ici."""
+        self._baseline = None
+        if self._started_here and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_here = False
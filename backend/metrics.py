@@ -0,0 +1,35 @@
+"""
+Metrics — Compteurs et jauges en mémoire du serveur.
+
+Volontairement minimal (pas de dépendance Prometheus) : un registre global
+incrémenté par les différents modules, exposé en JSON par GET /metrics.
+"""
+
+import time
+from typing import Dict, Any
+
+
+class Metrics:
+    """Registre de compteurs (monotones) et de jauges (valeur courante)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+
+# Registre partagé par tout le backend
+metrics = Metrics()
@@ -0,0 +1,239 @@
+"""
+Overload — Délestage par priorité quand la boucle est surchargée.
+
+Chaque session lit sa socket dans une tâche dédiée qui dépose les messages dans une Inbox ;
+le routeur de messages les consomme dans l'ordre d'arrivée. Trois priorités :
+- CRITICAL : économie et monde (récolte, craft, construction, placement, changement de map,
+  handshake) — jamais délestés
+- NORMAL   : le reste (dont PONG : la preuve de vie est notée à la réception)
+- LOW      : PLAYER_MOVE, PLAYER_CHAT
+
+L'OverloadMonitor passe en mode surcharge quand le retard de la boucle (moyenne lissée,
+mesuré par le watchdog) dépasse HAVEN_OVERLOAD_LAG_MS, ou quand trop de messages attendent
+dans l'ensemble des inbox ; il en sort sous un tiers de ces seuils (hystérésis). En surcharge :
+- PLAYER_MOVE est fusionné : un déplacement qui suit un déplacement en attente le remplace
+  (seule la destination finale compte)
+- les autres messages LOW sont délestés à la réception
+- avant de traiter un message LOW, une session laisse passer les messages CRITICAL en attente
+  des autres sessions (au plus CRITICAL_WAIT secondes)
+Indépendamment de la surcharge :
+- un seul message de chaque type UNIQUE est gardé en attente : le suivant remplace le
+  précédent à sa place (une rafale de REQUEST_WORLD_STATE ne produit qu'un seul envoi du monde)
+- une inbox pleine (INBOX_LIMIT) déleste d'abord ses plus anciens messages LOW, puis NORMAL ;
+  si elle ne contient plus que des messages CRITICAL, un nouveau message CRITICAL lève
+  InboxOverflow et la connexion est fermée (1008) : aucune inbox ne dépasse INBOX_LIMIT
+L'ordre relatif des messages conservés est inchangé : une récolte n'est jamais traitée avant
+le déplacement qui la précède.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque, Counter
+from typing import Dict, Any, Optional, Tuple
+
+from backend.log import get_logger
+
+log = get_logger("overload")
+
+CRITICAL, NORMAL, LOW = 0, 1, 2
+
+PRIORITIES = {
+    "ACTION_HARVEST": CRITICAL,
+    "ACTION_HARVEST_NEAREST": CRITICAL,
+    "ACTION_CRAFT": CRITICAL,
+    "PLAYER_BUILD": CRITICAL,
+    "ACTION_PLACE": CRITICAL,
+    "ACTION_CHANGE_MAP": CRITICAL,
+    "REQUEST_WORLD_STATE": CRITICAL,
+    "PLAYER_MOVE": LOW,
+    "PLAYER_CHAT": LOW,
+}
+
+# Types dont seul le dernier message en attente compte (fusionnés en surcharge)
+COALESCED = {"PLAYER_MOVE"}
+
+# Types gardés au plus une fois en attente par session (en permanence)
+UNIQUE = {"REQUEST_WORLD_STATE", "PONG"}
+
+# Seuils d'entrée en surcharge : retard lissé de la boucle (ms), messages en attente (toutes sessions)
+ENTER_LAG_MS = float(os.getenv("HAVEN_OVERLOAD_LAG_MS", "150"))
+ENTER_DEPTH = int(os.getenv("HAVEN_OVERLOAD_QUEUE", "2000"))
+
+# Sortie de surcharge : sous ENTER_* / EXIT_RATIO
+EXIT_RATIO = 3
+
+# Poids de la dernière mesure dans la moyenne lissée du retard
+LAG_SMOOTHING = 0.3
+
+# Période de réévaluation (secondes)
+TICK = 0.1
+
+# Messages en attente max par session (au-delà : délestage des moins prioritaires)
+INBOX_LIMIT = int(os.getenv("HAVEN_INBOX_LIMIT", "64"))
+
+# Attente max d'un message LOW derrière les messages CRITICAL des autres sessions (secondes)
+CRITICAL_WAIT = 0.05
+
+
+class InboxOverflow(Exception):
+    """Inbox pleine de messages CRITICAL : le client envoie plus que le serveur ne traite."""
+
+
+def priority_of(msg_type: Any) -> int:
+    return PRIORITIES.get(msg_type, NORMAL)
+
+
+class OverloadMonitor:
+    def __init__(self, enter_lag_ms: float = ENTER_LAG_MS, enter_depth: int = ENTER_DEPTH):
+        self.enter_lag_ms = enter_lag_ms
+        self.enter_depth = enter_depth
+        self.active = False
+        self.lag_ms = 0.0
+        # Messages en attente, toutes inbox confondues (dont CRITICAL)
+        self.depth = 0
+        self.critical_pending = 0
+        self.episodes = 0
+        self.shed: Counter = Counter()
+        self.coalesced: Counter = Counter()
+        self._since = 0.0
+        self._episode_shed = 0
+        self._critical_idle = asyncio.Event()
+        self._critical_idle.set()
+
+    def refresh(self, lag_seconds: float):
+        """Met à jour le retard lissé et entre / sort du mode surcharge."""
+        self.lag_ms += LAG_SMOOTHING * (lag_seconds * 1000 - self.lag_ms)
+        if not self.active and (self.lag_ms > self.enter_lag_ms or self.depth > self.enter_depth):
+            self.active = True
+            self.episodes += 1
+            self._since = time.monotonic()
+            self._episode_shed = sum(self.shed.values()) + sum(self.coalesced.values())
+            log.warning("Surcharge : délestage activé", lag_ms=round(self.lag_ms, 1), depth=self.depth)
+        elif self.active and (self.lag_ms < self.enter_lag_ms / EXIT_RATIO
+                              and self.depth < self.enter_depth / EXIT_RATIO):
+            self.active = False
+            dropped = sum(self.shed.values()) + sum(self.coalesced.values()) - self._episode_shed
+            log.info("Fin de surcharge", duration_s=round(time.monotonic() - self._since, 1), dropped=dropped)
+
+    # ── Suivi des messages en attente (appelé par les Inbox) ──
+
+    def _queued(self, priority: int):
+        self.depth += 1
+        if priority == CRITICAL:
+            self.critical_pending += 1
+            self._critical_idle.clear()
+
+    def _dequeued(self, priority: int):
+        self.depth -= 1
+        if priority == CRITICAL:
+            self.critical_pending -= 1
+            if self.critical_pending == 0:
+                self._critical_idle.set()
+
+    async def yield_to_critical(self):
+        """Laisse passer les messages CRITICAL en attente des autres sessions (borné par CRITICAL_WAIT)."""
+        if self.critical_pending:
+            try:
+                await asyncio.wait_for(self._critical_idle.wait(), CRITICAL_WAIT)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "lag_ms": round(self.lag_ms, 1),
+            "depth": self.depth,
+            "critical_pending": self.critical_pending,
+            "episodes": self.episodes,
+            "thresholds": {"lag_ms": self.enter_lag_ms, "depth": self.enter_depth, "inbox": INBOX_LIMIT},
+            "shed": dict(self.shed),
+            "coalesced": dict(self.coalesced),
+        }
+
+
+class Inbox:
+    """Messages reçus d'une session, en attente du routeur : deque de (priorité, type, msg)."""
+
+    def __init__(self, monitor: OverloadMonitor, limit: int = INBOX_LIMIT):
+        self.monitor = monitor
+        self.limit = limit
+        self._items: deque = deque()
+        self._ready = asyncio.Event()
+        self._error: Optional[BaseException] = None
+
+    def push(self, raw: str):
+        """
+        Dépose un message reçu (JSON invalide ignoré), en appliquant la politique de délestage.
+        Lève InboxOverflow si l'inbox est pleine et que rien ne peut être délesté.
+        """
+        try:
+            msg = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(msg, dict):
+            return
+        msg_type = msg.get("type")
+        priority = priority_of(msg_type)
+        monitor = self.monitor
+
+        if monitor.active and priority == LOW:
+            if msg_type in COALESCED:
+                if self._items and self._items[-1][1] == msg_type:
+                    self._items[-1] = (priority, msg_type, msg)
+                    monitor.coalesced[msg_type] += 1
+                    return
+            else:
+                monitor.shed[msg_type] += 1
+                return
+
+        if msg_type in UNIQUE:
+            for index, item in enumerate(self._items):
+                if item[1] == msg_type:
+                    self._items[index] = (priority, msg_type, msg)
+                    monitor.coalesced[msg_type] += 1
+                    return
+
+        if len(self._items) >= self.limit and not self._evict(priority):
+            if priority == CRITICAL:
+                raise InboxOverflow(f"{len(self._items)} messages en attente")
+            monitor.shed[msg_type] += 1
+            return
+        self._items.append((priority, msg_type, msg))
+        monitor._queued(priority)
+        self._ready.set()
+
+    def _evict(self, incoming: int) -> bool:
+        """Retire le plus ancien message de priorité la plus basse (>= incoming) ; False si aucun."""
+        for level in (LOW, NORMAL):
+            if level < incoming:
+                break
+            for index, item in enumerate(self._items):
+                if item[0] == level:
+                    del self._items[index]
+                    self.monitor._dequeued(level)
+                    self.monitor.shed[item[1]] += 1
+                    return True
+        return False
+
+    def close(self, error: BaseException):
+        """Fin de lecture : get() lèvera `error` une fois les messages en attente consommés."""
+        self._error = error
+        self._ready.set()
+
+    async def get(self) -> Tuple[int, Dict[str, Any]]:
+        """Prochain message (priorité, msg), dans l'ordre d'arrivée."""
+        while not self._items:
+            if self._error is not None:
+                raise self._error
+            self._ready.clear()
+            await self._ready.wait()
+        priority, _, msg = self._items.popleft()
+        self.monitor._dequeued(priority)
+        return priority, msg
+
+    def discard(self):
+        """Session terminée : messages restants abandonnés (compteurs du moniteur remis à jour)."""
+        while self._items:
+            self.monitor._dequeued(self._items.popleft()[0])
@@ -0,0 +1,199 @@
+"""
+Pathfinding serveur — Grille de collision compacte + A* 8 directions.
+
+Miroir côté serveur du PathfindingManager client (EasyStar, diagonales activées,
+corner cutting désactivé) pour valider les PLAYER_MOVE sans faire confiance au client.
+
+- WalkGrid : 1 octet par case (bytearray), drapeaux WATER / OBSTACLE.
+  Mise à jour incrémentale par RoomState.add / RoomState.remove_at.
+- find_path : A* avec heuristique octile et budget d'expansions borné,
+  pour que le coût d'une validation reste plafonné même sur une très grande carte.
+- nearest_walkable : case libre la plus proche, pour replacer un joueur dont la case est bloquée.
+"""
+
+import heapq
+import math
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+# Drapeaux de case (une case est marchable si aucun drapeau n'est levé)
+WATER = 1
+OBSTACLE = 2
+
+# Coûts de déplacement (identiques à EasyStar : diagonale ≈ 1.4)
+STRAIGHT_COST = 1.0
+DIAGONAL_COST = math.sqrt(2)
+
+# Nombre maximal de cases développées par une recherche (au-delà : chemin refusé)
+MAX_PATH_EXPANSIONS = 10000
+
+# Budget de la recherche inverse utilisée par validate_move pour détecter une destination enclavée
+POCKET_CHECK_EXPANSIONS = 256
+
+_NEIGHBORS = (
+    (1, 0, STRAIGHT_COST), (-1, 0, STRAIGHT_COST), (0, 1, STRAIGHT_COST), (0, -1, STRAIGHT_COST),
+    (1, 1, DIAGONAL_COST), (1, -1, DIAGONAL_COST), (-1, 1, DIAGONAL_COST), (-1, -1, DIAGONAL_COST),
+)
+
+
+class WalkGrid:
+    """Grille de marchabilité d'une room (eau + ressources de type "obstacle")."""
+
+    def __init__(self, width: int, height: int, water_tiles: Iterable[tuple] = (),
+                 resources: Iterable[Dict[str, Any]] = ()):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+        for (x, y) in water_tiles:
+            if self.in_bounds(x, y):
+                self.cells[y * width + x] |= WATER
+        for res in resources:
+            self.on_resource_added(res)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_walkable(self, x: int, y: int) -> bool:
+        return self.in_bounds(x, y) and self.cells[y * self.width + x] == 0
+
+    def nearest_walkable(self, x: int, y: int, max_radius: int) -> Optional[Tuple[int, int]]:
+        """
+        Case marchable la plus proche de (x, y), par anneaux de distance de Chebyshev croissante
+        (point de départ ramené dans la carte) ; None si aucune à moins de max_radius cases.
+        """
+        x = min(max(x, 0), self.width - 1)
+        y = min(max(y, 0), self.height - 1)
+        if self.is_walkable(x, y):
+            return x, y
+        for r in range(1, max_radius + 1):
+            ring = [(x + d, y - r) for d in range(-r, r + 1)] + [(x + d, y + r) for d in range(-r, r + 1)]
+            ring += [(x - r, y + d) for d in range(-r + 1, r)] + [(x + r, y + d) for d in range(-r + 1, r)]
+            for cx, cy in ring:
+                if self.is_walkable(cx, cy):
+                    return cx, cy
+        return None
+
+    def set_blocked(self, x: int, y: int, flag: int, blocked: bool):
+        if not self.in_bounds(x, y):
+            return
+        i = y * self.width + x
+        if blocked:
+            self.cells[i] |= flag
+        else:
+            self.cells[i] &= ~flag & 0xFF
+
+    def on_resource_added(self, res: Dict[str, Any]):
+        if res.get("type") == "obstacle":
+            self.set_blocked(res["x"], res["y"], OBSTACLE, True)
+
+    def on_resource_removed(self, res: Dict[str, Any]):
+        if res.get("type") == "obstacle":
+            self.set_blocked(res["x"], res["y"], OBSTACLE, False)
+
+
+def _octile(dx: int, dy: int) -> float:
+    dx, dy = abs(dx), abs(dy)
+    return STRAIGHT_COST * (dx + dy) + (DIAGONAL_COST - 2 * STRAIGHT_COST) * min(dx, dy)
+
+
+def find_path(grid: WalkGrid, sx: int, sy: int, gx: int, gy: int,
+              max_expansions: int = MAX_PATH_EXPANSIONS) -> Optional[List[Tuple[int, int]]]:
+    """
+    Chemin [(sx, sy), ..., (gx, gy)] entre deux cases marchables, ou None si
+    la cible est inaccessible ou si le budget d'expansions est épuisé.
+    """
+    if not grid.is_walkable(sx, sy) or not grid.is_walkable(gx, gy):
+        return None
+    if (sx, sy) == (gx, gy):
+        return [(sx, sy)]
+    path, _ = _astar(grid, sx, sy, gx, gy, max_expansions)
+    return path
+
+
+def _astar(grid: WalkGrid, sx: int, sy: int, gx: int, gy: int,
+           max_expansions: int) -> Tuple[Optional[List[Tuple[int, int]]], bool]:
+    """A* brut. Retourne (chemin ou None, budget épuisé ?) pour distinguer "inaccessible" de "trop loin"."""
+    width = grid.width
+    height = grid.height
+    cells = grid.cells
+    start = sy * width + sx
+    goal = gy * width + gx
+
+    g_score: Dict[int, float] = {start: 0.0}
+    parent: Dict[int, int] = {}
+    closed = set()
+    # (f, h, index) — départager sur h favorise les cases proches de la cible
+    h0 = _octile(gx - sx, gy - sy)
+    open_heap = [(h0, h0, start)]
+    expansions = 0
+
+    while open_heap:
+        _, _, current = heapq.heappop(open_heap)
+        if current == goal:
+            path = [(gx, gy)]
+            while current in parent:
+                current = parent[current]
+                path.append((current % width, current // width))
+            path.reverse()
+            return path, False
+        if current in closed:
+            continue
+        closed.add(current)
+
+        expansions += 1
+        if expansions > max_expansions:
+            return None, True
+
+        cx = current % width
+        cy = current // width
+        base_g = g_score[current]
+        for dx, dy, cost in _NEIGHBORS:
+            nx = cx + dx
+            ny = cy + dy
+            if nx < 0 or ny < 0 or nx >= width or ny >= height:
+                continue
+            n = ny * width + nx
+            if cells[n] or n in closed:
+                continue
+            # Pas de corner cutting : les deux cases orthogonales doivent être libres
+            if dx and dy and (cells[cy * width + nx] or cells[ny * width + cx]):
+                continue
+            tentative = base_g + cost
+            if tentative < g_score.get(n, math.inf):
+                g_score[n] = tentative
+                parent[n] = current
+                h = _octile(gx - nx, gy - ny)
+                heapq.heappush(open_heap, (tentative + h, h, n))
+
+    return None, False
+
+
+def validate_move(grid: WalkGrid, sx: float, sy: float, gx: int, gy: int,
+                  max_expansions: int = MAX_PATH_EXPANSIONS) -> bool:
+    """
+    Valide un PLAYER_MOVE : la destination doit être marchable et atteignable
+    depuis la dernière position connue du joueur.
+    Si la case de départ est bloquée (obstacle posé dessus), le chemin part de la case libre
+    voisine la plus proche ; sans voisine libre (ou départ hors carte : ancienne sauvegarde
+    en coordonnées ISO), le déplacement est refusé et l'appelant replace le joueur.
+    """
+    if not grid.is_walkable(gx, gy):
+        return False
+    start_x, start_y = int(round(sx)), int(round(sy))
+    if not grid.is_walkable(start_x, start_y):
+        if not grid.in_bounds(start_x, start_y):
+            return False
+        start = grid.nearest_walkable(start_x, start_y, 1)
+        if start is None:
+            return False
+        start_x, start_y = start
+    if (start_x, start_y) == (gx, gy):
+        return True
+
+    # Cas coûteux typique : destination enfermée dans une petite poche (îlot, enclos).
+    # Une recherche inverse à petit budget l'épuise vite et évite d'explorer toute la zone de départ.
+    path, budget_exceeded = _astar(grid, gx, gy, start_x, start_y, POCKET_CHECK_EXPANSIONS)
+    if path is not None:
+        return True
+    if not budget_exceeded:
+        return False
+    return find_path(grid, start_x, start_y, gx, gy, max_expansions) is not None
@@ -0,0 +1,82 @@
+"""
+Présence — Roster des joueurs connectés, par map, tenu à jour à chaque arrivée / départ / déplacement.
+
+Chaque joueur est gardé sous forme de fragment JSON déjà sérialisé ({"id", "x", "y"}) ;
+le message CURRENT_PLAYERS d'une map est assemblé une fois puis réutilisé tant que le
+roster ne change pas. Le handshake n'interroge plus UserManager pour chaque joueur présent
+et ne re-sérialise aucune position.
+
+Le message contient tous les joueurs de la map : le client ignore sa propre entrée.
+"""
+
+import json
+from typing import Dict, Iterable, Optional
+
+# Séparateurs compacts : fragments concaténés tels quels dans le message
+_SEPARATORS = (",", ":")
+
+
+def _fragment(client_id: str, x: float, y: float) -> str:
+    return json.dumps({"id": client_id, "x": x, "y": y}, separators=_SEPARATORS)
+
+
+class PresenceRoster:
+    def __init__(self):
+        # map_id → {client_id: fragment JSON} (ordre d'arrivée conservé)
+        self._maps: Dict[str, Dict[str, str]] = {}
+        # client_id → map_id
+        self._where: Dict[str, str] = {}
+        # map_id → message CURRENT_PLAYERS sérialisé (invalidé à chaque modification)
+        self._messages: Dict[str, str] = {}
+
+    def join(self, map_id: str, client_id: str, x: float, y: float):
+        """Ajoute (ou déplace vers map_id) un joueur."""
+        previous = self._where.get(client_id)
+        if previous is not None and previous != map_id:
+            self.leave(client_id)
+        self._maps.setdefault(map_id, {})[client_id] = _fragment(client_id, x, y)
+        self._where[client_id] = map_id
+        self._messages.pop(map_id, None)
+
+    def leave(self, client_id: str) -> Optional[str]:
+        """Retire un joueur ; retourne la map qu'il occupait (None s'il était absent)."""
+        map_id = self._where.pop(client_id, None)
+        if map_id is None:
+            return None
+        players = self._maps.get(map_id)
+        if players is not None:
+            players.pop(client_id, None)
+            if not players:
+                del self._maps[map_id]
+        self._messages.pop(map_id, None)
+        return map_id
+
+    def move(self, client_id: str, x: float, y: float):
+        map_id = self._where.get(client_id)
+        if map_id is None:
+            return
+        self._maps[map_id][client_id] = _fragment(client_id, x, y)
+        self._messages.pop(map_id, None)
+
+    def move_many(self, client_ids: Iterable[str], x: float, y: float):
+        for client_id in client_ids:
+            self.move(client_id, x, y)
+
+    def map_of(self, client_id: str) -> Optional[str]:
+        return self._where.get(client_id)
+
+    def members(self, map_id: str) -> Iterable[str]:
+        """Joueurs présents sur la map (vue en lecture : copier avant de modifier le roster)."""
+        return self._maps.get(map_id, {}).keys()
+
+    def count(self, map_id: str) -> int:
+        return len(self._maps.get(map_id, ()))
+
+    def players_message(self, map_id: str) -> str:
+        """Message CURRENT_PLAYERS de la map, assemblé au plus une fois par état du roster."""
+        message = self._messages.get(map_id)
+        if message is None:
+            players = ",".join(self._maps.get(map_id, {}).values())
+            message = f'{{"type":"CURRENT_PLAYERS","players":[{players}]}}'
+            self._messages[map_id] = message
+        return message
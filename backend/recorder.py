@@ -0,0 +1,112 @@
+"""
+Recorder — Capture du trafic WebSocket entrant (rejouable par backend/replay.py).
+
+Activé par HAVEN_RECORD=chemin/capture.jsonl. Une ligne JSON compacte par événement :
+- {"t": 1.234, "e": "open",  "c": client_id, "m": map_id, "u": fiche joueur (1re connexion)}
+- {"t": 1.250, "e": "msg",   "c": client_id, "m": map_id, "d": "<message brut>"}
+- {"t": 9.870, "e": "close", "c": client_id}
+- {"t": 60.0,  "e": "state", "s": {...}}   (état final, écrit à l'arrêt du serveur)
+
+`t` est le temps écoulé (secondes) depuis le début de la capture. La fiche de chaque joueur
+est enregistrée à sa première connexion : le replay part du même état joueurs.
+Les lignes sont écrites dans un tampon mémoire vidé par blocs (pas d'I/O par message).
+"""
+
+import json
+import os
+import time
+import zlib
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+# Nombre de lignes accumulées avant écriture sur disque
+FLUSH_EVERY = 256
+
+
+class TrafficRecorder:
+    """Journal des messages entrants ; record() ne fait qu'ajouter une ligne au tampon."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.client_ids: Set[str] = set()
+        self._started = time.monotonic()
+        self._buffer: List[str] = []
+        self._file = open(path, "w", encoding="utf-8")
+
+    @classmethod
+    def from_env(cls) -> Optional["TrafficRecorder"]:
+        path = os.getenv("HAVEN_RECORD", "")
+        return cls(path) if path else None
+
+    def _write(self, entry: Dict[str, Any]):
+        line = {"t": round(time.monotonic() - self._started, 4), **entry}
+        self._buffer.append(json.dumps(line, separators=(",", ":"), ensure_ascii=False))
+        if len(self._buffer) >= FLUSH_EVERY:
+            self.flush()
+
+    def opened(self, client_id: str, map_id: str, user: Dict[str, Any]):
+        entry = {"e": "open", "c": client_id, "m": map_id}
+        if client_id not in self.client_ids:
+            self.client_ids.add(client_id)
+            entry["u"] = user
+        self._write(entry)
+
+    def record(self, client_id: str, map_id: str, raw: str):
+        self._write({"e": "msg", "c": client_id, "m": map_id, "d": raw})
+
+    def closed(self, client_id: str):
+        self._write({"e": "close", "c": client_id})
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._file.flush()
+            self._buffer.clear()
+
+    def close(self, final_state: Optional[Dict[str, Any]] = None):
+        if final_state is not None:
+            self._write({"e": "state", "s": final_state})
+        self.flush()
+        self._file.close()
+
+
+def read_capture(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ─────────────────── État comparable ───────────────────
+
+def capture_state(game_state, user_manager, user_ids: Iterable[str]) -> Dict[str, Any]:
+    """
+    Empreinte de l'état final, comparable entre deux exécutions : par map, le nombre de
+    ressources et un crc des (asset, type, x, y) — les ids des constructions contiennent
+    un timestamp — ; pour chaque joueur de la capture, sa fiche complète.
+    """
+    maps = {}
+    for map_id, room in game_state.maps.items():
+        cells = sorted((r["asset"], r.get("type", ""), r["x"], r["y"]) for r in room.resources)
+        maps[map_id] = {
+            "seed": room.seed,
+            "resources": len(cells),
+            "digest": zlib.crc32(json.dumps(cells).encode("utf-8")),
+        }
+    users = {user_id: user_manager.get_or_create_user(user_id) for user_id in sorted(user_ids)}
+    return {"maps": maps, "users": json.loads(json.dumps(users))}
+
+
+def diff_state(expected: Any, actual: Any, path: str = "") -> List[str]:
+    """Liste des chemins dont la valeur diffère ("maps.farm_main.digest: 123 → 456")."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        for key in sorted(set(expected) | set(actual), key=str):
+            sub = f"{path}.{key}" if path else str(key)
+            if key not in actual:
+                diffs.append(f"{sub}: absent du replay")
+            elif key not in expected:
+                diffs.append(f"{sub}: absent de la capture")
+            else:
+                diffs.extend(diff_state(expected[key], actual[key], sub))
+        return diffs
+    if expected != actual:
+        return [f"{path}: {expected!r} → {actual!r}"]
+    return []
@@ -0,0 +1,243 @@
+"""
+Replay — Rejoue une capture (backend/recorder.py) contre un serveur local, dans le même process.
+
+L'application est construite par create_app() et pilotée directement en ASGI par des
+WebSockets simulés : pas de réseau, jetons JWT générés localement, état final accessible.
+Le serveur rejoué travaille dans un dossier temporaire (fiches joueurs enregistrées dans la
+capture, base SQLite vide) : les données locales ne sont pas modifiées.
+
+- --speed 1   : vitesse réelle ; --speed 10 : dix fois plus vite
+- --speed 0   : au plus vite, en pas à pas (chaque message est traité avant le suivant) :
+                exécution déterministe, comparable d'un commit à l'autre
+
+Rapport : latence de traitement par type de message (réception → retour en attente du
+message suivant), trames envoyées, puis différences d'état final (GameState/UserManager)
+avec l'état enregistré à la fin de la capture.
+
+    python -m backend.replay capture.jsonl --speed 0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+from backend.recorder import read_capture, capture_state, diff_state
+
+# Attente max du retour au repos d'une session en mode pas à pas (secondes)
+STEP_TIMEOUT = 5.0
+
+
+class FakeWebSocket:
+    """Côté client d'une connexion ASGI simulée ; mesure le temps de traitement de chaque message."""
+
+    def __init__(self, client_id: str, stats: "ReplayStats"):
+        self.client_id = client_id
+        self.stats = stats
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.idle = asyncio.Event()
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+        self._pending_type: Optional[str] = None
+        self._pending_at = 0.0
+
+    def scope(self, token: str) -> Dict[str, Any]:
+        return {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": f"/ws/{self.client_id}",
+            "raw_path": f"/ws/{self.client_id}".encode(),
+            "query_string": f"token={token}".encode(),
+            "headers": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 8000),
+            "subprotocols": [],
+        }
+
+    async def receive(self) -> Dict[str, Any]:
+        if self._pending_type is not None:
+            self.stats.add_latency(self._pending_type, time.perf_counter() - self._pending_at)
+            self._pending_type = None
+        if self.inbox.empty():
+            self.idle.set()
+        message = await self.inbox.get()
+        self.idle.clear()
+        if message["type"] == "websocket.receive":
+            try:
+                self._pending_type = json.loads(message["text"]).get("type") or "?"
+            except (json.JSONDecodeError, AttributeError):
+                self._pending_type = "?"
+            self._pending_at = time.perf_counter()
+        return message
+
+    async def send(self, message: Dict[str, Any]):
+        if message["type"] == "websocket.send":
+            self.stats.frames_out += 1
+        elif message["type"] == "websocket.close":
+            self.closed = True
+            self.idle.set()
+
+    def push(self, message: Dict[str, Any]):
+        self.idle.clear()
+        self.inbox.put_nowait(message)
+
+
+class ReplayStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.frames_in = 0
+        self.frames_out = 0
+        self.dropped = 0
+
+    def add_latency(self, msg_type: str, seconds: float):
+        self.latencies.setdefault(msg_type, []).append(seconds * 1000)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for msg_type, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[msg_type] = {
+                "count": len(values),
+                "p50_ms": round(values[len(values) // 2], 3),
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max_ms": round(values[-1], 3),
+                "total_ms": round(sum(values), 2),
+            }
+        return result
+
+
+async def replay(events: List[Dict[str, Any]], speed: float) -> Dict[str, Any]:
+    # Import tardif : les chemins de données ont été redirigés par main() avant l'import
+    from backend.main import create_app, gameState, userManager
+    from backend.auth import create_access_token
+
+    app = create_app()
+    stats = ReplayStats()
+    sockets: Dict[str, FakeWebSocket] = {}
+    lockstep = speed <= 0
+
+    async def settle(sock: FakeWebSocket):
+        if lockstep and not sock.closed:
+            try:
+                await asyncio.wait_for(sock.idle.wait(), STEP_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+
+    async def disconnect(sock: FakeWebSocket):
+        sock.push({"type": "websocket.disconnect", "code": 1000})
+        sock.closed = True
+        if lockstep and sock.task:
+            await asyncio.wait({sock.task}, timeout=STEP_TIMEOUT)
+
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        for event in events:
+            if not lockstep:
+                delay = started + event["t"] / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            kind, client_id = event["e"], event.get("c")
+            if kind == "open":
+                old = sockets.get(client_id)
+                if old is not None and not old.closed:
+                    await disconnect(old)
+                sock = FakeWebSocket(client_id, stats)
+                sockets[client_id] = sock
+                token = create_access_token({"sub": client_id})
+                sock.push({"type": "websocket.connect"})
+                sock.task = asyncio.create_task(app(sock.scope(token), sock.receive, sock.send))
+                await settle(sock)
+            elif kind == "msg":
+                sock = sockets.get(client_id)
+                if sock is None or sock.closed:
+                    stats.dropped += 1
+                    continue
+                stats.frames_in += 1
+                sock.push({"type": "websocket.receive", "text": event["d"]})
+                await settle(sock)
+            elif kind == "close":
+                sock = sockets.get(client_id)
+                if sock is not None and not sock.closed:
+                    await disconnect(sock)
+
+        for sock in sockets.values():
+            if not sock.closed:
+                await disconnect(sock)
+        await asyncio.gather(*(s.task for s in sockets.values() if s.task), return_exceptions=True)
+        wall = time.perf_counter() - started
+        final_state = capture_state(gameState, userManager, sockets.keys())
+
+    return {
+        "wall_s": round(wall, 3),
+        "frames_in": stats.frames_in,
+        "frames_out": stats.frames_out,
+        "dropped": stats.dropped,
+        "latency": stats.summary(),
+        "state": final_state,
+    }
+
+
+def print_report(report: Dict[str, Any], diffs: Optional[List[str]]):
+    print(f"[Replay] {report['frames_in']} messages rejoués en {report['wall_s']}s "
+          f"({report['frames_out']} trames envoyées, {report['dropped']} ignorés)")
+    print(f"{'type':<24}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total ms':>11}")
+    for msg_type, row in report["latency"].items():
+        print(f"{msg_type:<24}{row['count']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['max_ms']:>10}{row['total_ms']:>11}")
+    if diffs is None:
+        print("[Replay] Pas d'état final dans la capture : aucune comparaison")
+    elif diffs:
+        print(f"[Replay] {len(diffs)} différence(s) d'état final :")
+        for line in diffs[:50]:
+            print(f"  {line}")
+    else:
+        print("[Replay] État final identique à la capture")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejoue une capture HAVEN_RECORD contre un serveur local")
+    parser.add_argument("capture", help="Fichier .jsonl produit par HAVEN_RECORD")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplicateur de vitesse (0 = pas à pas)")
+    parser.add_argument("--json", dest="json_out", help="Écrit le rapport complet dans ce fichier")
+    args = parser.parse_args()
+
+    events = read_capture(args.capture)
+    expected = next((e["s"] for e in reversed(events) if e["e"] == "state"), None)
+    events = [e for e in events if e["e"] != "state"]
+
+    # Données du serveur rejoué redirigées vers un dossier temporaire (avant l'import de backend.main)
+    import backend.usermanager
+    import backend.database
+    workdir = tempfile.mkdtemp(prefix="haven-replay-")
+    backend.usermanager.USERS_FILE = os.path.join(workdir, "users.json")
+    backend.usermanager.PLAYERS_DIR = os.path.join(workdir, "players")
+    seed_players = backend.usermanager.UserManager()
+    seed_players.open_storage()
+    for event in events:
+        if event["e"] == "open" and "u" in event:
+            seed_players.store(event["c"], event["u"])
+    backend.database.DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(workdir, 'haven.db')}"
+    os.environ.pop("HAVEN_RECORD", None)
+
+    try:
+        report = asyncio.run(replay(events, args.speed))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    diffs = diff_state(expected, report["state"]) if expected is not None else None
+    print_report(report, diffs)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(dict(report, diffs=diffs), f, indent=2, ensure_ascii=False)
+    sys.exit(1 if diffs else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Reprise de session — Journal d'événements par map + jetons de reprise.
+
+Un client qui perd sa connexion (réseau mobile instable) et se reconnecte dans la
+fenêtre RESUME_WINDOW envoie son jeton et le dernier numéro de séquence reçu :
+le serveur lui rejoue uniquement les diffusions manquées au lieu de refaire
+tout le handshake (CURRENT_PLAYERS, PLAYER_SYNC, REQUEST_WORLD_STATE).
+
+- EventLog : ring buffer (deque bornée) des diffusions d'une map, numérotées par `seq`.
+  Les messages d'état complet (FULL_STATE_TYPES, ex. MAP_REGENERATED : la carte entière) n'y
+  sont pas conservés : un marqueur RESYNC_REQUIRED de même seq les remplace, et le client qui
+  le reçoit en reprise redemande l'état du monde (REQUEST_WORLD_STATE). Les deltas ordinaires
+  (CHAT_BATCH, PLAYERS_TELEPORTED...) restent tels quels ; la taille totale du journal est
+  bornée (MAX_LOG_BYTES) en évinçant les plus anciens.
+- ResumeRegistry : sessions interrompues en attente de reprise, indexées par jeton.
+"""
+
+import re
+import secrets
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# Nombre de diffusions conservées par map (au-delà : trou → resynchro complète)
+EVENT_BUFFER_SIZE = 512
+
+# Taille totale max (caractères) des messages conservés par map (au-delà : éviction des plus anciens)
+MAX_LOG_BYTES = 1_000_000
+
+# Types de messages portant un état complet : journalisés sous forme de marqueur
+FULL_STATE_TYPES = {"MAP_REGENERATED", "WORLD_STATE"}
+
+# Remplaçant journalisé d'un message d'état complet
+RESYNC_MARKER = '{"type":"RESYNC_REQUIRED"}'
+
+# Type d'un message sérialisé par make_msg / make_raw_msg ("type" est toujours la première clé)
+_TYPE_RE = re.compile(r'\{"type":\s*"([A-Z_]+)"')
+
+# Durée (secondes) pendant laquelle une session interrompue peut être reprise
+RESUME_WINDOW = 30.0
+
+
+def stamp_seq(message: str, seq: int) -> str:
+    """Ajoute le champ "seq" à un message JSON objet déjà sérialisé (sans le re-parser)."""
+    return f'{message[:-1]},"seq":{seq}}}'
+
+
+class EventLog:
+    """Diffusions récentes d'une map : deque de (seq, message horodaté, exclude_id)."""
+
+    def __init__(self, maxlen: int = EVENT_BUFFER_SIZE, max_bytes: int = MAX_LOG_BYTES):
+        self.seq = 0
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._events: deque = deque()
+        self._maxlen = maxlen
+
+    def append(self, message: str, exclude_id: Optional[str] = None) -> str:
+        """Numérote le message, le conserve (ou son marqueur si c'est un état complet) et retourne la version à diffuser."""
+        self.seq += 1
+        stamped = stamp_seq(message, self.seq)
+        match = _TYPE_RE.match(message)
+        full_state = match is not None and match.group(1) in FULL_STATE_TYPES
+        logged = stamp_seq(RESYNC_MARKER, self.seq) if full_state else stamped
+        self._events.append((self.seq, logged, exclude_id))
+        self._bytes += len(logged)
+        # Éviction des plus anciens : le trou qui en résulte est détecté par since()
+        while len(self._events) > self._maxlen or (self._bytes > self.max_bytes and len(self._events) > 1):
+            self._bytes -= len(self._events.popleft()[1])
+        return stamped
+
+    def since(self, last_seq: int, client_id: str) -> Optional[List[str]]:
+        """
+        Messages postérieurs à last_seq destinés à client_id, ou None si le journal
+        ne couvre plus l'intervalle (événements évincés, ou séquence inconnue).
+        """
+        if last_seq > self.seq or last_seq < 0:
+            return None
+        if last_seq == self.seq:
+            return []
+        if not self._events or self._events[0][0] > last_seq + 1:
+            return None
+        return [msg for seq, msg, exclude_id in self._events if seq > last_seq and exclude_id != client_id]
+
+
+class ResumeRegistry:
+    """Sessions interrompues : jeton → {client_id, map_id, stream, expires_at}."""
+
+    def __init__(self, window: float = RESUME_WINDOW):
+        self.window = window
+        self._parked: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def new_token() -> str:
+        return secrets.token_urlsafe(16)
+
+    def park(self, token: str, client_id: str, map_id: str, stream: Any):
+        self._purge()
+        self._parked[token] = {
+            "client_id": client_id,
+            "map_id": map_id,
+            "stream": stream,
+            "expires_at": time.monotonic() + self.window,
+        }
+
+    def claim(self, token: Optional[str], client_id: str) -> Optional[Dict[str, Any]]:
+        """Consomme le jeton s'il est valide pour ce client (usage unique)."""
+        self._purge()
+        if not token:
+            return None
+        entry = self._parked.get(token)
+        if entry is None or entry["client_id"] != client_id:
+            return None
+        del self._parked[token]
+        return entry
+
+    def revoke_client(self, client_id: str):
+        for token in [t for t, e in self._parked.items() if e["client_id"] == client_id]:
+            del self._parked[token]
+
+    # Snapshot de redémarrage (backend/handoff.py) : les échéances monotonic, propres au
+    # process, voyagent en heure murale
+    def __getstate__(self):
+        offset = time.time() - time.monotonic()
+        parked = {t: dict(e, expires_at=e["expires_at"] + offset) for t, e in self._parked.items()}
+        return {"window": self.window, "parked": parked}
+
+    def __setstate__(self, state):
+        offset = time.monotonic() - time.time()
+        self.window = state["window"]
+        self._parked = {t: dict(e, expires_at=e["expires_at"] + offset) for t, e in state["parked"].items()}
+
+    def _purge(self):
+        now = time.monotonic()
+        for token in [t for t, e in self._parked.items() if e["expires_at"] <= now]:
+            del self._parked[token]
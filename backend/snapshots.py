@@ -0,0 +1,122 @@
+"""
+Snapshots HTTP — Corps pré-sérialisés et pré-compressés de GET /maps/{map_id}/state.
+
+Un snapshot est identifié par un ETag faible dérivé des versions de la room :
+- carte complète : seed + version de la room
+- plage de chunks : seed + rectangle + plus grande version de chunk du rectangle
+  (les versions de chunk valent la version de la room à leur dernière modification :
+  toute mutation dans le rectangle fait croître ce maximum)
+Les versions repartent de 0 à chaque génération de la room (régénération, démarrage à froid
+sans snapshot de redémarrage) : l'ETag inclut aussi l'epoch de la room et la version du
+générateur, sans quoi un cache garderait pour valide la carte d'avant.
+
+Tant que l'ETag ne change pas, le JSON et sa version gzip sont servis depuis le cache :
+un reverse proxy peut mettre la réponse en cache et la revalider par If-None-Match (304).
+"""
+
+import gzip
+import json
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from backend.gamestate import RoomState, CHUNK_SIZE, GENERATOR_VERSION
+
+# Nombre de snapshots conservés (cartes complètes + plages de chunks), éviction LRU
+SNAPSHOT_CACHE_SIZE = 128
+
+# Niveau de compression gzip (compromis CPU / taille, calculé une fois par version)
+GZIP_LEVEL = 6
+
+
+class Snapshot:
+    __slots__ = ("etag", "body", "gzip_body")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _etag_prefix(room: RoomState) -> str:
+    return f"{room.map_id}.{GENERATOR_VERSION}.{room.seed}.{room.epoch}"
+
+
+def full_etag(room: RoomState) -> str:
+    return f'W/"{_etag_prefix(room)}.{room.version}"'
+
+
+def range_etag(room: RoomState, rect: Tuple[int, int, int, int]) -> str:
+    cx0, cy0, cx1, cy1 = rect
+    version = max(room.chunk_version(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1))
+    return f'W/"{_etag_prefix(room)}.{cx0}-{cy0}-{cx1}-{cy1}.{version}"'
+
+
+def build_full(room: RoomState) -> bytes:
+    return json.dumps({
+        "map_id": room.map_id,
+        "width": room.width,
+        "height": room.height,
+        "seed": room.seed,
+        "version": room.version,
+        "resources": room.resources,
+    }, separators=(",", ":")).encode("utf-8")
+
+
+def build_range(room: RoomState, rect: Tuple[int, int, int, int]) -> bytes:
+    """Plage de chunks au format WORLD_CHUNK (payloads de chunk déjà en cache dans la room)."""
+    cx0, cy0, cx1, cy1 = rect
+    chunks = ",".join(room.get_chunk_payload(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1))
+    header = json.dumps({"map_id": room.map_id, "seed": room.seed, "version": room.version,
+                         "chunk_size": CHUNK_SIZE}, separators=(",", ":"))
+    return f'{header[:-1]},"chunks":[{chunks}]}}'.encode("utf-8")
+
+
+def clamp_chunk_rect(room: RoomState, rect: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+    """Borne le rectangle de chunks à la carte ; None s'il est vide."""
+    max_cx = (room.width - 1) // CHUNK_SIZE
+    max_cy = (room.height - 1) // CHUNK_SIZE
+    cx0, cy0, cx1, cy1 = rect
+    cx0, cy0 = max(0, cx0), max(0, cy0)
+    cx1, cy1 = min(max_cx, cx1), min(max_cy, cy1)
+    if cx0 > cx1 or cy0 > cy1:
+        return None
+    return cx0, cy0, cx1, cy1
+
+
+class SnapshotCache:
+    """Cache LRU clé → Snapshot, reconstruit quand l'ETag courant diffère de celui en cache."""
+
+    def __init__(self, max_entries: int = SNAPSHOT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Snapshot]" = OrderedDict()
+
+    def get(self, key: tuple, etag: str, build: Callable[[], bytes]) -> Tuple[Snapshot, bool]:
+        """Retourne (snapshot, construit) ; `build` n'est appelé qu'en cas d'absence ou d'ETag périmé."""
+        snapshot = self._entries.get(key)
+        if snapshot is not None and snapshot.etag == etag:
+            self._entries.move_to_end(key)
+            return snapshot, False
+        snapshot = Snapshot(etag, build())
+        self._entries[key] = snapshot
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return snapshot, True
+
+    def full(self, room: RoomState) -> Tuple[Snapshot, bool]:
+        """Snapshot de la carte complète (même entrée que GET /maps/{map_id}/state sans ?chunks)."""
+        return self.get((room.map_id, "full"), full_etag(room), lambda: build_full(room))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible (RFC 9110) : W/"x" et "x" sont équivalents ; "*" correspond à tout."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
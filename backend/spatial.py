@@ -0,0 +1,145 @@
+"""
+SpatialGrid — Index spatial par buckets pour les ressources d'une room.
+
+Remplace le simple dict {(x, y): ressource} de RoomState :
+- Lookup exact par case en O(1) (même interface qu'un dict : get / pop / in / [])
+- Requêtes rectangle et rayon qui ne visitent que les buckets recouverts
+- Recherche du plus proche (optionnellement filtrée par asset) par anneaux de buckets,
+  arrêtée dès qu'aucun bucket plus lointain ne peut battre le meilleur candidat
+
+Le coût d'une requête dépend de la zone demandée, pas de la taille de la carte.
+"""
+
+import math
+from typing import Dict, Any, List, Optional, Callable, Iterator, Iterable, Tuple
+
+# Côté d'un bucket en tuiles
+BUCKET_SIZE = 16
+
+
+class SpatialGrid:
+    """Index {(x, y): ressource} doublé d'une grille de buckets BUCKET_SIZE x BUCKET_SIZE."""
+
+    def __init__(self, resources: Iterable[Dict[str, Any]] = (), bucket_size: int = BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self._cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._buckets: Dict[Tuple[int, int], Dict[Tuple[int, int], Dict[str, Any]]] = {}
+        for res in resources:
+            self[(res["x"], res["y"])] = res
+
+    def _bucket_key(self, x: int, y: int) -> Tuple[int, int]:
+        return (x // self.bucket_size, y // self.bucket_size)
+
+    # ─────────────────── Interface dict (lookup exact) ───────────────────
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return key in self._cells
+
+    def __getitem__(self, key: Tuple[int, int]) -> Dict[str, Any]:
+        return self._cells[key]
+
+    def __setitem__(self, key: Tuple[int, int], res: Dict[str, Any]):
+        self._cells[key] = res
+        self._buckets.setdefault(self._bucket_key(*key), {})[key] = res
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self._cells)
+
+    def get(self, key: Tuple[int, int], default: Any = None) -> Any:
+        return self._cells.get(key, default)
+
+    def pop(self, key: Tuple[int, int], default: Any = None) -> Any:
+        res = self._cells.pop(key, None)
+        if res is None:
+            return default
+        bkey = self._bucket_key(*key)
+        bucket = self._buckets.get(bkey)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[bkey]
+        return res
+
+    def values(self):
+        return self._cells.values()
+
+    # ─────────────────── Requêtes spatiales ───────────────────
+
+    def query_rect(self, x0: int, y0: int, x1: int, y1: int) -> List[Dict[str, Any]]:
+        """Ressources dans le rectangle [x0, x1] x [y0, y1] (bornes incluses)."""
+        if x1 < x0 or y1 < y0:
+            return []
+        bx0, by0 = self._bucket_key(x0, y0)
+        bx1, by1 = self._bucket_key(x1, y1)
+
+        found: List[Dict[str, Any]] = []
+        for by in range(by0, by1 + 1):
+            for bx in range(bx0, bx1 + 1):
+                bucket = self._buckets.get((bx, by))
+                if not bucket:
+                    continue
+                # Bucket entièrement inclus : pas de test par case
+                if (bx * self.bucket_size >= x0 and (bx + 1) * self.bucket_size - 1 <= x1 and
+                        by * self.bucket_size >= y0 and (by + 1) * self.bucket_size - 1 <= y1):
+                    found.extend(bucket.values())
+                    continue
+                for (x, y), res in bucket.items():
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        found.append(res)
+        return found
+
+    def query_radius(self, cx: float, cy: float, radius: float,
+                     predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """Ressources à une distance euclidienne <= radius de (cx, cy)."""
+        r2 = radius * radius
+        candidates = self.query_rect(
+            math.floor(cx - radius), math.floor(cy - radius),
+            math.ceil(cx + radius), math.ceil(cy + radius)
+        )
+        return [
+            res for res in candidates
+            if (res["x"] - cx) ** 2 + (res["y"] - cy) ** 2 <= r2 and (predicate is None or predicate(res))
+        ]
+
+    def nearest(self, cx: float, cy: float, max_radius: float,
+                predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ressource la plus proche de (cx, cy) dans un rayon max_radius, ou None.
+        Parcourt les buckets par anneaux concentriques autour du bucket du point.
+        """
+        bs = self.bucket_size
+        cbx, cby = self._bucket_key(math.floor(cx), math.floor(cy))
+        best: Optional[Dict[str, Any]] = None
+        best_d2 = max_radius * max_radius
+        max_ring = int(max_radius // bs) + 1
+
+        for ring in range(max_ring + 1):
+            # Distance minimale entre le point et n'importe quel bucket de cet anneau
+            if ring > 0 and ((ring - 1) * bs) ** 2 > best_d2:
+                break
+            for bkey in self._ring(cbx, cby, ring):
+                bucket = self._buckets.get(bkey)
+                if not bucket:
+                    continue
+                for res in bucket.values():
+                    d2 = (res["x"] - cx) ** 2 + (res["y"] - cy) ** 2
+                    if d2 <= best_d2 and (best is None or d2 < best_d2 or res["id"] < best["id"]):
+                        if predicate is None or predicate(res):
+                            best, best_d2 = res, d2
+        return best
+
+    @staticmethod
+    def _ring(cbx: int, cby: int, ring: int) -> Iterator[Tuple[int, int]]:
+        """Buckets situés exactement à `ring` buckets (distance de Tchebychev) du bucket central."""
+        if ring == 0:
+            yield (cbx, cby)
+            return
+        for bx in range(cbx - ring, cbx + ring + 1):
+            yield (bx, cby - ring)
+            yield (bx, cby + ring)
+        for by in range(cby - ring + 1, cby + ring):
+            yield (cbx - ring, by)
+            yield (cbx + ring, by)
@@ -0,0 +1,227 @@
+"""
+Tracing — Spans par message WebSocket, exportés au format Chrome Trace (chrome://tracing, Perfetto).
+
+Activé par HAVEN_TRACE=chemin/trace.json (en multi-workers : HAVEN_TRACE=trace-{worker}.json).
+- un span racine par message entrant (nom = type du message), et par requête HTTP
+- des spans enfants pour les appels instrumentés : GameState, UserManager, requêtes SQL,
+  diffusions (broadcast / send_to), sérialisation (make_msg)
+- échantillonnage à la racine : HAVEN_TRACE_SAMPLE=0.05 (5 % des messages), surchargeable
+  par type avec HAVEN_TRACE_SAMPLE_TYPES="PONG=0,PLAYER_BUILD=1" ; un message non retenu
+  ne coûte qu'une lecture de contextvar par appel instrumenté
+
+Les spans d'un même client partagent une piste (tid) : le traitement de ses messages est
+séquentiel, les spans enfants s'emboîtent sous leur racine. Sans HAVEN_TRACE, rien n'est
+instrumenté (aucun coût).
+"""
+
+import functools
+import inspect
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, Iterable, List, Optional
+
+# Nombre d'événements accumulés avant écriture sur disque
+FLUSH_EVERY = 512
+
+# Longueur max d'une requête SQL reprise dans les arguments d'un span
+SQL_PREVIEW = 120
+
+
+class Span:
+    __slots__ = ("tracer", "name", "cat", "tid", "start", "args")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, tid: int, args: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.tid = tid
+        self.start = time.perf_counter()
+        self.args = args
+
+    def child(self, name: str, cat: str, args: Optional[Dict[str, Any]] = None) -> "Span":
+        return Span(self.tracer, name, cat, self.tid, args)
+
+    def end(self):
+        self.tracer._complete(self, time.perf_counter())
+
+
+# Span en cours dans la tâche (None : pas de trace, ou message non échantillonné)
+_current: ContextVar[Optional[Span]] = ContextVar("haven_trace_span", default=None)
+
+
+def enabled() -> bool:
+    return bool(os.getenv("HAVEN_TRACE"))
+
+
+def _parse_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for entry in value.split(","):
+        if "=" in entry:
+            name, rate = entry.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class Tracer:
+    def __init__(self, path: str, sample_rate: float = 1.0, type_rates: Optional[Dict[str, float]] = None,
+                 pid: int = 0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.type_rates = type_rates or {}
+        self.pid = pid
+        self.traces = 0
+        self._tids: Dict[str, int] = {}
+        self._buffer: List[str] = []
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._first = True
+        self._event({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": f"haven-worker-{pid}"}})
+
+    @classmethod
+    def from_env(cls, pid: int = 0) -> Optional["Tracer"]:
+        path = os.getenv("HAVEN_TRACE", "")
+        if not path:
+            return None
+        return cls(path.replace("{worker}", str(pid)),
+                   float(os.getenv("HAVEN_TRACE_SAMPLE", "1")),
+                   _parse_rates(os.getenv("HAVEN_TRACE_SAMPLE_TYPES", "")), pid)
+
+    # ─────────────────── Spans ───────────────────
+
+    def _tid(self, track: str) -> int:
+        tid = self._tids.get(track)
+        if tid is None:
+            tid = self._tids[track] = len(self._tids) + 1
+            self._event({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": track}})
+        return tid
+
+    def start(self, name: str, track: str, cat: str = "ws", **args) -> Optional[tuple]:
+        """Ouvre un span racine si le message est échantillonné ; à refermer par tracing.finish()."""
+        if random.random() >= self.type_rates.get(name, self.sample_rate):
+            return None
+        span = Span(self, name, cat, self._tid(track), args)
+        self.traces += 1
+        return span, _current.set(span)
+
+    def _complete(self, span: Span, end: float):
+        event = {"name": span.name, "cat": span.cat, "ph": "X", "pid": self.pid, "tid": span.tid,
+                 "ts": round(span.start * 1e6, 1), "dur": round((end - span.start) * 1e6, 1)}
+        if span.args:
+            event["args"] = span.args
+        self._event(event)
+
+    def _event(self, event: Dict[str, Any]):
+        if self._file.closed:
+            return  # Span terminé après l'arrêt du serveur
+        self._buffer.append(json.dumps(event, separators=(",", ":"), default=str))
+        if len(self._buffer) >= FLUSH_EVERY:
+            self.flush()
+
+    # ─────────────────── Export ───────────────────
+
+    def flush(self):
+        if self._buffer:
+            prefix = "" if self._first else ",\n"
+            self._file.write(prefix + ",\n".join(self._buffer))
+            self._file.flush()
+            self._first = False
+            self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.write("\n]\n")
+        self._file.close()
+
+
+def finish(handle: Optional[tuple]):
+    """Referme un span racine ouvert par Tracer.start() (None : message non échantillonné)."""
+    if handle is None:
+        return
+    span, token = handle
+    _current.reset(token)
+    span.end()
+
+
+# ─────────────────── Instrumentation ───────────────────
+# Les versions tracées ne dépendent d'aucun Tracer : elles rattachent leur span à celui en cours.
+
+def _wrap(fn, name: str, cat: str):
+    if getattr(fn, "__haven_traced__", False):
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def traced_async(*args, **kwargs):
+            parent = _current.get()
+            if parent is None:
+                return await fn(*args, **kwargs)
+            span = parent.child(name, cat)
+            token = _current.set(span)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _current.reset(token)
+                span.end()
+        traced_async.__haven_traced__ = True
+        return traced_async
+
+    @functools.wraps(fn)
+    def traced(*args, **kwargs):
+        parent = _current.get()
+        if parent is None:
+            return fn(*args, **kwargs)
+        span = parent.child(name, cat)
+        token = _current.set(span)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            span.end()
+    traced.__haven_traced__ = True
+    return traced
+
+
+def instrument(target: Any, cat: str, names: Optional[Iterable[str]] = None):
+    """
+    Remplace les méthodes (ou fonctions de module) `names` de target par des versions tracées.
+    Par défaut : toutes les méthodes publiques de sa classe. Idempotent.
+    """
+    if names is None:
+        names = [n for n, _ in inspect.getmembers(type(target), inspect.isfunction) if not n.startswith("_")]
+    for attr in names:
+        setattr(target, attr, _wrap(getattr(target, attr), f"{cat}.{attr}", cat))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("haven_trace_starts", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("haven_trace_starts")
+    parent = _current.get()
+    if starts and parent is not None:
+        span = parent.child("db.execute", "db", {"sql": " ".join(statement.split())[:SQL_PREVIEW]})
+        span.start = starts.pop()
+        span.end()
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("haven_trace_starts") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine):
+    """Un span par requête SQL (événements du moteur synchrone sous-jacent). Idempotent."""
+    from sqlalchemy import event
+
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -1,85 +1,254 @@
 import json
 import os
-from typing import Dict, Any
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Set
+from urllib.parse import quote
+
+from backend.log import get_logger
+
+log = get_logger("users")
 
 DATA_DIR = "backend/data"
+# Ancien format (tous les joueurs dans un fichier) : migré vers PLAYERS_DIR au premier démarrage
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
+# Une fiche JSON par joueur : lecture/écriture d'un joueur sans toucher aux autres
+PLAYERS_DIR = os.path.join(DATA_DIR, "players")
+MIGRATION_MARKER = ".migrated"
+
+# Délai (secondes) après la déconnexion avant de retirer la fiche de la mémoire
+# (doit rester supérieur à la fenêtre de reprise de session, backend/resume.py)
+EVICT_AFTER = float(os.getenv("HAVEN_PLAYER_EVICT_AFTER", "300"))
+
+# Point d'arrivée des nouveaux joueurs et des changements de map sans coordonnées
+# (case bloquée sur la map : la case libre la plus proche est utilisée, voir GameState.spawn_point)
+MAP_SPAWN = (10, 10)
+
+# Nombre max de joueurs hors ligne gardés en mémoire (les plus anciens sont évincés en premier)
+OFFLINE_CACHE_SIZE = int(os.getenv("HAVEN_PLAYER_CACHE_SIZE", "1000"))
+
 
 class UserManager:
     def __init__(self):
-        os.makedirs(DATA_DIR, exist_ok=True)
+        # Fiches résidentes : joueurs connectés + joueurs récemment déconnectés (ou lus hors connexion)
         self.users: Dict[str, Any] = {}
-        self.load_users()
-
-    def load_users(self):
-        if os.path.exists(USERS_FILE):
-            try:
-                with open(USERS_FILE, "r") as f:
-                    self.users = json.load(f)
-            except json.JSONDecodeError:
-                self.users = {}
-                print(f"Error decoding {USERS_FILE}, starting with empty user list.")
-        else:
-            self.users = {}
+        # Mode multi-workers (backend/cluster.py) : les fiches sont partagées entre plusieurs process.
+        # Un joueur est relu depuis le disque quand il arrive sur ce worker (claim).
+        self.shared = False
+        # Joueurs connectés à ce process : jamais évincés
+        self.local_ids: Set[str] = set()
+        # Joueurs résidents hors ligne : id → instant de déconnexion (ordre LRU)
+        self._offline: "OrderedDict[str, float]" = OrderedDict()
+        # Écritures différées (batched_writes) : fiches modifiées, écrites à la sortie du bloc
+        self._batch_depth = 0
+        self._dirty: Set[str] = set()
+
+    # ─────────────────── Stockage ───────────────────
+
+    def open_storage(self):
+        """Crée le dossier des fiches et migre users.json s'il n'a jamais été migré. Ne charge aucun joueur."""
+        os.makedirs(PLAYERS_DIR, exist_ok=True)
+        marker = os.path.join(PLAYERS_DIR, MIGRATION_MARKER)
+        if os.path.exists(marker) or not os.path.exists(USERS_FILE):
+            return
+        try:
+            with open(USERS_FILE, "r") as f:
+                legacy = json.load(f)
+        except json.JSONDecodeError:
+            log.error("Fichier joueurs illisible, migration ignorée", path=USERS_FILE)
+            return
+        migrated = 0
+        for user_id, user in legacy.items():
+            # Une fiche déjà présente est plus récente que users.json (autre worker, migration interrompue)
+            if not os.path.exists(self._path(user_id)):
+                self.store(user_id, user)
+                migrated += 1
+        with open(marker, "w") as f:
+            f.write(USERS_FILE + "\n")
+        log.info("users.json migré vers des fiches individuelles", players=migrated, path=PLAYERS_DIR)
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(PLAYERS_DIR, quote(user_id, safe="") + ".json")
+
+    def _read(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(user_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            log.error("Fiche joueur illisible", user_id=user_id)
+            return None
+
+    def _write(self, user_id: str, user: Dict[str, Any]):
+        """Écriture atomique (fichier temporaire + rename) : une fiche n'est jamais lue à moitié."""
+        path = self._path(user_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(user, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def store(self, user_id: str, user: Dict[str, Any]):
+        """Écrit une fiche sans la charger en mémoire (migration, replay, fixtures)."""
+        self._write(user_id, user)
+
+    def _get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Fiche résidente, sinon lue depuis le disque (et gardée en cache hors ligne)."""
+        user = self.users.get(user_id)
+        if user is not None:
+            if user_id in self._offline:
+                self._offline.move_to_end(user_id)
+            return user
+        user = self._read(user_id)
+        if user is not None:
+            self.users[user_id] = user
+            if user_id not in self.local_ids:
+                self._mark_offline(user_id)
+        return user
+
+    def save_user(self, user_id: str):
+        if self._batch_depth:
+            self._dirty.add(user_id)
+            return
+        user = self.users.get(user_id)
+        if user is not None:
+            self._write(user_id, user)
+
+    @contextmanager
+    def batched_writes(self):
+        """Dans le bloc, une fiche modifiée plusieurs fois n'est écrite qu'une fois, à la sortie."""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                dirty, self._dirty = self._dirty, set()
+                for user_id in dirty:
+                    self.save_user(user_id)
+
+    def saved_at(self, user_id: str) -> Optional[float]:
+        """Date de dernière écriture de la fiche sur disque (None si absente)."""
+        try:
+            return os.path.getmtime(self._path(user_id))
+        except OSError:
+            return None
 
     def save_users(self):
-        with open(USERS_FILE, "w") as f:
-            json.dump(self.users, f, indent=4)
+        """Écrit toutes les fiches résidentes (arrêt du serveur)."""
+        for user_id in list(self.users):
+            self.save_user(user_id)
+
+    # ─────────────────── Présence & éviction ───────────────────
+
+    def claim(self, user_id: str):
+        """Le joueur est désormais servi par ce process : sa fiche reste en mémoire tant qu'il est connecté."""
+        if self.shared and user_id not in self.local_ids:
+            self.reload_user(user_id)
+        self.local_ids.add(user_id)
+        self._offline.pop(user_id, None)
+
+    def release(self, user_id: str):
+        """Déconnexion : la fiche sera évincée EVICT_AFTER secondes plus tard (ou plus tôt si le cache déborde)."""
+        self.local_ids.discard(user_id)
+        if user_id in self.users:
+            self._mark_offline(user_id)
+
+    def _mark_offline(self, user_id: str):
+        self._offline[user_id] = time.monotonic()
+        self._offline.move_to_end(user_id)
+        while len(self._offline) > OFFLINE_CACHE_SIZE:
+            oldest, _ = self._offline.popitem(last=False)
+            self.users.pop(oldest, None)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Retire de la mémoire les joueurs déconnectés depuis plus de EVICT_AFTER. Retourne le nombre évincé."""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        while self._offline:
+            user_id, released_at = next(iter(self._offline.items()))
+            if now - released_at < EVICT_AFTER:
+                break
+            self._offline.popitem(last=False)
+            # Les fiches sont écrites à chaque mutation : rien à sauvegarder ici
+            self.users.pop(user_id, None)
+            evicted += 1
+        return evicted
+
+    def reload_user(self, user_id: str):
+        """Relit un joueur depuis le disque (écrit par un autre worker)."""
+        user = self._read(user_id)
+        if user is not None:
+            self.users[user_id] = user
+
+    # ─────────────────── Joueurs ───────────────────
 
     def get_or_create_user(self, user_id: str) -> Dict[str, Any]:
-        if user_id not in self.users:
-            self.users[user_id] = {
+        user = self._get(user_id)
+        if user is None:
+            user = {
                 "id": user_id,
-                "x": 200, 
-                "y": 200,
+                "x": MAP_SPAWN[0],
+                "y": MAP_SPAWN[1],
                 "wallet": {"wood": 0, "stone": 0} # Initialisation du wallet
             }
-            self.save_users()
-        return self.users[user_id]
+            self.users[user_id] = user
+            if user_id not in self.local_ids:
+                self._mark_offline(user_id)
+            self.save_user(user_id)
+        return user
 
     def update_user_position(self, user_id: str, x: float, y: float):
-        if user_id in self.users:
-            self.users[user_id]["x"] = x
-            self.users[user_id]["y"] = y
-            self.save_users()
+        user = self._get(user_id)
+        if user is not None:
+            user["x"] = x
+            user["y"] = y
+            self.save_user(user_id)
+
+    def update_positions(self, user_ids: List[str], x: float, y: float):
+        """Déplace plusieurs joueurs d'un coup (fiches écrites une fois, en fin de lot)."""
+        with self.batched_writes():
+            for user_id in user_ids:
+                self.update_user_position(user_id, x, y)
 
     def update_wallet(self, user_id: str, resource: str, amount: int) -> Dict[str, int] | bool:
         """Met à jour le wallet. Retourne le nouveau wallet ou False si fonds insuffisants."""
-        if user_id not in self.users:
+        user = self._get(user_id)
+        if user is None:
             return False
-        
-        user = self.users[user_id]
+
         if "wallet" not in user:
             user["wallet"] = {"wood": 0, "stone": 0}
-            
+
         current_amount = user["wallet"].get(resource, 0)
         new_amount = current_amount + amount
-        
+
         if new_amount < 0:
             return False # Pas assez de ressources
-            
+
         user["wallet"][resource] = new_amount
-        self.save_users()
+        self.save_user(user_id)
         return user["wallet"]
 
     def consume_resources(self, user_id: str, costs: Dict[str, int]) -> Dict[str, int] | bool:
         """Déduit plusieurs ressources (transaction atomique). Retourne le wallet ou False si fonds insuffisants."""
-        if user_id not in self.users:
+        user = self._get(user_id)
+        if user is None:
             return False
-            
-        user = self.users[user_id]
+
         wallet = user.setdefault("wallet", {"wood": 0, "stone": 0})
-        
+
         # 1. Vérification si toutes les conditions sont remplies
         for res, amount in costs.items():
             if wallet.get(res, 0) < amount:
                 return False
-                
+
         # 2. Déduction
         for res, amount in costs.items():
             wallet[res] -= amount
-            
-        self.save_users()
+
+        self.save_user(user_id)
         return wallet
 
     def add_item(self, user_id: str, item_id: str, count: int) -> Dict[str, Any]:
@@ -87,22 +256,22 @@ class UserManager:
         user = self.get_or_create_user(user_id)
         inventory = user.setdefault("inventory", {})
         inventory[item_id] = inventory.get(item_id, 0) + count
-        self.save_users()
+        self.save_user(user_id)
         return inventory
 
     def consume_item(self, user_id: str, item_id: str, count: int) -> bool:
         """Consomme un item de l'inventaire. Retourne True si réussi."""
-        if user_id not in self.users:
+        user = self._get(user_id)
+        if user is None:
             return False
-            
-        user = self.users[user_id]
+
         inventory = user.setdefault("inventory", {})
-        
+
         if inventory.get(item_id, 0) >= count:
             inventory[item_id] -= count
             if inventory[item_id] <= 0:
                 del inventory[item_id]
-            self.save_users()
+            self.save_user(user_id)
             return True
-            
+
         return False
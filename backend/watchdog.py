@@ -0,0 +1,165 @@
+"""
+Watchdog — Mesure du retard de la boucle asyncio + profileur par échantillonnage.
+
+Quand le serveur "accroche" (réécriture de users.json, sérialisation d'un WORLD_STATE,
+bcrypt, régénération...), la boucle d'événements ne rend plus la main :
+
+- LoopWatchdog : une tâche asyncio bat toutes les WATCHDOG_INTERVAL secondes et mesure
+  son retard. Un thread de surveillance, indépendant de la boucle, capture la pile du
+  thread de la boucle (sys._current_frames) PENDANT le blocage dès que le retard dépasse
+  STALL_THRESHOLD : on voit directement le code fautif.
+- sample_profile : profil par échantillonnage borné dans le temps, au format "folded stacks"
+  (une ligne "frame;frame;frame N"), lisible par flamegraph.pl ou speedscope.
+"""
+
+import asyncio
+import math
+import sys
+import threading
+import time
+import traceback
+from collections import deque, Counter
+from typing import Dict, Any, List, Optional
+
+from backend.metrics import metrics
+from backend.log import get_logger
+
+log = get_logger("watchdog")
+
+# Période de battement de la tâche de mesure (secondes)
+WATCHDOG_INTERVAL = 0.1
+
+# Retard au-delà duquel la pile bloquante est capturée (secondes)
+STALL_THRESHOLD = 0.25
+
+# Nombre de blocages conservés pour GET /admin/stalls
+MAX_STALLS = 20
+
+# Profil à la demande : intervalle d'échantillonnage et durée max (secondes)
+PROFILE_INTERVAL = 0.005
+MAX_PROFILE_DURATION = 30.0
+
+
+def _format_stack(frame) -> List[str]:
+    return [f"{f.filename}:{f.lineno} {f.name}" for f in traceback.extract_stack(frame)]
+
+
+def _fold(frame) -> str:
+    """Pile au format folded (racine d'abord) : "module.py:fonction;module.py:fonction"."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopWatchdog:
+    """Surveille le retard de la boucle courante ; à démarrer depuis la boucle (startup)."""
+
+    def __init__(self, interval: float = WATCHDOG_INTERVAL, threshold: float = STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=MAX_STALLS)
+        self.max_lag = 0.0
+        # Retard mesuré au dernier battement (secondes)
+        self.lag = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._stall_captured = False
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        return self._loop_thread_id
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._running = True
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self._stall_captured = False
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            metrics.set_gauge("loop.lag_ms", round(lag * 1000, 1))
+            metrics.set_gauge("loop.max_lag_ms", round(self.max_lag * 1000, 1))
+
+    def _watch(self):
+        """Thread de surveillance : capture la pile de la boucle bloquée (une fois par blocage)."""
+        while self._running:
+            time.sleep(self.interval)
+            blocked_for = time.monotonic() - self._last_beat - self.interval
+            if blocked_for < self.threshold or self._stall_captured:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._stall_captured = True
+            stack = _format_stack(frame)
+            self.stalls.append({"at": time.time(), "blocked_ms": round(blocked_for * 1000, 1), "stack": stack})
+            metrics.inc("loop.stalls")
+            log.warning("Boucle bloquée", blocked_ms=round(blocked_for * 1000), at=stack[-1] if stack else "?")
+
+    def recent_stalls(self) -> List[Dict[str, Any]]:
+        return list(self.stalls)
+
+
+_profile_lock = threading.Lock()
+
+
+def profile_running() -> bool:
+    return _profile_lock.locked()
+
+
+def profile_duration(value: Any) -> Optional[float]:
+    """Durée de profil demandée, ramenée dans [PROFILE_INTERVAL, MAX_PROFILE_DURATION] ; None si invalide."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        return None
+    return min(max(float(value), PROFILE_INTERVAL), MAX_PROFILE_DURATION)
+
+
+def sample_profile(thread_id: int, duration: float, interval: float = PROFILE_INTERVAL) -> Optional[Dict[str, Any]]:
+    """
+    Échantillonne la pile du thread `thread_id` pendant `duration` secondes.
+    À exécuter HORS de ce thread (asyncio.to_thread) pour que la boucle reste observée.
+    Retourne None si un profil est déjà en cours (ou si la durée est invalide).
+    """
+    duration = profile_duration(duration)
+    if duration is None or not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        folded: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                folded[_fold(frame)] += 1
+                samples += 1
+            time.sleep(interval)
+        return {
+            "duration": duration,
+            "interval": interval,
+            "samples": samples,
+            "folded": "\n".join(f"{stack} {count}" for stack, count in folded.most_common()),
+        }
+    finally:
+        _profile_lock.release()
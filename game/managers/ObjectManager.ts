@@ -200,6 +200,20 @@ export class ObjectManager {
         return this.objectMap.get(`${x},${y}`);
     }
 
+    /**
+     * Grise (ou rétablit) un pommier en recharge (RESOURCE_DEPLETED / RESOURCE_READY).
+     * La teinte de base passe par 'originalTint' pour rester compatible avec l'ambiance jour/nuit.
+     */
+    setDepleted(x: number, y: number, depleted: boolean): void {
+        const obj = this.objectMap.get(`${x},${y}`);
+        if (!obj) return;
+
+        const baseTint = depleted ? 0x8a8a8a : 0xffffff;
+        obj.setData('depleted', depleted);
+        obj.setData('originalTint', baseTint);
+        obj.setTint(baseTint);
+    }
+
     /**
      * Supprime un objet à une position donnée
      */
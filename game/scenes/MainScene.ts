@@ -5,6 +5,7 @@ import { useWorldStore } from '@/stores/world';
 import { getItemData, type ToolType } from '@/game/config/ItemRegistry';
 import { useChatStore } from '@/stores/chat';
 import { IsoMath } from '@/game/utils/IsoMath';
+import { applySeedDiff, SUPPORTED_GENERATORS } from '@/game/utils/WorldGenerator';
 import { GameConfig } from '@/game/config/GameConfig';
 import { PathfindingManager } from '@/game/managers/PathfindingManager';
 import { TileManager } from '@/game/managers/TileManager';
@@ -47,6 +48,8 @@ export class MainScene extends Scene {
     private isMoving: boolean = false;
     private currentPath: { x: number; y: number }[] = [];
     private pendingAction: (() => void) | null = null;
+    /** Un état du monde a déjà été reçu (une reconnexion non reprise doit alors le redemander) */
+    private worldReceived: boolean = false;
 
     // Input Manager
     private inputManager!: InputManager;
@@ -353,6 +356,7 @@ export class MainScene extends Scene {
             else if (msg.type === 'WORLD_STATE' || msg.type === 'MAP_STATE') {
                 if (msg.payload && msg.payload.resources && Array.isArray(msg.payload.resources)) {
                     // Même carte — flow normal (WORLD_STATE initial ou refresh)
+                    this.worldReceived = true;
                     this.worldStore.loadWorldState(msg.payload);
                     this.mapManager.populateFromState(msg.payload.resources);
                     this.pathfindingManager.updateGrid(this.mapManager.gridData);
@@ -361,35 +365,114 @@ export class MainScene extends Scene {
                     console.warn('[MainScene] WORLD_STATE/MAP_STATE reçu mais payload absent ou vide.', msg);
                 }
             }
+            else if (msg.type === 'SESSION') {
+                // Reconnexion sans reprise possible (fenêtre expirée, journal dépassé) : resynchro complète
+                if (!msg.resumed && this.worldReceived) {
+                    this.requestWorldState();
+                }
+            }
+            else if (msg.type === 'RESYNC_REQUIRED') {
+                // Rejoué à la reprise à la place d'un message d'état complet (MAP_REGENERATED) : resynchro complète
+                if (this.worldReceived) {
+                    this.requestWorldState();
+                }
+            }
+            else if (msg.type === 'WORLD_SEED_DIFF') {
+                // Carte de base régénérée localement depuis la seed, puis diff serveur appliqué
+                const resources = applySeedDiff(msg.payload);
+                this.worldReceived = true;
+                this.worldStore.loadWorldState({ seed: msg.payload.seed, resources });
+                this.mapManager.populateFromState(resources);
+                this.pathfindingManager.updateGrid(this.mapManager.gridData);
+                console.log(`[MainScene] WORLD_SEED_DIFF appliqué : ${resources.length} objet(s) (${msg.payload.removed.length} retiré(s), ${msg.payload.added.length} ajouté(s)).`);
+            }
+            else if (msg.type === 'WORLD_META') {
+                // Mode streaming : l'en-tête arrive seul, les objets suivent chunk par chunk
+                this.worldReceived = true;
+                this.worldStore.applyWorldMeta(msg.payload);
+            }
+            else if (msg.type === 'WORLD_CHUNK') {
+                this.worldStore.applyChunk(msg.payload);
+                this.mapManager.populateFromState(this.worldStore.serverObjects);
+                this.pathfindingManager.updateGrid(this.mapManager.gridData);
+            }
             else if (msg.type === 'MAP_REGENERATED') {
                 console.log('[MainScene] MAP_REGENERATED reçu - Reconstruction du monde !');
                 if (msg.payload && msg.payload.resources && Array.isArray(msg.payload.resources)) {
-                    // Mettre à jour le store
-                    this.worldStore.loadWorldState(msg.payload);
+                    this.rebuildWorld(msg.payload);
 
-                    // Nettoyer Phaser explicitement (le bulldozer complet)
+                    // On peut ajouter un petit log/feedback
+                    this.playerStore.lastActionFeedback = "Le monde a été régénéré !#" + Date.now();
+                }
+            }
+            else if (msg.type === 'MAP_PREFETCH') {
+                // Carte cible envoyée avant la bascule : rien n'est affiché avant MAP_CHANGED
+                if (msg.payload) {
+                    this.worldStore.cacheMapSnapshot(msg.map_id, msg.etag, msg.payload);
+                }
+            }
+            else if (msg.type === 'MAP_CHANGED') {
+                // Bascule sans rechargement de scène : la carte préchargée remplace l'actuelle
+                const snapshot = this.worldStore.mapSnapshots[msg.map_id];
+                console.log(`[MainScene] MAP_CHANGED → ${msg.map_id} (serveur ${msg.ms} ms).`);
+                this.currentMapId = msg.map_id;
+                this.worldStore.setMapInfo(msg.map_id, msg.width, msg.height);
+                if (snapshot) {
+                    this.rebuildWorld(snapshot.payload);
+                } else {
+                    // Snapshot manquant (cache vidé) : état complet demandé au serveur
                     this.objectManager.clearObjects();
-                    this.mapManager.clearMap(); // Nettoie le groupe des tuiles 
+                    this.requestWorldState();
+                }
 
-                    // Reconstruire tout (TileManager va redessiner avec MapManager)
-                    // Il faut régénérer la grid logique
-                    this.mapManager.generate(); // Ce qui fait initGrid() + generateTerrain() + finalizeMap()
+                const isoPos = IsoMath.gridToIso(msg.x, msg.y, this.mapOriginX, this.mapOriginY);
+                this.tweens.killTweensOf(this.player.getSprite());
+                this.currentPath = [];
+                this.isMoving = false;
+                this.player.setIsoPosition(isoPos.x, isoPos.y, this.mapOriginX, this.mapOriginY);
+                this.cameras.main.centerOn(isoPos.x, isoPos.y);
+            }
+            else if (msg.type === 'PLAYERS_TELEPORTED') {
+                // Trame groupée : tous les joueurs de la map (y compris nous) sont replacés d'un coup
+                const myId = localStorage.getItem('haven_player_id');
+                (msg.players || []).forEach((p: any) => {
+                    const isoPos = IsoMath.gridToIso(p.x, p.y, this.mapOriginX, this.mapOriginY);
+                    if (p.id === myId) {
+                        this.tweens.killTweensOf(this.player.getSprite());
+                        this.currentPath = [];
+                        this.isMoving = false;
+                        this.player.setIsoPosition(isoPos.x, isoPos.y, this.mapOriginX, this.mapOriginY);
+                        this.cameras.main.centerOn(isoPos.x, isoPos.y);
+                        return;
+                    }
 
-                    // On ne repeuple avec populateFromState que si on est sur le même modèle, 
-                    // mais MAP_REGENERATED envoie la nouvelle shape du serverObjects 
-                    this.mapManager.populateFromState(msg.payload.resources);
-                    this.pathfindingManager.updateGrid(this.mapManager.gridData);
+                    this.worldStore.moveOtherPlayer(p.id, p.x, p.y);
+                    const sprite = this.objectManager.remotePlayers.get(p.id);
+                    if (sprite) {
+                        this.tweens.killTweensOf(sprite);
+                        sprite.setPosition(isoPos.x, isoPos.y + RENDER_OFFSETS['player']!.offsetY);
+                        sprite.setDepth(isoPos.y + RENDER_OFFSETS['player']!.offsetY + (isoPos.x * 0.001));
 
-                    // On peut ajouter un petit log/feedback
-                    this.playerStore.lastActionFeedback = "Le monde a été régénéré !#" + Date.now();
-                }
+                        const nameText = sprite.getData('nameText');
+                        if (nameText) nameText.setPosition(sprite.x, sprite.y - 60);
+                    }
+                });
             }
             else if (msg.type === 'RESOURCE_PLACED') {
+                this.worldStore.addServerObject(msg.resource);
                 this.mapManager.addResource(msg.resource);
             }
             else if (msg.type === 'RESOURCE_REMOVED') {
+                this.worldStore.removeServerObject(msg.id);
                 this.mapManager.removeResource(msg.id, msg.x, msg.y);
             }
+            else if (msg.type === 'RESOURCE_DEPLETED') {
+                // Pommier cueilli : l'arbre reste en place, grisé jusqu'à RESOURCE_READY
+                this.objectManager.setDepleted(msg.x, msg.y, true);
+            }
+            else if (msg.type === 'RESOURCE_READY') {
+                this.objectManager.setDepleted(msg.x, msg.y, false);
+            }
             else if (msg.type === 'HARVEST_SUCCESS') {
                 const px = msg.x;
                 const py = msg.y;
@@ -444,20 +527,22 @@ export class MainScene extends Scene {
 
         // Ecoute directe via NetworkStore (plus simple car on a déjà le message ici)
         networkStore.onMessage((msg: any) => {
-            if (msg.type === 'CHAT_MESSAGE') {
+            // CHAT_BATCH : une bulle par message du lot
+            const chatMessages = msg.type === 'CHAT_MESSAGE' ? [msg] : msg.type === 'CHAT_BATCH' ? msg.messages : [];
+            for (const chatMsg of chatMessages) {
                 // Trouver le sprite cible
                 let targetSprite: Phaser.GameObjects.Sprite | Phaser.GameObjects.Container | Phaser.GameObjects.Image | undefined;
 
                 // C'est moi ?
                 const myId = localStorage.getItem('haven_player_id');
-                if (msg.sender === myId) {
+                if (chatMsg.sender === myId) {
                     targetSprite = this.player.getSprite();
                 } else {
-                    targetSprite = this.objectManager.remotePlayers.get(msg.sender);
+                    targetSprite = this.objectManager.remotePlayers.get(chatMsg.sender);
                 }
 
                 if (targetSprite) {
-                    this.objectManager.createChatBubbleOnSprite(targetSprite, msg.text);
+                    this.objectManager.createChatBubbleOnSprite(targetSprite, chatMsg.text);
                 }
             }
 
@@ -478,8 +563,7 @@ export class MainScene extends Scene {
 
         // --- HANDSHAKE : Demande explicite de l'état du monde ---
         // On envoie cette requête une fois que TOUS les listeners sont enregistrés.
-        console.log('[MainScene] Envoi de REQUEST_WORLD_STATE (handshake initial)...');
-        networkStore.send('REQUEST_WORLD_STATE');
+        this.requestWorldState();
 
         // Cleanup on shutdown
         this.events.once('shutdown', this.shutdown, this);
@@ -642,6 +726,41 @@ export class MainScene extends Scene {
         }
     }
 
+    /**
+     * Handshake REQUEST_WORLD_STATE (création de la scène, ou reconnexion sans reprise de session).
+     * Mode seed_diff : le client régénère la carte depuis la seed et ne reçoit que le diff.
+     * Si le serveur utilise un générateur inconnu, il se replie sur le streaming par chunks (known sert alors).
+     */
+    private requestWorldState(): void {
+        console.log('[MainScene] Envoi de REQUEST_WORLD_STATE (mode seed_diff)...');
+        useNetworkStore().send('REQUEST_WORLD_STATE', {
+            mode: 'seed_diff',
+            generators: SUPPORTED_GENERATORS,
+            known: this.worldStore.knownChunks(),
+            epoch: this.worldStore.chunkEpoch,
+        });
+    }
+
+    /**
+     * Reconstruit la carte affichée à partir d'un état complet (MAP_REGENERATED, MAP_CHANGED),
+     * sans recharger la scène.
+     */
+    private rebuildWorld(payload: any): void {
+        // Mettre à jour le store
+        this.worldStore.loadWorldState(payload);
+
+        // Nettoyer Phaser explicitement (le bulldozer complet)
+        this.objectManager.clearObjects();
+        this.mapManager.clearMap(); // Nettoie le groupe des tuiles
+
+        // Reconstruire tout (TileManager va redessiner avec MapManager)
+        // Il faut régénérer la grid logique
+        this.mapManager.generate(); // Ce qui fait initGrid() + generateTerrain() + finalizeMap()
+
+        this.mapManager.populateFromState(payload.resources);
+        this.pathfindingManager.updateGrid(this.mapManager.gridData);
+    }
+
     /**
      * Nettoyage des ressources à la fermeture de la scène
      */
@@ -1,13 +1,16 @@
 export class Perlin {
     private perm: number[] = [];
 
-    constructor(rnd: Phaser.Math.RandomDataGenerator) {
-        this.init(rnd);
+    /**
+     * @param seed - Seed du LCG (42 = WORLD_SEED backend). La génération WORLD_SEED_DIFF passe la seed de la room.
+     */
+    constructor(rnd: Phaser.Math.RandomDataGenerator | null, seed: number = 42) {
+        this.init(rnd, seed);
     }
 
-    public init(rnd: Phaser.Math.RandomDataGenerator): void {
-        // Enforce deterministic seed to match backend WORLD_SEED (42) exactly
-        let state = 42;
+    public init(rnd: Phaser.Math.RandomDataGenerator | null, seed: number = 42): void {
+        // Seed déterministe identique au backend (Perlin(seed) dans perlin.py)
+        let state = seed;
         const p: number[] = new Array(256).fill(0).map((_, i) => i);
 
         // Fisher-Yates avec LCG basique identique au serveur Python
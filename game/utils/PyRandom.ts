@@ -0,0 +1,112 @@
+/**
+ * PyRandom — Port exact de `random.Random(seed).random()` de CPython (Mersenne Twister MT19937).
+ *
+ * Le serveur tire ses ressources avec `random.Random(seed)` (voir `_generate_world` dans
+ * backend/gamestate.py). Pour reconstruire la carte de base côté client à partir de la seed
+ * seule (sync WORLD_SEED_DIFF), la séquence doit être identique au bit près :
+ * - seed entière → init_by_array() sur les mots de 32 bits de |seed|
+ * - random() → 53 bits construits à partir de deux tirages 32 bits (a >> 5, b >> 6)
+ *
+ * La parité est vérifiée par shared/generation-vectors.json.
+ */
+export class PyRandom {
+    private static readonly N = 624;
+    private static readonly M = 397;
+
+    private mt = new Uint32Array(PyRandom.N);
+    private mti = PyRandom.N + 1;
+
+    constructor(seed: number) {
+        this.seed(seed);
+    }
+
+    /**
+     * Équivalent de random.seed(int) : découpe |seed| en mots de 32 bits (poids faible d'abord).
+     */
+    public seed(seed: number): void {
+        let n = Math.abs(Math.trunc(seed));
+        const key: number[] = [];
+        do {
+            key.push(n % 0x100000000);
+            n = Math.floor(n / 0x100000000);
+        } while (n > 0);
+        this.initByArray(key);
+    }
+
+    /**
+     * Flottant dans [0, 1) — identique à random.random().
+     */
+    public random(): number {
+        const a = this.genrandUint32() >>> 5;
+        const b = this.genrandUint32() >>> 6;
+        return (a * 67108864 + b) * (1.0 / 9007199254740992);
+    }
+
+    private initGenrand(s: number): void {
+        const mt = this.mt;
+        mt[0] = s >>> 0;
+        for (let i = 1; i < PyRandom.N; i++) {
+            const prev = mt[i - 1] as number;
+            mt[i] = (Math.imul(1812433253, prev ^ (prev >>> 30)) + i) >>> 0;
+        }
+        this.mti = PyRandom.N;
+    }
+
+    private initByArray(key: number[]): void {
+        const N = PyRandom.N;
+        const mt = this.mt;
+        this.initGenrand(19650218);
+
+        let i = 1;
+        let j = 0;
+        for (let k = Math.max(N, key.length); k > 0; k--) {
+            const prev = mt[i - 1] as number;
+            mt[i] = (((mt[i] as number) ^ Math.imul(prev ^ (prev >>> 30), 1664525)) + (key[j] as number) + j) >>> 0;
+            i++;
+            j++;
+            if (i >= N) {
+                mt[0] = mt[N - 1] as number;
+                i = 1;
+            }
+            if (j >= key.length) j = 0;
+        }
+        for (let k = N - 1; k > 0; k--) {
+            const prev = mt[i - 1] as number;
+            mt[i] = (((mt[i] as number) ^ Math.imul(prev ^ (prev >>> 30), 1566083941)) - i) >>> 0;
+            i++;
+            if (i >= N) {
+                mt[0] = mt[N - 1] as number;
+                i = 1;
+            }
+        }
+        mt[0] = 0x80000000;
+    }
+
+    private genrandUint32(): number {
+        const N = PyRandom.N;
+        const M = PyRandom.M;
+        const mt = this.mt;
+
+        if (this.mti >= N) {
+            let kk = 0;
+            for (; kk < N - M; kk++) {
+                const y = ((mt[kk] as number) & 0x80000000) | ((mt[kk + 1] as number) & 0x7fffffff);
+                mt[kk] = (mt[kk + M] as number) ^ (y >>> 1) ^ (y & 1 ? 0x9908b0df : 0);
+            }
+            for (; kk < N - 1; kk++) {
+                const y = ((mt[kk] as number) & 0x80000000) | ((mt[kk + 1] as number) & 0x7fffffff);
+                mt[kk] = (mt[kk + (M - N)] as number) ^ (y >>> 1) ^ (y & 1 ? 0x9908b0df : 0);
+            }
+            const y = ((mt[N - 1] as number) & 0x80000000) | ((mt[0] as number) & 0x7fffffff);
+            mt[N - 1] = (mt[M - 1] as number) ^ (y >>> 1) ^ (y & 1 ? 0x9908b0df : 0);
+            this.mti = 0;
+        }
+
+        let y = mt[this.mti++] as number;
+        y ^= y >>> 11;
+        y ^= (y << 7) & 0x9d2c5680;
+        y ^= (y << 15) & 0xefc60000;
+        y ^= y >>> 18;
+        return y >>> 0;
+    }
+}
@@ -0,0 +1,122 @@
+import { Perlin } from './Perlin';
+import { PyRandom } from './PyRandom';
+import type { ServerWorldObject } from '../../stores/world';
+
+/**
+ * WorldGenerator — Reconstruction côté client de la carte de base générée par le serveur.
+ *
+ * Miroir exact de `_compute_water_tiles` et `_generate_world` (backend/gamestate.py) :
+ * même Perlin (LCG + Fisher-Yates), même RNG (MT19937 via PyRandom), même ordre de parcours.
+ * Le serveur n'envoie alors que la seed, les paramètres et le diff (WORLD_SEED_DIFF).
+ *
+ * Toute modification de l'algorithme doit changer GENERATOR_VERSION côté serveur,
+ * être reportée ici, et régénérer shared/generation-vectors.json (python -m backend.genvectors).
+ */
+
+/** Générateurs que ce client sait reproduire (annoncés dans REQUEST_WORLD_STATE) */
+export const SUPPORTED_GENERATORS = ['perlin_v1', 'empty'];
+
+export interface GenerationRule {
+    asset: string;
+    type: string;
+    chance: number;
+}
+
+export interface GenerationParams {
+    map_size: number;
+    safe_zone: [number, number, number, number];   // [minX, maxX, minY, maxY] (bornes incluses)
+    house: [number, number, number, number];       // [x, y, w, h]
+    spawn_dry_zone: number;
+    perlin_scale: number;
+    water_threshold: number;
+    rules: GenerationRule[];
+}
+
+/** Payload WORLD_SEED_DIFF */
+export interface SeedDiffPayload {
+    map_id: string;
+    width: number;
+    height: number;
+    seed: number;
+    generator: string;
+    version: number;
+    params?: GenerationParams;
+    removed: string[];
+    added: ServerWorldObject[];
+}
+
+function isInHouse(params: GenerationParams, x: number, y: number): boolean {
+    const [hx, hy, hw, hh] = params.house;
+    return hx <= x && x < hx + hw && hy <= y && y < hy + hh;
+}
+
+function isInSafeZone(params: GenerationParams, x: number, y: number): boolean {
+    const [minX, maxX, minY, maxY] = params.safe_zone;
+    return minX <= x && x <= maxX && minY <= y && y <= maxY;
+}
+
+/**
+ * Tuiles d'eau, encodées y * map_size + x (miroir de _compute_water_tiles).
+ */
+export function computeWaterTiles(seed: number, params: GenerationParams): Set<number> {
+    const perlin = new Perlin(null, seed);
+    const size = params.map_size;
+    const water = new Set<number>();
+
+    for (let y = 0; y < size; y++) {
+        for (let x = 0; x < size; x++) {
+            if (isInHouse(params, x, y)) continue;
+            if (x < params.spawn_dry_zone && y < params.spawn_dry_zone) continue;
+
+            const normalized = (perlin.noise(x * params.perlin_scale, y * params.perlin_scale) + 1) / 2;
+            if (normalized < params.water_threshold) {
+                water.add(y * size + x);
+            }
+        }
+    }
+    return water;
+}
+
+/**
+ * Ressources de la carte de base (miroir de _generate_world).
+ */
+export function generateWorld(seed: number, params: GenerationParams, water?: Set<number>): ServerWorldObject[] {
+    const waterTiles = water ?? computeWaterTiles(seed, params);
+    const rng = new PyRandom(seed);
+    const size = params.map_size;
+    const resources: ServerWorldObject[] = [];
+
+    for (let y = 0; y < size; y++) {
+        for (let x = 0; x < size; x++) {
+            if (isInSafeZone(params, x, y) || isInHouse(params, x, y)) continue;
+            if (waterTiles.has(y * size + x)) continue;
+
+            // Tirage unique pour cette case (consommé même si aucune règle ne s'applique)
+            const roll = rng.random();
+            let cumulative = 0.0;
+            for (const rule of params.rules) {
+                cumulative += rule.chance;
+                if (roll < cumulative) {
+                    resources.push({ id: `${rule.asset}_${x}_${y}`, asset: rule.asset, type: rule.type, x, y });
+                    break;
+                }
+            }
+        }
+    }
+    return resources;
+}
+
+/**
+ * Reconstruit l'état courant : carte de base régénérée localement + diff serveur.
+ */
+export function applySeedDiff(payload: SeedDiffPayload): ServerWorldObject[] {
+    let base: ServerWorldObject[] = [];
+    if (payload.generator === 'perlin_v1' && payload.params) {
+        base = generateWorld(payload.seed, payload.params);
+    } else if (payload.generator !== 'empty') {
+        throw new Error(`[WorldGenerator] Générateur inconnu : ${payload.generator}`);
+    }
+
+    const removed = new Set(payload.removed);
+    return base.filter(o => !removed.has(o.id)).concat(payload.added);
+}
@@ -0,0 +1,58 @@
+/**
+ * Vérifie que game/utils/WorldGenerator.ts reproduit la génération serveur
+ * à partir des vecteurs de shared/generation-vectors.json (python -m backend.genvectors).
+ *
+ * Usage : npm run test:genparity
+ */
+import { readFileSync } from 'node:fs';
+import { createHash } from 'node:crypto';
+import { Perlin } from '../game/utils/Perlin';
+import { PyRandom } from '../game/utils/PyRandom';
+import { computeWaterTiles, generateWorld, SUPPORTED_GENERATORS } from '../game/utils/WorldGenerator';
+import type { GenerationParams } from '../game/utils/WorldGenerator';
+
+const vectors = JSON.parse(readFileSync(new URL('../shared/generation-vectors.json', import.meta.url), 'utf-8'));
+const params: GenerationParams = vectors.params;
+const failures: string[] = [];
+
+const sha256 = (lines: string[]) => createHash('sha256').update(lines.join('\n'), 'utf-8').digest('hex');
+
+function expectEqual(label: string, actual: unknown, expected: unknown) {
+    if (actual !== expected) failures.push(`${label} : attendu ${expected}, obtenu ${actual}`);
+}
+
+if (!SUPPORTED_GENERATORS.includes(vectors.generator)) {
+    failures.push(`générateur ${vectors.generator} non supporté par le client`);
+}
+
+for (const c of vectors.cases) {
+    const seed: number = c.seed;
+
+    const perlin = new Perlin(null, seed);
+    for (const [x, y, value] of c.perlin) {
+        expectEqual(`seed ${seed} perlin(${x},${y})`, perlin.noise(x * params.perlin_scale, y * params.perlin_scale), value);
+    }
+
+    const rng = new PyRandom(seed);
+    c.rng.forEach((value: number, i: number) => expectEqual(`seed ${seed} rng[${i}]`, rng.random(), value));
+
+    const water = computeWaterTiles(seed, params);
+    const waterLines = [...water].sort((a, b) => a - b).map(i => `${i % params.map_size},${Math.floor(i / params.map_size)}`);
+    expectEqual(`seed ${seed} water_count`, water.size, c.water_count);
+    expectEqual(`seed ${seed} water_sha256`, sha256(waterLines), c.water_sha256);
+
+    const resources = generateWorld(seed, params, water);
+    expectEqual(`seed ${seed} resource_count`, resources.length, c.resource_count);
+    expectEqual(
+        `seed ${seed} resources_sha256`,
+        sha256(resources.map(r => `${r.id}|${r.asset}|${r.type}|${r.x}|${r.y}`)),
+        c.resources_sha256,
+    );
+}
+
+if (failures.length) {
+    console.error(`[GenParity] ${failures.length} écart(s) :`);
+    failures.forEach(f => console.error(`  - ${f}`));
+    process.exit(1);
+}
+console.log(`[GenParity] OK — ${vectors.cases.length} seed(s) identiques au serveur (${vectors.generator}).`);
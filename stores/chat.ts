@@ -1,14 +1,23 @@
 import { defineStore } from 'pinia';
 import { useNetworkStore } from './network';
 
+/** Canal d'un message : map courante, proximité, privé, ou tous les joueurs */
+export type ChatChannel = 'map' | 'near' | 'dm' | 'global';
+
 export interface ChatMessage {
     id: string;
     sender: string;
     text: string;
     timestamp: number;
+    channel?: ChatChannel;
+    /** Destinataire d'un message privé */
+    to?: string;
     isSystem?: boolean;
 }
 
+// Taille de l'historique affiché
+const MAX_MESSAGES = 50;
+
 export const useChatStore = defineStore('chat', {
     state: () => ({
         messages: [] as ChatMessage[],
@@ -17,14 +26,37 @@ export const useChatStore = defineStore('chat', {
         addMessage(msg: ChatMessage) {
             this.messages.push(msg);
             // Garder l'historique propre (50 derniers messages)
-            if (this.messages.length > 50) {
+            if (this.messages.length > MAX_MESSAGES) {
                 this.messages.shift();
             }
         },
+        /** CHAT_BATCH : messages groupés par le serveur (canal chargé) */
+        addMessages(msgs: ChatMessage[]) {
+            this.messages.push(...msgs);
+            if (this.messages.length > MAX_MESSAGES) {
+                this.messages.splice(0, this.messages.length - MAX_MESSAGES);
+            }
+        },
+        /** CHAT_HISTORY : historique serveur, remplace l'historique local */
+        setHistory(msgs: ChatMessage[]) {
+            this.messages = msgs.slice(-MAX_MESSAGES);
+        },
+        /**
+         * Envoie un message. Préfixes : "/g " global, "/p " proximité, "/w <joueur> " privé ;
+         * sans préfixe : map courante. Le serveur s'occupe du reste (ID, timestamp).
+         */
         sendMessage(text: string) {
             const network = useNetworkStore();
-            // On envoie juste le texte, le serveur s'occupe du reste (ID, timestamp)
-            network.send('PLAYER_CHAT', { text });
+            const whisper = text.match(/^\/w\s+(\S+)\s+(.+)$/);
+            if (whisper) {
+                network.send('PLAYER_CHAT', { text: whisper[2], channel: 'dm', to: whisper[1] });
+            } else if (text.startsWith('/g ')) {
+                network.send('PLAYER_CHAT', { text: text.slice(3), channel: 'global' });
+            } else if (text.startsWith('/p ')) {
+                network.send('PLAYER_CHAT', { text: text.slice(3), channel: 'near' });
+            } else {
+                network.send('PLAYER_CHAT', { text });
+            }
         }
     }
 });
@@ -2,6 +2,7 @@ import { defineStore } from 'pinia';
 import { ref, shallowRef } from 'vue';
 import { usePlayerStore } from './player';
 import { useChatStore } from './chat';
+import { useWorldStore } from './world';
 
 /**
  * Network Store — Gère la connexion WebSocket et le dispatch des messages
@@ -16,8 +17,17 @@ import { useChatStore } from './chat';
  * - PLAYER_SYNC, WORLD_STATE
  * - WALLET_UPDATE
  * - RESOURCE_PLACED, RESOURCE_REMOVED
- * - CHAT_MESSAGE
- * - ERROR
+ * - CHAT_MESSAGE, CHAT_BATCH (canal chargé : messages groupés), CHAT_HISTORY (à l'arrivée sur une map)
+ * - SESSION (jeton de reprise + dernier seq), ERROR
+ * - PING (heartbeat, répondu automatiquement par PONG)
+ * - REDIRECT (multi-workers : reconnexion immédiate vers le worker de la map)
+ * - SERVER_BUSY (admission refusée), SERVER_RESTART (drain) : reconnexion après `retry_after` secondes
+ * - MAP_PREFETCH, MAP_CHANGED (changement de map sans reconnexion, seq repris sur la nouvelle map)
+ *
+ * REPRISE DE SESSION :
+ * Les diffusions serveur portent un champ `seq` (par map). À la reconnexion, le client
+ * renvoie son jeton et le dernier seq reçu : le serveur rejoue seulement les messages manqués
+ * (SESSION.resumed = true) ou repart sur un handshake complet (SESSION.resumed = false).
  */
 export const useNetworkStore = defineStore('network', () => {
     // --- State ---
@@ -25,6 +35,18 @@ export const useNetworkStore = defineStore('network', () => {
     const socket = shallowRef<WebSocket | null>(null);
     const error = ref<string | null>(null);
     const lastPing = ref(0);
+    /** Dernier profil reçu (PROFILE_RESULT, admin) */
+    const lastProfile = shallowRef<{ duration: number, samples: number, folded: string } | null>(null);
+
+    // Reprise de session (voir backend/resume.py)
+    let resumeToken: string | null = null;
+    let lastSeq = 0;
+
+    // Worker servant la map du joueur (mis à jour par REDIRECT, voir backend/cluster.py)
+    let serverUrl = 'ws://localhost:8000';
+    let redirectPending = false;
+    // Délai de reconnexion imposé par SERVER_BUSY / SERVER_RESTART (ms), consommé à la fermeture suivante
+    let retryAfterMs: number | null = null;
 
     // Callbacks pour la gestion des messages
     const onMessageCallbacks = ref<Array<(msg: any) => void>>([]);
@@ -53,6 +75,52 @@ export const useNetworkStore = defineStore('network', () => {
             const parsed = JSON.parse(data);
             lastPing.value = Date.now();
 
+            // Heartbeat serveur : réponse immédiate, non propagée aux listeners
+            if (parsed.type === 'PING') {
+                send('PONG', { t: parsed.t });
+                return;
+            }
+
+            // Multi-workers : la map est servie par un autre process, on s'y reconnecte aussitôt
+            if (parsed.type === 'REDIRECT') {
+                console.log(`[Network] Redirection vers ${parsed.url} (map ${parsed.map_id}).`);
+                serverUrl = parsed.url;
+                resumeToken = null;
+                lastSeq = 0;
+                redirectPending = true;
+                return;
+            }
+
+            // Admission refusée (serveur saturé ou carte pleine) : nouvelle tentative après le délai suggéré
+            if (parsed.type === 'SERVER_BUSY') {
+                console.warn(`[Network] Serveur occupé (${parsed.message}), nouvelle tentative dans ${parsed.retry_after} s.`);
+                retryAfterMs = parsed.retry_after * 1000;
+                return;
+            }
+
+            // Redémarrage du serveur : jeton de reprise conservé, la session est reprise par le nouveau process
+            if (parsed.type === 'SERVER_RESTART') {
+                console.warn(`[Network] ${parsed.message}, reconnexion dans ${parsed.retry_after} s.`);
+                retryAfterMs = parsed.retry_after * 1000;
+                return;
+            }
+
+            if (parsed.type === 'PROFILE_RESULT') {
+                lastProfile.value = parsed.payload;
+            }
+
+            if (parsed.type === 'SESSION') {
+                resumeToken = parsed.resume_token ?? null;
+                lastSeq = parsed.seq ?? 0;
+                // Session neuve : les ETags mémorisés ne valent plus pour ce serveur
+                if (!parsed.resumed) {
+                    useWorldStore().clearMapSnapshots();
+                }
+                console.log(`[Network] Session ${parsed.resumed ? 'reprise' : 'ouverte'} (seq ${lastSeq}).`);
+            } else if (typeof parsed.seq === 'number') {
+                lastSeq = parsed.seq;
+            }
+
             // ── Session 9.8 : Log des messages reçus pour le debug ──
             if (parsed.type === 'ERROR') {
                 console.warn(`[Network] ← ERROR du serveur: ${parsed.message}`);
@@ -85,8 +153,11 @@ export const useNetworkStore = defineStore('network', () => {
             return;
         }
 
-        const url = `ws://localhost:8000/ws/${playerId}?token=${token}`;
+        let url = `${serverUrl}/ws/${playerId}?token=${token}`;
         console.log(`[Network] Connexion à ${url}...`);
+        if (resumeToken) {
+            url += `&resume=${encodeURIComponent(resumeToken)}&last_seq=${lastSeq}`;
+        }
 
         try {
             const ws = new WebSocket(url);
@@ -105,10 +176,14 @@ export const useNetworkStore = defineStore('network', () => {
             ws.onclose = (event) => {
                 console.log('[Network] Déconnecté.', event.reason);
                 cleanup();
+                // Délai aléatoire en plus : tous les clients coupés en même temps ne reviennent pas ensemble
+                const delay = redirectPending ? 0 : (retryAfterMs ?? 3000) + Math.random() * 1000;
+                redirectPending = false;
+                retryAfterMs = null;
                 setTimeout(() => {
                     console.log('[Network] Tentative de reconnexion...');
                     connect(playerId, token);
-                }, 3000);
+                }, delay);
             };
 
             ws.onerror = (err) => {
@@ -125,6 +200,9 @@ export const useNetworkStore = defineStore('network', () => {
     }
 
     function disconnect() {
+        // Déconnexion volontaire : pas de reprise possible
+        resumeToken = null;
+        lastSeq = 0;
         cleanup();
     }
 
@@ -159,6 +237,11 @@ export const useNetworkStore = defineStore('network', () => {
         send('ACTION_HARVEST', { resource_id, tool: equipped_tool });
     }
 
+    function sendHarvestNearest(asset: string | null = null, equipped_tool: string = 'none') {
+        console.log(`[Network] → ACTION_HARVEST_NEAREST: asset=${asset}, tool=${equipped_tool}`);
+        send('ACTION_HARVEST_NEAREST', { asset, tool: equipped_tool });
+    }
+
     function sendCraft(recipeId: string) {
         console.log(`[Network] → ACTION_CRAFT: recipeId=${recipeId}`);
         send('ACTION_CRAFT', { recipeId });
@@ -169,6 +252,15 @@ export const useNetworkStore = defineStore('network', () => {
         send('ACTION_PLACE', { x, y, itemId: item_id });
     }
 
+    /**
+     * Demande un changement de map. L'ETag du snapshot déjà en cache évite au serveur de le renvoyer.
+     */
+    function sendChangeMap(mapId: string, x?: number, y?: number) {
+        const etag = useWorldStore().mapSnapshots[mapId]?.etag;
+        console.log(`[Network] → ACTION_CHANGE_MAP: map=${mapId}${etag ? ' (snapshot en cache)' : ''}`);
+        send('ACTION_CHANGE_MAP', { map_id: mapId, x, y, etag });
+    }
+
     // --- Admin ---
     function sendAdminKick(playerId: string) {
         console.log(`[Network] → ADMIN_KICK_PLAYER: target=${playerId}`);
@@ -180,6 +272,11 @@ export const useNetworkStore = defineStore('network', () => {
         send('ADMIN_REGENERATE_MAP');
     }
 
+    function sendAdminProfile(duration: number = 10) {
+        console.log(`[Network] → ADMIN_PROFILE: duration=${duration}s`);
+        send('ADMIN_PROFILE', { duration });
+    }
+
     // --- Listeners Auto ---
 
     function listenForEconomy() {
@@ -208,6 +305,10 @@ export const useNetworkStore = defineStore('network', () => {
         onMessage((msg: any) => {
             if (msg.type === 'CHAT_MESSAGE') {
                 chatStore.addMessage(msg);
+            } else if (msg.type === 'CHAT_BATCH') {
+                chatStore.addMessages(msg.messages);
+            } else if (msg.type === 'CHAT_HISTORY') {
+                chatStore.setHistory(msg.messages);
             }
         });
     }
@@ -231,6 +332,7 @@ export const useNetworkStore = defineStore('network', () => {
         socket,
         error,
         lastPing,
+        lastProfile,
         onMessageCallbacks,
 
         // Actions
@@ -241,10 +343,13 @@ export const useNetworkStore = defineStore('network', () => {
         sendInteract,
         sendBuild,
         sendHarvest,
+        sendHarvestNearest,
         sendCraft,
         sendPlace,
+        sendChangeMap,
         sendAdminKick,
         sendAdminRegenerateMap,
+        sendAdminProfile,
         listenForEconomy,
         listenForChatMessages,
         listenForErrors,
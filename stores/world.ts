@@ -12,6 +12,19 @@ export interface ServerWorldObject {
     y: number;
 }
 
+/**
+ * Chunk compact envoyé par le serveur en mode streaming (WORLD_CHUNK).
+ * rows = [asset_idx, type_idx, x, y, id?] — l'id est omis s'il vaut "{asset}_{x}_{y}".
+ */
+export interface WorldChunk {
+    cx: number;
+    cy: number;
+    version: number;
+    assets: string[];
+    types: string[];
+    rows: Array<[number, number, number, number, string?]>;
+}
+
 export interface RemotePlayer {
     id: string;
     x: number;
@@ -37,6 +50,15 @@ export interface WorldState {
     mapWidth: number;
     mapHeight: number;
     mapChangedSignal: number;
+    /** Snapshots de carte reçus par MAP_PREFETCH (map_id → ETag + carte), réutilisés au retour sur la map */
+    mapSnapshots: Record<string, { etag: string, payload: any }>;
+
+    // --- STREAMING PAR CHUNKS ---
+    chunkSize: number;
+    /** Chunks reçus ("cx,cy") → version serveur, renvoyés au serveur lors d'une reconnexion */
+    chunkVersions: Record<string, number>;
+    /** Epoch de la room (WORLD_META) à laquelle se rapportent chunkVersions */
+    chunkEpoch: string;
 }
 
 
@@ -51,6 +73,10 @@ export const useWorldStore = defineStore('world', {
         mapWidth: 100,
         mapHeight: 100,
         mapChangedSignal: 0,
+        mapSnapshots: {},
+        chunkSize: 16,
+        chunkVersions: {},
+        chunkEpoch: '',
     }),
     getters: {
         hours: (state) => Math.floor(state.time / 60),
@@ -85,6 +111,8 @@ export const useWorldStore = defineStore('world', {
             // On vide les anciens tableaux/dictionnaires AVANT d'assigner la suite
             this.serverObjects = [];
             this.otherPlayers = {};
+            this.chunkVersions = {};
+            this.chunkEpoch = '';
 
             this.mapId = id;
             this.mapWidth = width;
@@ -92,6 +120,20 @@ export const useWorldStore = defineStore('world', {
             this.mapChangedSignal++;
         },
 
+        /**
+         * Mémorise le snapshot préchargé d'une carte (MAP_PREFETCH), avant la bascule MAP_CHANGED.
+         */
+        cacheMapSnapshot(id: string, etag: string, payload: any) {
+            this.mapSnapshots[id] = { etag, payload };
+        },
+
+        /**
+         * Oublie les snapshots préchargés : une session non reprise peut venir d'un serveur redémarré.
+         */
+        clearMapSnapshots() {
+            this.mapSnapshots = {};
+        },
+
         /**
          * Initialise la seed du monde.
          * Récupère depuis le localStorage si existant, sinon génère une nouvelle seed.
@@ -129,6 +171,9 @@ export const useWorldStore = defineStore('world', {
                 this.worldSeed = payload.seed.toString();
                 console.log(`[WorldStore] Seed mise à jour depuis le serveur: ${this.worldSeed}`);
             }
+            // État complet (WORLD_STATE, MAP_REGENERATED, MAP_CHANGED) : les versions de chunks ne valent plus
+            this.chunkVersions = {};
+            this.chunkEpoch = '';
             if (payload?.resources && Array.isArray(payload.resources)) {
                 this.serverObjects = payload.resources;
                 console.log(`[WorldStore] ${this.serverObjects.length} objet(s) du monde chargés depuis le serveur.`);
@@ -137,6 +182,56 @@ export const useWorldStore = defineStore('world', {
             }
         },
 
+        /**
+         * En-tête du mode streaming (WORLD_META) : seed, dimensions et taille des chunks.
+         */
+        applyWorldMeta(meta: { seed?: number | string, width?: number, height?: number, chunk_size?: number, epoch?: string }) {
+            // Autre epoch (room régénérée, serveur redémarré) : les chunks gardés sont périmés
+            if (meta?.epoch !== this.chunkEpoch) {
+                this.chunkVersions = {};
+                this.serverObjects = [];
+                this.chunkEpoch = meta?.epoch ?? '';
+            }
+            if (meta?.seed) {
+                this.worldSeed = meta.seed.toString();
+            }
+            if (meta?.chunk_size) {
+                this.chunkSize = meta.chunk_size;
+            }
+        },
+
+        /**
+         * Intègre un chunk (WORLD_CHUNK) : remplace les objets de sa zone par ceux reçus.
+         */
+        applyChunk(chunk: WorldChunk) {
+            const size = this.chunkSize;
+            const objects: ServerWorldObject[] = chunk.rows.map(row => {
+                const asset = chunk.assets[row[0]] as string;
+                return {
+                    id: row[4] ?? `${asset}_${row[2]}_${row[3]}`,
+                    asset,
+                    type: chunk.types[row[1]] as string,
+                    x: row[2],
+                    y: row[3],
+                };
+            });
+
+            this.serverObjects = this.serverObjects
+                .filter(o => Math.floor(o.x / size) !== chunk.cx || Math.floor(o.y / size) !== chunk.cy)
+                .concat(objects);
+            this.chunkVersions[`${chunk.cx},${chunk.cy}`] = chunk.version;
+        },
+
+        /**
+         * Chunks connus au format attendu par REQUEST_WORLD_STATE ([cx, cy, version]).
+         */
+        knownChunks(): Array<[number, number, number]> {
+            return Object.entries(this.chunkVersions).map(([key, version]) => {
+                const [cx, cy] = key.split(',').map(Number);
+                return [cx as number, cy as number, version];
+            });
+        },
+
         /**
          * Ajoute un objet au monde (reçu via RESOURCE_PLACED).
          */
@@ -159,8 +254,11 @@ export const useWorldStore = defineStore('world', {
 
         setOtherPlayers(players: any[]) {
             this.otherPlayers = {};
+            // Le roster envoyé par le serveur peut contenir le joueur local : on l'ignore
+            const myId = localStorage.getItem('haven_player_id');
             players.forEach(p => {
                 const pId = typeof p === 'string' ? p : p.id;
+                if (pId === myId) return;
                 const pX = typeof p === 'string' ? 10 : (p.x !== undefined ? p.x : 10);
                 const pY = typeof p === 'string' ? 10 : (p.y !== undefined ? p.y : 10);
                 this.otherPlayers[pId] = { id: pId, x: pX, y: pY };